@@ -14,6 +14,9 @@ class PuzzleMapEditor:
         self.current_region_id = None
         self.regions = {}  # region_id -> {'name': str, 'color': hex}
         self.grid = [[None for _ in range(self.map_w)] for _ in range(self.map_h)]
+        # 每个格子的画布元素 id：矩形一直存在，编号文字只在格子有归属时存在（None 表示没有）
+        self.cell_rects = []
+        self.cell_labels = []
 
         # UI 布局
         ctrl = tk.Frame(master)
@@ -90,27 +93,46 @@ class PuzzleMapEditor:
         self.draw_grid()
 
     def draw_grid(self):
+        """整体重画（新建 / 导入 / 清空时），涂色、清除、改色只更新涉及的格子"""
         self.canvas.delete("all")
         # 调整画布大小
         width = self.map_w * self.cell_size
         height = self.map_h * self.cell_size
         self.canvas.config(scrollregion=(0,0,width,height), width=min(width, 800), height=min(height, 800))
 
+        self.cell_rects = [[None] * self.map_w for _ in range(self.map_h)]
+        self.cell_labels = [[None] * self.map_w for _ in range(self.map_h)]
         for y in range(self.map_h):
             for x in range(self.map_w):
                 x1 = x * self.cell_size
                 y1 = y * self.cell_size
                 x2 = x1 + self.cell_size
                 y2 = y1 + self.cell_size
-                cell_tag = f"cell_{x}_{y}"
-                rid = self.grid[y][x]
-                fill = self.regions[rid]['color'] if (rid is not None and rid in self.regions) else ""
                 # 先画矩形（fill color），再画网格线（outline）
-                self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill, outline="gray", tags=(cell_tag,))
-                if rid is not None:
-                    # 显示简短 id
-                    self.canvas.create_text(x1+4, y1+4, anchor="nw", text=str(rid), font=("TkDefaultFont", 8),
-                                            tags=(cell_tag,))
+                self.cell_rects[y][x] = self.canvas.create_rectangle(x1, y1, x2, y2, outline="gray",
+                                                                     tags=(f"cell_{x}_{y}",))
+                self.update_cell(x, y)
+
+    def update_cell(self, x, y):
+        """按 self.grid 更新一个格子的填充色和编号文字，不重建其它画布元素"""
+        rid = self.grid[y][x]
+        fill = self.regions[rid]['color'] if (rid is not None and rid in self.regions) else ""
+        # 矩形带上 region_{id} 标签，改色时按标签一次改完该部件的所有格子
+        tags = (f"cell_{x}_{y}", f"region_{rid}") if rid is not None else (f"cell_{x}_{y}",)
+        self.canvas.itemconfigure(self.cell_rects[y][x], fill=fill, tags=tags)
+        label = self.cell_labels[y][x]
+        if rid is None:
+            if label is not None:
+                self.canvas.delete(label)
+                self.cell_labels[y][x] = None
+        elif label is None:
+            # 显示简短 id
+            x1 = x * self.cell_size
+            y1 = y * self.cell_size
+            self.cell_labels[y][x] = self.canvas.create_text(x1+4, y1+4, anchor="nw", text=str(rid),
+                                                             font=("TkDefaultFont", 8), tags=(f"cell_{x}_{y}",))
+        else:
+            self.canvas.itemconfigure(label, text=str(rid))
 
     # ---------- 区域管理 ----------
     def create_region(self):
@@ -138,15 +160,15 @@ class PuzzleMapEditor:
         text = self.region_listbox.get(idx)
         rid = int(text.split(":")[0])
         if messagebox.askyesno("确认", f"删除部件 {rid}？格子会被清空归属。"):
-            # 清理格子引用
+            # 清理格子引用，只更新被清空的格子
             for y in range(self.map_h):
                 for x in range(self.map_w):
                     if self.grid[y][x] == rid:
                         self.grid[y][x] = None
+                        self.update_cell(x, y)
             del self.regions[rid]
             self.region_listbox.delete(idx)
             self.current_region_id = None
-            self.draw_grid()
 
     def on_region_select(self, _ev=None):
         sel = self.region_listbox.curselection()
@@ -173,7 +195,8 @@ class PuzzleMapEditor:
         # 更新 listbox 显示
         self.region_listbox.delete(idx)
         self.region_listbox.insert(idx, f"{rid}: {self.regions[rid]['name']} ({new_color})")
-        self.draw_grid()
+        # 只改该部件格子的填充色
+        self.canvas.itemconfigure(f"region_{rid}", fill=new_color)
 
     # ---------- 鼠标事件（涂色 / 清除） ----------
     def cell_from_event(self, event):
@@ -207,19 +230,15 @@ class PuzzleMapEditor:
         cell = self.cell_from_event(event)
         if cell:
             x, y = cell
-            self.grid[y][x] = None
-            self.draw_grid()
+            if self.grid[y][x] is not None:
+                self.grid[y][x] = None
+                self.update_cell(x, y)
 
     def paint_cell(self, x, y, region_id):
-        # 仅当格子需要更新时才重绘
+        # 仅当格子需要更新时才重绘，且只更新该格的填充色和编号
         if self.grid[y][x] != region_id:
             self.grid[y][x] = region_id
-            x1 = x * self.cell_size
-            y1 = y * self.cell_size
-            x2 = x1 + self.cell_size
-            y2 = y1 + self.cell_size
-            # 覆盖 redraw（更简单直接：重绘整个网格；若格子很多，可优化为只更新该格）
-            self.draw_grid()
+            self.update_cell(x, y)
 
     # ---------- 导入/导出 ----------
     def export_json(self):
@@ -0,0 +1,203 @@
+"""
+map_batch.py
+
+一笔画地图文件批量校验工具（命令行，多进程）
+- 读取 map_editor.py 导出的地图文件：JSON（每个格子一条 {x, y, id, nodeIndex}）或 map_format.py 的稀疏 / gzip / 二进制格式，自动识别
+- 校验每条线：nodeIndex 从 1 开始连续、相邻节点上下左右相邻、线条之间不重叠
+- 汇总网格大小、线条数、各线条长度，输出 CSV（.xlsx 需要安装 pandas + openpyxl）
+- --solve 时再用 map_solver.py 检查每条线条从起点出发是否只有唯一的一笔画解
+- 不依赖 pygame / tkinter，可在打包机上直接运行，也可以 import 后调用 load_map / validate_map
+
+使用方法：
+    python map_batch.py levels/                          # 校验目录下所有 .json，汇总写入 map_summary.csv
+    python map_batch.py levels/ -r -o report.xlsx        # 递归子目录，输出 Excel
+    python map_batch.py a.json b.json --workers 4 --errors-only
+    python map_batch.py levels/ --solve --solve-timeout 5   # 同时检查唯一解，多解 / 超时的文件也算未通过
+"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from map_format import MapFormatError, load_map
+from map_solver import check_level
+
+FIELDS = ['file', 'width', 'height', 'lines', 'cells', 'min_len', 'max_len', 'mean_len',
+          'lengths', 'valid', 'errors', 'unique', 'ambiguous_lines', 'solve_ms']
+# 每个文件最多记录多少条错误，避免坏文件把汇总表撑爆
+MAX_ERRORS = 20
+# 扫描目录时收集的文件扩展名（.sparse.json 也匹配 *.json）
+MAP_PATTERNS = ['*.json', '*.json.gz', '*.mapb']
+
+
+# ----------------- 校验 -----------------
+
+def validate_map(lines):
+    """
+    校验线条数据，返回 (按 id 排序的线条长度列表, 错误列表)
+    - 每条线的 nodeIndex 必须是 1..n 且不重复
+    - 按 nodeIndex 排序后相邻两点必须上下左右相邻
+    - 同一个格子不能属于多条线（或在同一条线里出现两次）
+    """
+    errors = []
+    lengths = []
+    owner = {}
+    for line_id in sorted(lines):
+        nodes = sorted(lines[line_id])
+        lengths.append(len(nodes))
+        indexes = [n for n, _, _ in nodes]
+        if indexes != list(range(1, len(nodes) + 1)):
+            errors.append(f'线条 {line_id}: nodeIndex 不连续 {compact_range(indexes)}')
+        for (_, x0, y0), (n1, x1, y1) in zip(nodes, nodes[1:]):
+            if abs(x1 - x0) + abs(y1 - y0) != 1:
+                errors.append(f'线条 {line_id}: 节点 {n1 - 1}->{n1} ({x0}, {y0})->({x1}, {y1}) 不相邻')
+        for _, x, y in nodes:
+            other = owner.get((x, y))
+            if other is None:
+                owner[(x, y)] = line_id
+            elif other == line_id:
+                errors.append(f'线条 {line_id}: 格子 ({x}, {y}) 经过两次')
+            else:
+                errors.append(f'格子 ({x}, {y}) 同时属于线条 {other} 和 {line_id}')
+    return lengths, errors
+
+
+def compact_range(values, limit=8):
+    """错误信息里只显示前几个编号"""
+    text = ','.join(map(str, values[:limit]))
+    return f'[{text},...]' if len(values) > limit else f'[{text}]'
+
+
+def check_file(path, solve=False, solve_timeout=None):
+    """子进程入口：读取并校验单个文件，返回汇总行；solve 为 True 时对校验通过的文件做唯一解检查"""
+    row = dict.fromkeys(FIELDS, '')
+    row['file'] = path
+    try:
+        width, height, lines, errors = load_map(path)
+        lengths, line_errors = validate_map(lines)
+        errors += line_errors
+    except (OSError, ValueError, MapFormatError) as e:
+        # json.JSONDecodeError 是 ValueError 的子类
+        row.update(valid=False, errors=f'读取失败: {e}')
+        return row
+    row.update(
+        width=width,
+        height=height,
+        lines=len(lengths),
+        cells=sum(lengths),
+        min_len=min(lengths) if lengths else 0,
+        max_len=max(lengths) if lengths else 0,
+        mean_len=round(sum(lengths) / len(lengths), 2) if lengths else 0,
+        lengths=';'.join(map(str, lengths)),
+        valid=not errors,
+        errors='; '.join(errors[:MAX_ERRORS]) + (f'; ...共 {len(errors)} 条' if len(errors) > MAX_ERRORS else ''),
+    )
+    if solve and not errors:
+        solve_row(row, width, height, lines, solve_timeout)
+    return row
+
+
+def solve_row(row, width, height, lines, timeout):
+    """unique 为 True / False，任意一条线条超时则为 'timeout'"""
+    points = {line_id: [(x, y) for _, x, y in sorted(nodes)] for line_id, nodes in lines.items()}
+    results = check_level(width, height, points, timeout=timeout)
+    ambiguous = [line_id for line_id, r in results.items() if r['solutions'] not in (1, None)]
+    timed_out = any(r['solutions'] is None for r in results.values())
+    row.update(
+        unique='timeout' if timed_out else not ambiguous,
+        ambiguous_lines=';'.join(map(str, ambiguous)),
+        solve_ms=round(sum(r['ms'] for r in results.values()), 2),
+    )
+
+
+def check_batch(paths, workers=None, solve=False, solve_timeout=None):
+    """按输入顺序产出每个文件的汇总行（生成器），workers 为 None 时使用全部 CPU 核"""
+    task = partial(check_file, solve=solve, solve_timeout=solve_timeout)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        yield from map(task, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(task, paths, chunksize=max(1, min(64, len(paths) // (workers * 8))))
+
+
+# ----------------- 输出 -----------------
+
+def collect_paths(inputs, recursive=False):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = []
+            for pattern in MAP_PATTERNS:
+                pattern = os.path.join(item, '**', pattern) if recursive else os.path.join(item, pattern)
+                found.extend(glob.glob(pattern, recursive=recursive))
+            paths.extend(sorted(found))
+        else:
+            paths.append(item)
+    return paths
+
+
+def write_csv(rows, path):
+    # utf-8-sig 让 Excel 直接打开 CSV 时中文不乱码
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_excel(rows, path):
+    try:
+        import pandas as pd
+    except ImportError:
+        raise SystemExit('输出 .xlsx 需要安装 pandas 和 openpyxl，或改用 .csv 输出')
+    pd.DataFrame(rows, columns=FIELDS).to_excel(path, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程批量校验一笔画地图文件并输出汇总表')
+    parser.add_argument('inputs', nargs='+', help='地图文件或目录（目录下的 *.json / *.json.gz / *.mapb）')
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归扫描子目录')
+    parser.add_argument('--workers', type=int, help='进程数，默认 CPU 核数')
+    parser.add_argument('-o', '--output', default='map_summary.csv', help='汇总表路径，.csv 或 .xlsx')
+    parser.add_argument('--errors-only', action='store_true', help='汇总表只保留校验失败的文件')
+    parser.add_argument('--solve', action='store_true', help='检查每条线条是否唯一解')
+    parser.add_argument('--solve-timeout', type=float, default=10.0, help='每个文件的求解时限（秒）')
+    args = parser.parse_args()
+
+    paths = collect_paths(args.inputs, args.recursive)
+    if not paths:
+        raise SystemExit('没有找到地图文件')
+
+    start = time.time()
+    rows = []
+    bad = 0
+    for n, row in enumerate(check_batch(paths, args.workers, args.solve, args.solve_timeout), 1):
+        if not row['valid']:
+            bad += 1
+            print(f"{row['file']}: {row['errors']}", file=sys.stderr)
+        elif args.solve and row['unique'] is not True:
+            bad += 1
+            detail = '求解超时' if row['unique'] == 'timeout' else f"线条 {row['ambiguous_lines']} 不是唯一解"
+            print(f"{row['file']}: {detail}", file=sys.stderr)
+        if n % 100 == 0:
+            print(f'\r{n}/{len(paths)}', end='', file=sys.stderr, flush=True)
+        if not (row['valid'] and row['unique'] in ('', True) and args.errors_only):
+            rows.append(row)
+
+    if args.output.lower().endswith(('.xlsx', '.xls')):
+        write_excel(rows, args.output)
+    else:
+        write_csv(rows, args.output)
+    elapsed = max(time.time() - start, 1e-9)
+    print(f'\r完成 {len(paths)} 个文件，{bad} 个未通过校验，用时 {elapsed:.1f}s，汇总已写入 {args.output}',
+          file=sys.stderr)
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,11 @@ import tkinter as tk
 from tkinter import filedialog
 from typing import List, Tuple, Dict, Optional
 
+from map_format import MapFormatError, load_map, save_map
+from map_history import EditHistory
+from map_model import LINE, START, GridModel
+from map_solver import check_line
+
 # 定义颜色
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -29,6 +34,21 @@ OLIVE = (128, 128, 0)
 # 线条颜色列表
 LINE_COLORS = [BLUE, GREEN, PURPLE, ORANGE, CYAN, MAGENTA, LIME, TEAL, PINK, MAROON, NAVY, OLIVE]
 
+# 主循环帧率上限
+FPS = 60
+
+# 视口：网格区域最大尺寸（超出部分靠平移查看），缩放时格子大小范围，
+# 格子小于 LABEL_MIN_CELL_SIZE 时不再绘制坐标和编号文字
+MAX_VIEW_WIDTH = 1200
+MAX_VIEW_HEIGHT = 800
+MIN_CELL_SIZE = 4
+MAX_CELL_SIZE = 80
+LABEL_MIN_CELL_SIZE = 30
+ZOOM_STEP = 1.25
+PAN_STEP_CELLS = 3
+# “验证”按钮检查整张地图的总时限（秒）
+VERIFY_TIMEOUT = 5.0
+
 
 class MapEditor:
     def __init__(self):
@@ -41,28 +61,40 @@ class MapEditor:
         self.start_color = RED
         self.default_color = GREEN
 
+        # 摄像机：视口左上角在整张网格上的像素偏移，缩放即改变 cell_size
+        self.camera_x = 0
+        self.camera_y = 0
+        self.panning = False
+
         # 计算窗口大小
         self.sidebar_width = 250
-        self.window_width = self.grid_width * self.cell_size + self.sidebar_width
-        self.window_height = max(self.grid_height * self.cell_size, 450)
+        view_width, view_height = self.view_size_for_grid()
+        self.window_width = view_width + self.sidebar_width
+        self.window_height = max(view_height, 450)
         self.min_window_width = 600
         self.min_window_height = 450
 
         # 创建可调整大小的窗口
         self.screen = pygame.display.set_mode((self.window_width, self.window_height), pygame.RESIZABLE)
 
-        # 初始化字体
-        self.font = self.get_system_font()
-        self.small_font = self.get_system_font(size=16)
+        # 渲染缓存：字体按字号缓存，文字表面按 (文字, 字号, 颜色) 缓存，本地化文本按原文缓存
+        self.font_cache: Dict[int, pygame.font.Font] = {}
+        self.text_cache: Dict[Tuple[str, int, Tuple[int, int, int]], pygame.Surface] = {}
+        self.localized_cache: Dict[Tuple[str, str], str] = {}
 
-        # 初始化网格数据
-        self.grid: List[List[int]] = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        # 线条数据格式: {线编号: {"points": [(x,y), ...], "numbers": [0,1,2,...]}}
-        self.lines: Dict[int, Dict] = {}
-        self.current_line: List[Tuple[int, int]] = []
+        # 初始化字体
+        self.font = self.get_font()
+        self.small_font = self.get_font(16)
+
+        # 初始化网格数据：格子状态、所属线条和线条的点都在 GridModel 里（见 map_model.py），
+        # 格子内容变化时通过 mark_dirty 通知重画
+        self.model = GridModel(self.grid_width, self.grid_height, self.mark_dirty)
+        # 正在拖动绘制的线条编号（绘制中的线条也放在 model 里，松开鼠标时不足两个格子则删除）
+        self.drawing_line: Optional[int] = None
         self.dragging = False
         self.selected_start: Optional[Tuple[int, int]] = None
-        self.next_line_id = 0  # 下一条线的编号
+        # 撤销 / 重做：每次编辑只记录改动的线条和格子（见 map_history.py）
+        self.history = EditHistory()
 
         # 临时消息变量
         self.temp_message = None
@@ -71,6 +103,15 @@ class MapEditor:
         # 橡皮擦模式
         self.eraser_mode = False
 
+        # 局部重绘：网格画在缓存表面上，只重画被改动的格子，再把改动区域提交到屏幕
+        self.grid_surface: Optional[pygame.Surface] = None
+        self.dirty_cells = set()
+        self.redraw_all = True  # 网格尺寸/格子大小变化时整体重画
+        self.sidebar_dirty = True
+        self.mouse_in_sidebar = False
+        self.message_rect: Optional[pygame.Rect] = None
+        self.clock = pygame.time.Clock()
+
         # 创建UI元素
         self.create_ui_elements()
 
@@ -92,10 +133,77 @@ class MapEditor:
         #  fallback到默认字体
         return pygame.font.Font(None, size)
 
+    def view_size_for_grid(self) -> Tuple[int, int]:
+        """按网格大小计算视口大小，过大的网格截到 MAX_VIEW_*"""
+        return (min(self.grid_width * self.cell_size, MAX_VIEW_WIDTH),
+                min(self.grid_height * self.cell_size, MAX_VIEW_HEIGHT))
+
+    @property
+    def view_width(self) -> int:
+        """视口（网格区域）宽度，侧边栏紧挨在它右边"""
+        return self.window_width - self.sidebar_width
+
+    @property
+    def view_height(self) -> int:
+        return self.window_height
+
+    def clamp_camera(self):
+        """把摄像机限制在网格范围内"""
+        self.camera_x = max(0, min(self.camera_x, self.grid_width * self.cell_size - self.view_width))
+        self.camera_y = max(0, min(self.camera_y, self.grid_height * self.cell_size - self.view_height))
+
+    def pan(self, dx: int, dy: int):
+        """平移视口（像素）"""
+        old = (self.camera_x, self.camera_y)
+        self.camera_x += dx
+        self.camera_y += dy
+        self.clamp_camera()
+        if (self.camera_x, self.camera_y) != old:
+            self.redraw_all = True
+
+    def zoom_at(self, pos: Tuple[int, int], steps: int):
+        """以屏幕位置 pos 为中心缩放，steps > 0 放大"""
+        old = self.cell_size
+        new = int(round(old * ZOOM_STEP ** steps))
+        if new == old:
+            new += 1 if steps > 0 else -1
+        new = max(MIN_CELL_SIZE, min(MAX_CELL_SIZE, new))
+        if new == old:
+            return
+        # 保持鼠标下的网格位置不动
+        mx, my = pos
+        world_x = (mx + self.camera_x) / old
+        world_y = (my + self.camera_y) / old
+        self.cell_size = new
+        self.camera_x = int(world_x * new - mx)
+        self.camera_y = int(world_y * new - my)
+        self.clamp_camera()
+        self.redraw_all = True
+
+    def get_font(self, size=24):
+        """按字号取缓存的字体，避免每次 SysFont 查找和测试渲染"""
+        font = self.font_cache.get(size)
+        if font is None:
+            font = self.font_cache[size] = self.get_system_font(size)
+        return font
+
+    def render_text(self, text, size, color=BLACK):
+        """按 (文字, 字号, 颜色) 取缓存的文字表面"""
+        key = (text, size, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = self.text_cache[key] = self.get_font(size).render(text, True, color)
+        return surface
+
+    def clear_render_cache(self):
+        """网格或窗口大小变化时清空文字缓存，避免缓存旧尺寸下的标签"""
+        self.text_cache = {}
+        self.localized_cache = {}
+
     def create_ui_elements(self):
         """创建UI元素"""
         # 网格大小输入框 - 位置在右侧面板
-        sidebar_x = self.grid_width * self.cell_size
+        sidebar_x = self.view_width
         self.width_input = InputBox(sidebar_x + 10, 30, 80, 30, str(self.grid_width))
         self.height_input = InputBox(sidebar_x + 100, 30, 80, 30, str(self.grid_height))
 
@@ -108,7 +216,8 @@ class MapEditor:
                                     self.get_localized_text("导出为JSON", "Export to JSON"))
         self.import_button = Button(sidebar_x + 10, 190, 230, 30,
                                     self.get_localized_text("导入JSON", "Import JSON"))
-        self.eraser_button = Button(sidebar_x + 10, 230, 230, 30, self.get_localized_text("橡皮擦模式", "Eraser Mode"))
+        self.eraser_button = Button(sidebar_x + 10, 230, 110, 30, self.get_localized_text("橡皮擦模式", "Eraser Mode"))
+        self.verify_button = Button(sidebar_x + 130, 230, 110, 30, self.get_localized_text("验证唯一解", "Verify"))
 
         # 标签 - 位置在右侧面板
         self.width_label = self.font.render(self.get_localized_text("宽度:", "Width:"), True, WHITE)
@@ -132,12 +241,17 @@ class MapEditor:
 
     def get_localized_text(self, chinese_text, english_text):
         """获取本地化文本，如果中文显示有问题则使用英文"""
-        # 测试中文字体是否能正常渲染
-        test_surface = self.font.render(chinese_text, True, WHITE)
-        if test_surface.get_width() > 0 and not self.is_text_gibberish(chinese_text, test_surface):
-            return chinese_text
-        else:
-            return english_text
+        key = (chinese_text, english_text)
+        text = self.localized_cache.get(key)
+        if text is None:
+            # 测试中文字体是否能正常渲染
+            test_surface = self.font.render(chinese_text, True, WHITE)
+            if test_surface.get_width() > 0 and not self.is_text_gibberish(chinese_text, test_surface):
+                text = chinese_text
+            else:
+                text = english_text
+            self.localized_cache[key] = text
+        return text
 
     def is_text_gibberish(self, text, surface):
         """检测文本是否显示为乱码（方块）"""
@@ -145,54 +259,74 @@ class MapEditor:
         return avg_char_width < 5  # 假设正常字符宽度至少为5像素
 
     def draw_grid(self):
-        """绘制网格，包含坐标和编号"""
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                rect = pygame.Rect(x * self.cell_size, y * self.cell_size, self.cell_size, self.cell_size)
-                pygame.draw.rect(self.screen, GRAY, rect, 1)
-
-                # 绘制网格内容
-                value = self.grid[y][x]
-                if value == 1:
-                    pygame.draw.rect(self.screen, self.start_color, rect)
-                elif value == 2:
-                    # 查找该单元格所属的线条ID，使用对应的线条颜色
-                    line_id, _ = self.get_line_info((x, y))
-                    if line_id is not None:
-                        # 使用线条ID从颜色列表中选择颜色，如果颜色列表不够则循环使用
-                        color_index = line_id % len(LINE_COLORS)
-                        pygame.draw.rect(self.screen, LINE_COLORS[color_index], rect)
-                    else:
-                        pygame.draw.rect(self.screen, self.default_color, rect)
-
-                # 绘制网格坐标 x,y
-                coord_text = f"{x},{y}"
-                # 创建比small_font小1个字号的字体
-                smaller_font = self.get_system_font(size=15)
-                coord_surface = smaller_font.render(coord_text, True, BLACK)
-                self.screen.blit(coord_surface, (x * self.cell_size + 2, y * self.cell_size + 2))
-
-                # 绘制线条编号（如果有）
-                line_id, point_num = self.get_line_info((x, y))
-                if line_id is not None and point_num is not None:
-                    # 线条ID从1开始显示，点编号从1开始显示
-                    num_text = f"#{line_id + 1}-{point_num + 1}"
-                    num_surface = self.small_font.render(num_text, True, BLACK)
-                    # 显示在格子右下角
-                    self.screen.blit(num_surface, (x * self.cell_size + 5, y * self.cell_size + self.cell_size - 20))
+        """在视口缓存表面上绘制可见范围内的网格，包含坐标和编号"""
+        size = (self.view_width, self.view_height)
+        if self.grid_surface is None or self.grid_surface.get_size() != size:
+            self.grid_surface = pygame.Surface(size)
+        self.grid_surface.fill(WHITE)
+        # 只画落在视口里的格子
+        x0 = self.camera_x // self.cell_size
+        y0 = self.camera_y // self.cell_size
+        x1 = min(self.grid_width, (self.camera_x + self.view_width - 1) // self.cell_size + 1)
+        y1 = min(self.grid_height, (self.camera_y + self.view_height - 1) // self.cell_size + 1)
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                self.draw_cell(x, y)
+
+    def draw_cell(self, x: int, y: int) -> pygame.Rect:
+        """在视口缓存表面上重画一个格子，返回该格子在视口内的可见矩形（不可见时为空矩形）"""
+        surface = self.grid_surface
+        left = x * self.cell_size - self.camera_x
+        top = y * self.cell_size - self.camera_y
+        rect = pygame.Rect(left, top, self.cell_size, self.cell_size)
+        visible = rect.clip(surface.get_rect())
+        if not visible.width or not visible.height:
+            return visible
+        surface.fill(WHITE, rect)
+        pygame.draw.rect(surface, GRAY, rect, 1)
+
+        # 绘制网格内容
+        value = self.model.get_state((x, y))
+        if value == START:
+            pygame.draw.rect(surface, self.start_color, rect)
+        elif value == LINE:
+            # 查找该单元格所属的线条ID，使用对应的线条颜色
+            line_id, _ = self.get_line_info((x, y))
+            if line_id is not None:
+                # 使用线条ID从颜色列表中选择颜色，如果颜色列表不够则循环使用
+                color_index = line_id % len(LINE_COLORS)
+                pygame.draw.rect(surface, LINE_COLORS[color_index], rect)
+            else:
+                pygame.draw.rect(surface, self.default_color, rect)
+
+        # 缩得太小时文字看不清，只画颜色
+        if self.cell_size < LABEL_MIN_CELL_SIZE:
+            return visible
+
+        # 绘制网格坐标 x,y（比small_font小1个字号）
+        coord_surface = self.render_text(f"{x},{y}", 15)
+        surface.blit(coord_surface, (left + 2, top + 2))
+
+        # 绘制线条编号（如果有）
+        line_id, point_num = self.get_line_info((x, y))
+        if line_id is not None and point_num is not None:
+            # 线条ID从1开始显示，点编号从1开始显示
+            num_surface = self.render_text(f"#{line_id + 1}-{point_num + 1}", 16)
+            # 显示在格子右下角
+            surface.blit(num_surface, (left + 5, top + self.cell_size - 20))
+        return visible
+
+    def mark_dirty(self, cell: Tuple[int, int]):
+        """标记格子需要在下一帧重画"""
+        self.dirty_cells.add(cell)
 
     def get_line_info(self, cell: Tuple[int, int]) -> Tuple[Optional[int], Optional[int]]:
         """获取单元格所属的线条ID和点编号"""
-        x, y = cell
-        for line_id, line_data in self.lines.items():
-            if cell in line_data["points"]:
-                idx = line_data["points"].index(cell)
-                return line_id, line_data["numbers"][idx]
-        return None, None
+        return self.model.line_info(cell)
 
     def draw_sidebar(self):
         """绘制侧边栏"""
-        sidebar_x = self.grid_width * self.cell_size
+        sidebar_x = self.view_width
 
         # 绘制侧边栏背景
         sidebar_rect = pygame.Rect(sidebar_x, 0, self.sidebar_width, self.window_height)
@@ -227,79 +361,86 @@ class MapEditor:
             self.eraser_button.color = GRAY
             self.eraser_button.hover_color = LIGHT_GRAY
         self.eraser_button.draw(self.screen)
+        self.verify_button.draw(self.screen)
 
         # 绘制当前线条信息
-        if self.current_line:
-            line_info = self.get_localized_text(f"当前线条: {len(self.current_line)}个格子",
-                                                f"Current Line: {len(self.current_line)} cells")
-            line_surface = self.font.render(line_info, True, WHITE)
+        if self.drawing_line is not None:
+            length = self.model.length(self.drawing_line)
+            line_info = self.get_localized_text(f"当前线条: {length}个格子",
+                                                f"Current Line: {length} cells")
+            line_surface = self.render_text(line_info, 24, WHITE)
             self.screen.blit(line_surface, (sidebar_x + 10, 410))
 
-        # 绘制总线条信息
-        total_lines = len(self.lines)
+        # 绘制总线条信息（不含正在绘制的线条）
+        total_lines = len(self.model.lines) - (self.drawing_line is not None)
         lines_info = self.get_localized_text(f"总线条数: {total_lines}",
                                              f"Total Lines: {total_lines}")
-        lines_surface = self.font.render(lines_info, True, WHITE)
+        lines_surface = self.render_text(lines_info, 24, WHITE)
         self.screen.blit(lines_surface, (sidebar_x + 10, 440))
 
     def get_cell_at_pos(self, pos: Tuple[int, int]) -> Optional[Tuple[int, int]]:
         """根据鼠标位置获取网格坐标"""
         x, y = pos
-        if x < 0 or x >= self.grid_width * self.cell_size or y < 0 or y >= self.grid_height * self.cell_size:
+        if x < 0 or x >= self.view_width or y < 0 or y >= self.view_height:
+            return None
+        cell_x = (x + self.camera_x) // self.cell_size
+        cell_y = (y + self.camera_y) // self.cell_size
+        if cell_x >= self.grid_width or cell_y >= self.grid_height:
             return None
-        return (x // self.cell_size, y // self.cell_size)
+        return (cell_x, cell_y)
 
     def start_new_line(self, cell: Tuple[int, int]):
         """开始绘制新线条"""
-        self.current_line = [cell]
-        self.grid[cell[1]][cell[0]] = 2
+        self.drawing_line = self.model.new_line(cell)
         self.dragging = True
 
     def add_point_to_line(self, cell: Tuple[int, int]):
-        """向当前线条添加点"""
-        if cell not in self.current_line:
-            # 检查是否与已有线条重叠（除了端点）
-            if len(self.current_line) > 1 and self.grid[cell[1]][cell[0]] == 2:
-                # 找到最近的端点并连接
-                for line_id, line_data in list(self.lines.items()):
-                    if cell in line_data["points"]:
-                        # 合并线条
-                        line_points = line_data["points"]
-                        if line_points[0] == cell:
-                            self.current_line = line_points + self.current_line[1:]
-                        else:
-                            self.current_line += line_points[1:]
-                        del self.lines[line_id]
-                        break
+        """向当前线条添加点：只能接在线尾的相邻空格子上；拖到其它线条的端点时把两条线合并"""
+        if self.drawing_line is None:
+            return
+        tail = self.model.lines[self.drawing_line].tail
+        if abs(cell[0] - tail[0]) + abs(cell[1] - tail[1]) != 1:
+            return
+        line_id = self.model.line_at(cell)
+        if line_id is None:
+            self.model.append(self.drawing_line, cell)
+            return
+        if line_id == self.drawing_line:
+            return
+        # 线条之间不能重叠，只有拖到其它线条的端点时才连接
+        target = self.model.lines[line_id]
+        if cell != target.head and cell != target.tail:
+            return
+        if len(target) > 1 and self.model.get_state(cell) == START:
+            # 起点被接上后不再是端点
+            self.history.record(("state", cell, START, LINE))
+            self.model.set_state(cell, LINE)
+            if self.selected_start == cell:
+                self.selected_start = None
+        cells, at_head = self.model.merge(self.drawing_line, line_id, cell)
+        self.history.record(("extend", line_id, cells, at_head))
+        self.history.commit()
+        self.drawing_line = None
+        self.dragging = False
 
-            self.current_line.append(cell)
-            self.grid[cell[1]][cell[0]] = 2
+    def can_place_line(self, points: List[Tuple[int, int]]) -> bool:
+        """整条线能否放进当前网格：都在网格内、不与已有线条或自身重叠、相邻点上下左右相邻"""
+        if len(set(points)) != len(points):
+            return False
+        if any(not self.model.in_bounds(p) or self.model.line_at(p) is not None for p in points):
+            return False
+        return all(abs(x1 - x0) + abs(y1 - y0) == 1 for (x0, y0), (x1, y1) in zip(points, points[1:]))
 
     def end_line(self):
-        """结束当前线条绘制，分配编号（复用已删除线条的编号）"""
-        if len(self.current_line) >= 2:
-            # 找到最小的未使用编号
-            used_ids = set(self.lines.keys())
-            new_line_id = 0
-            while new_line_id in used_ids:
-                new_line_id += 1
-            
-            # 为新线条创建编号（从0开始）
-            line_numbers = list(range(len(self.current_line)))
-            # 存储线条数据，包含点坐标和编号
-            self.lines[new_line_id] = {
-                "points": self.current_line.copy(),
-                "numbers": line_numbers
-            }
-            # 更新next_line_id，但不影响编号复用逻辑
-            if new_line_id >= self.next_line_id:
-                self.next_line_id = new_line_id + 1
-        else:
-            # 如果线条只有一个点，清除它
-            if self.current_line:
-                x, y = self.current_line[0]
-                self.grid[y][x] = 0
-        self.current_line = []
+        """结束当前线条绘制（线条编号在开始绘制时已分配，复用已删除线条的编号）"""
+        if self.drawing_line is not None:
+            if self.model.length(self.drawing_line) < 2:
+                # 如果线条只有一个点，清除它
+                self.model.remove_line(self.drawing_line)
+            else:
+                self.history.record_line("add", self.model, self.drawing_line)
+                self.history.commit()
+        self.drawing_line = None
         self.dragging = False
 
     def set_window_caption(self):
@@ -310,99 +451,131 @@ class MapEditor:
     def set_start_point(self, cell: Tuple[int, int]):
         """设置起点（属性1）"""
         # 找到包含该单元格的线条
-        line_id = None
-        point_index = -1
-
-        for lid, line_data in self.lines.items():
-            if cell in line_data["points"]:
-                line_id = lid
-                point_index = line_data["points"].index(cell)
-                break
+        line_id = self.model.line_at(cell)
 
         if line_id is None:
             return
 
-        line_points = self.lines[line_id]["points"]
+        line = self.model.lines[line_id]
 
         # 检查是否是端点
-        if point_index != 0 and point_index != len(line_points) - 1:
+        if cell != line.head and cell != line.tail:
             return
 
-        # 清除当前线条的起点
-        for x, y in line_points:
-            if self.grid[y][x] == 1:
-                self.grid[y][x] = 2
+        # 清除当前线条的起点（起点只可能在两个端点上）
+        other = line.tail if cell == line.head else line.head
+        if self.model.get_state(other) == START:
+            self.history.record(("state", other, START, LINE))
+            self.model.set_state(other, LINE)
 
         # 设置新起点
-        x, y = cell
-        self.grid[y][x] = 1
+        self.history.record(("state", cell, self.model.get_state(cell), START))
+        self.model.set_state(cell, START)
+        self.history.commit()
         self.selected_start = cell
 
+    def clear_start_point(self, cell: Tuple[int, int]):
+        """清除起点（属性1改回2）"""
+        self.history.record(("state", cell, START, LINE))
+        self.model.set_state(cell, LINE)
+        self.history.commit()
+        self.selected_start = None
+
     def clear_all(self):
-        """清除所有线条"""
-        self.grid = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        self.lines = {}
-        self.current_line = []
+        """清除所有线条（可撤销）"""
+        for line_id in sorted(self.model.lines):
+            self.history.record_line("remove", self.model, line_id)
+        self.history.commit()
+        self.model.clear()
+        self.drawing_line = None
         self.selected_start = None
-        self.next_line_id = 0  # 重置线条编号
+        self.redraw_all = True
         # 如果在橡皮擦模式，退出橡皮擦模式
         if self.eraser_mode:
             self.eraser_mode = False
 
     def erase_cell(self, cell: Tuple[int, int]):
         """擦除包含该单元格的线条"""
-        x, y = cell
-
-        # 如果单元格没有线条，直接返回
-        if self.grid[y][x] == 0:
-            return
-
-        # 找到包含该单元格的线条
-        line_to_remove = None
-        for line_id, line_data in self.lines.items():
-            if cell in line_data["points"]:
-                line_to_remove = line_id
-                break
+        # 找到包含该单元格的线条，没有线条直接返回
+        line_to_remove = self.model.line_at(cell)
 
         if line_to_remove is not None:
-            # 清除该线条的所有格子
-            for px, py in self.lines[line_to_remove]["points"]:
-                self.grid[py][px] = 0
-
-            # 移除线条
-            del self.lines[line_to_remove]
+            # 清除该线条的所有格子（model 会把它们标记为需要重画）
+            self.history.record_line("remove", self.model, line_to_remove)
+            self.history.commit()
+            points = self.model.remove_line(line_to_remove)
 
             # 如果删除的是起点，清除选中的起点
-            if self.selected_start == cell:
+            if self.selected_start in (points[0], points[-1]):
                 self.selected_start = None
 
             # 显示提示信息
-            erase_msg = self.get_localized_text("已擦除线条", "Line erased")
+            erase_msg = self.get_localized_text("已擦除线条（Ctrl+Z 撤销）", "Line erased (Ctrl+Z to undo)")
             self.show_temp_message(erase_msg, 500)
 
+    def undo(self):
+        """撤销上一次编辑，只按记录的增量改动 model，不重建网格和窗口"""
+        if self.dragging:
+            return
+        if self.history.undo(self.model):
+            self.selected_start = None
+            self.show_temp_message(self.get_localized_text("已撤销", "Undone"), 500)
+        else:
+            self.show_temp_message(self.get_localized_text("没有可撤销的操作", "Nothing to undo"), 1000)
+
+    def redo(self):
+        """重做上一次撤销的编辑"""
+        if self.dragging:
+            return
+        if self.history.redo(self.model):
+            self.selected_start = None
+            self.show_temp_message(self.get_localized_text("已重做", "Redone"), 500)
+        else:
+            self.show_temp_message(self.get_localized_text("没有可重做的操作", "Nothing to redo"), 1000)
+
+    def verify_level(self):
+        """检查每条线条从起点出发是否只有唯一的一笔画解（见 map_solver.py），结果显示在提示信息里"""
+        if not self.model.lines:
+            self.show_temp_message(self.get_localized_text("没有可验证的线条", "No lines to verify"), 1500)
+            return
+
+        deadline = pygame.time.get_ticks() + VERIFY_TIMEOUT * 1000
+        ambiguous = []
+        timed_out = []
+        for line_id in sorted(self.model.lines):
+            points = self.model.points(line_id)
+            # 起点可能被设在了线条末端
+            start = self.model.start_of(line_id)
+            remaining = max(deadline - pygame.time.get_ticks(), 1) / 1000
+            result = check_line(self.grid_width, self.grid_height, points, start, timeout=remaining)
+            if result["solutions"] is None:
+                timed_out.append(line_id + 1)
+            elif result["solutions"] != 1:
+                ambiguous.append(line_id + 1)
+                if result["alternative"]:
+                    print(self.get_localized_text(f"线条 {line_id + 1} 的另一个解: {result['alternative']}",
+                                                  f"Line {line_id + 1} alternative: {result['alternative']}"))
+
+        if ambiguous:
+            ids = ", ".join(map(str, ambiguous))
+            msg = self.get_localized_text(f"线条 {ids} 有多个解", f"Lines {ids} have multiple solutions")
+        elif timed_out:
+            ids = ", ".join(map(str, timed_out))
+            msg = self.get_localized_text(f"线条 {ids} 求解超时", f"Lines {ids} timed out")
+        else:
+            total = len(self.model.lines)
+            msg = self.get_localized_text(f"验证通过：{total} 条线条都是唯一解",
+                                          f"OK: all {total} lines have a unique solution")
+        print(msg)
+        self.show_temp_message(msg, 3000)
+
     def export_to_json(self):
-        """导出为JSON文件，让用户选择保存路径和文件名"""
-        # 准备导出数据 - 包含所有网格单元格
-        export_data = []
-
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                cell_data = {
-                    "x": x,
-                    "y": y,
-                    "id": 0,  # 0表示未被线条占用
-                    "nodeIndex": -1  # -1表示未被线条占用
-                }
-
-                # 检查该单元格是否被线条占用
-                line_id, point_num = self.get_line_info((x, y))
-                if line_id is not None and point_num is not None:
-                    # id从1开始计算（原线条ID+1）
-                    cell_data["id"] = line_id + 1
-                    # nodeIndex从1开始计算（原点编号+1）
-                    cell_data["nodeIndex"] = point_num + 1
-
-                export_data.append(cell_data)
+        """导出地图，让用户选择保存路径和文件名；格式按扩展名决定（见 map_format.FORMAT_EXTENSIONS）"""
+        # 线条 id 和点编号在文件里都从1开始，起点设在线尾的线条倒序导出，保证文件里第一个点是起点
+        export_lines = {
+            line_id + 1: list(self.model.iter_points(line_id, reverse=self.model.start_of(line_id) != line.head))
+            for line_id, line in self.model.lines.items()
+        }
 
         try:
             # 创建一个临时的Tkinter根窗口并隐藏它
@@ -415,7 +588,11 @@ class MapEditor:
             # 打开文件保存对话框
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*")],
+                filetypes=[("JSON files", "*.json"),
+                           (self.get_localized_text("稀疏 JSON", "Sparse JSON"), "*.sparse.json"),
+                           (self.get_localized_text("稀疏 JSON (gzip)", "Sparse JSON (gzip)"), "*.json.gz"),
+                           (self.get_localized_text("二进制", "Binary"), "*.mapb"),
+                           ("All files", "*")],
                 title=self.get_localized_text("保存地图数据", "Save Map Data"),
                 initialfile="map_data.json"
             )
@@ -423,10 +600,8 @@ class MapEditor:
             # 关闭Tkinter窗口
             root.destroy()
             
-            # 如果用户选择了文件路径
             if file_path:
-                with open(file_path, "w", encoding="utf-8") as f:
-                    json.dump(export_data, f, indent=2, ensure_ascii=False)
+                save_map(file_path, self.grid_width, self.grid_height, export_lines)
 
                 # 显示导出成功提示
                 success_msg = self.get_localized_text(f"地图数据已导出到 {file_path}",
@@ -444,7 +619,7 @@ class MapEditor:
             self.show_temp_message(error_msg, 3000)
             
     def import_from_json(self):
-        """从JSON文件导入地图数据"""
+        """导入地图数据（cells / 稀疏 / gzip / 二进制格式自动识别）"""
         try:
             # 使用pygame的文件对话框选择文件
             import tkinter as tk
@@ -457,97 +632,68 @@ class MapEditor:
             # 打开文件选择对话框
             file_path = filedialog.askopenfilename(
                 title=self.get_localized_text("选择地图JSON文件", "Select Map JSON File"),
-                filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")]
+                filetypes=[(self.get_localized_text("地图文件", "Map Files"), "*.json *.json.gz *.mapb"),
+                           ("All Files", "*.*")]
             )
             
             # 如果用户取消选择，则返回
             if not file_path:
                 return
             
-            # 读取JSON文件
-            with open(file_path, "r", encoding="utf-8") as f:
-                import_data = json.load(f)
-            
-            # 分析导入数据，确定网格大小
-            max_x = 0
-            max_y = 0
-            for cell in import_data:
-                max_x = max(max_x, cell["x"])
-                max_y = max(max_y, cell["y"])
-            
-            # 调整网格大小
-            new_width = max_x + 1
-            new_height = max_y + 1
+            # 读取地图文件，line_cells 为 {id: [(nodeIndex, x, y), ...]}，id 和 nodeIndex 从1开始
+            new_width, new_height, line_cells, _ = load_map(file_path)
             
             # 重新设置网格
             self.grid_width = new_width
             self.grid_height = new_height
             
-            # 重新计算窗口大小
-            self.window_width = self.grid_width * self.cell_size + self.sidebar_width
-            self.window_height = max(self.grid_height * self.cell_size, 450)
+            # 重新计算窗口大小，视口回到左上角
+            view_width, view_height = self.view_size_for_grid()
+            self.window_width = view_width + self.sidebar_width
+            self.window_height = max(view_height, 450)
+            self.camera_x = self.camera_y = 0
             
             # 重新创建窗口
             self.screen = pygame.display.set_mode((self.window_width, self.window_height))
             
             # 重置数据
-            self.grid = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-            self.lines = {}
-            self.current_line = []
+            self.model = GridModel(self.grid_width, self.grid_height, self.mark_dirty)
+            self.history.clear()
+            self.drawing_line = None
             self.selected_start = None
-            self.next_line_id = 0
             
             # 重建UI元素
+            self.clear_render_cache()
             self.create_ui_elements()
+            self.redraw_all = True
             
-            # 按线条ID分组单元格数据
-            line_cells = {}
-            for cell in import_data:
-                x, y = cell["x"], cell["y"]
-                line_id = cell["id"] - 1  # 转回0开始的索引
-                node_index = cell["nodeIndex"] - 1  # 转回0开始的索引
-                
-                if line_id >= 0:
-                    if line_id not in line_cells:
-                        line_cells[line_id] = []
-                    line_cells[line_id].append((x, y, node_index))
-            
-            # 重建线条数据
-            for line_id, cells in line_cells.items():
+            # 重建线条数据（线条之间不能重叠、相邻点必须上下左右相邻，不满足的线条跳过）
+            skipped = 0
+            for file_line_id, cells in sorted(line_cells.items()):
                 # 按nodeIndex排序，确保点的顺序正确
-                cells.sort(key=lambda c: c[2])
-                
-                # 提取点坐标和编号
-                points = [(x, y) for x, y, _ in cells]
-                numbers = [i for _, _, i in cells]
-                
-                # 存储线条数据
-                self.lines[line_id] = {
-                    "points": points,
-                    "numbers": numbers
-                }
+                cells.sort()
+                points = [(x, y) for _, x, y in cells]
+                if not points or not self.can_place_line(points):
+                    skipped += 1
+                    continue
                 
-                # 更新网格数据
-                for x, y, _ in cells:
-                    self.grid[y][x] = 2
-                
-                # 如果线条不为空，将第一个点设为起点
-                if points:
-                    start_x, start_y = points[0]
-                    self.grid[start_y][start_x] = 1
-                    self.selected_start = (start_x, start_y)
-                
-                # 更新下一个线条ID
-                self.next_line_id = max(self.next_line_id, line_id + 1)
+                # 转回0开始的编号，第一个点设为起点
+                self.model.add_line(points, line_id=file_line_id - 1, start=points[0])
+                self.selected_start = points[0]
+            self.model.reset_ids()
             
+            if skipped:
+                print(self.get_localized_text(f"跳过 {skipped} 条重叠或不连续的线条",
+                                              f"Skipped {skipped} overlapping or broken lines"))
+
             # 显示导入成功提示
             success_msg = self.get_localized_text(f"成功导入地图数据，网格大小: {new_width}x{new_height}",
                                                   f"Successfully imported map data, grid size: {new_width}x{new_height}")
             print(success_msg)
             self.show_temp_message(success_msg, 2000)
             
-        except json.JSONDecodeError:
-            error_msg = self.get_localized_text("JSON文件格式错误", "Invalid JSON file format")
+        except (json.JSONDecodeError, MapFormatError):
+            error_msg = self.get_localized_text("地图文件格式错误", "Invalid map file format")
             print(error_msg)
             self.show_temp_message(error_msg, 3000)
         except Exception as e:
@@ -567,37 +713,14 @@ class MapEditor:
         self.grid_width = width
         self.grid_height = height
 
-        # 重新创建网格数据
-        # 保留已有的线条信息
-        old_grid = self.grid
-        old_lines = self.lines
-        
-        # 创建新的网格
-        self.grid = [[0 for _ in range(self.grid_width)] for _ in range(self.grid_height)]
-        
-        # 尝试将旧的线条信息复制到新的网格中（如果空间足够）
-        for line_id, line_data in old_lines.items():
-            points = line_data["points"]
-            numbers = line_data["numbers"]
-            
-            # 检查所有点是否都在新的网格范围内
-            all_points_valid = True
-            for x, y in points:
-                if x >= self.grid_width or y >= self.grid_height:
-                    all_points_valid = False
-                    break
-            
-            if all_points_valid:
-                # 如果所有点都有效，保留这条线
-                self.lines[line_id] = line_data
-                # 更新网格
-                for i, (x, y) in enumerate(points):
-                    # 起点标记为1，其他点标记为2
-                    self.grid[y][x] = 1 if i == 0 else 2
+        # 线条只保留完整落在新网格内的；历史里的增量按旧网格记录，不能再应用
+        self.model.resize(width, height)
+        self.history.clear()
         
         # 重新计算窗口大小
-        new_width = self.grid_width * self.cell_size + self.sidebar_width
-        new_height = max(self.grid_height * self.cell_size, 450)
+        view_width, view_height = self.view_size_for_grid()
+        new_width = view_width + self.sidebar_width
+        new_height = max(view_height, 450)
         
         # 确保窗口不小于最小尺寸
         self.window_width = max(new_width, self.min_window_width)
@@ -605,27 +728,29 @@ class MapEditor:
 
         # 重新创建可调整大小的窗口
         self.screen = pygame.display.set_mode((self.window_width, self.window_height), pygame.RESIZABLE)
+        self.clamp_camera()
 
         # 重置当前线条和选择的起点
-        self.current_line = []
+        self.drawing_line = None
         self.selected_start = None
-        
-        # 重新计算下一个可用的线条ID
-        if self.lines:
-            # 查找最小的未使用ID
-            used_ids = set(self.lines.keys())
-            self.next_line_id = 0
-            while self.next_line_id in used_ids:
-                self.next_line_id += 1
-        else:
-            self.next_line_id = 0
 
         # 重新创建UI元素
+        self.clear_render_cache()
         self.create_ui_elements()
+        self.redraw_all = True
 
     def handle_events(self):
         """处理事件"""
         for event in pygame.event.get():
+            # 侧边栏只在鼠标经过（按钮悬停）、拖线（线条计数变化）或其它输入时重画
+            if event.type == pygame.MOUSEMOTION:
+                in_sidebar = event.pos[0] >= self.view_width
+                if in_sidebar or self.mouse_in_sidebar or self.dragging:
+                    self.sidebar_dirty = True
+                self.mouse_in_sidebar = in_sidebar
+            else:
+                self.sidebar_dirty = True
+
             if event.type == pygame.QUIT:
                 return False
             
@@ -639,7 +764,7 @@ class MapEditor:
                 available_width = new_width - self.sidebar_width
                 self.cell_size = min(available_width // self.grid_width, new_height // self.grid_height)
                 # 确保单元格大小至少为10
-                self.cell_size = max(self.cell_size, 10)
+                self.cell_size = max(min(self.cell_size, MAX_CELL_SIZE), 10)
                 
                 # 更新窗口大小
                 self.window_width = new_width
@@ -647,9 +772,12 @@ class MapEditor:
                 
                 # 重新创建窗口
                 self.screen = pygame.display.set_mode((self.window_width, self.window_height), pygame.RESIZABLE)
+                self.clamp_camera()
                 
                 # 重新创建UI元素以适应新的窗口大小
+                self.clear_render_cache()
                 self.create_ui_elements()
+                self.redraw_all = True
 
             # 处理输入框事件
             self.width_input.handle_event(event)
@@ -686,32 +814,67 @@ class MapEditor:
                             self.get_localized_text("橡皮擦模式已关闭", "Eraser mode disabled")
                         self.show_temp_message(mode_msg, 1000)
 
+                    elif self.verify_button.is_clicked(pos):
+                        self.verify_level()
+
                     else:
                         # 检查是否点击了网格
                         cell = self.get_cell_at_pos(pos)
                         if cell:
-                            x, y = cell
-
                             # 如果在橡皮擦模式下
                             if self.eraser_mode:
                                 self.erase_cell(cell)
                             else:
                                 # 如果点击了已有线条的端点，设置为起点
-                                if self.grid[y][x] == 2:
+                                value = self.model.get_state(cell)
+                                if value == LINE:
                                     self.set_start_point(cell)
-                                elif self.grid[y][x] == 1:
+                                elif value == START:
                                     # 如果点击了已有的起点，清除它
-                                    self.grid[y][x] = 2
-                                    self.selected_start = None
+                                    self.clear_start_point(cell)
                                 else:
                                     # 开始绘制新线条
                                     self.start_new_line(cell)
 
+                elif event.button in (2, 3) and event.pos[0] < self.view_width:
+                    # 右键/中键拖动平移视口
+                    self.panning = True
+
+            elif event.type == pygame.MOUSEWHEEL:
+                # 滚轮以鼠标位置为中心缩放
+                pos = pygame.mouse.get_pos()
+                if pos[0] < self.view_width:
+                    self.zoom_at(pos, event.y)
+
+            elif event.type == pygame.KEYDOWN:
+                # 方向键平移视口，Ctrl+Z / Ctrl+Y 撤销重做（输入框输入时不响应）
+                if not (self.width_input.active or self.height_input.active):
+                    step = PAN_STEP_CELLS * self.cell_size
+                    ctrl = event.mod & pygame.KMOD_CTRL
+                    if ctrl and event.key == pygame.K_z:
+                        # Ctrl+Z 撤销，Ctrl+Shift+Z / Ctrl+Y 重做
+                        if event.mod & pygame.KMOD_SHIFT:
+                            self.redo()
+                        else:
+                            self.undo()
+                    elif ctrl and event.key == pygame.K_y:
+                        self.redo()
+                    elif event.key == pygame.K_LEFT:
+                        self.pan(-step, 0)
+                    elif event.key == pygame.K_RIGHT:
+                        self.pan(step, 0)
+                    elif event.key == pygame.K_UP:
+                        self.pan(0, -step)
+                    elif event.key == pygame.K_DOWN:
+                        self.pan(0, step)
+
             elif event.type == pygame.MOUSEMOTION:
-                if self.dragging:
+                if self.panning:
+                    self.pan(-event.rel[0], -event.rel[1])
+                elif self.dragging:
                     current_cell = self.get_cell_at_pos(event.pos)
                     if current_cell:
-                        last_cell = self.current_line[-1]
+                        last_cell = self.model.lines[self.drawing_line].tail
                         # 如果鼠标移动到了新单元格
                         if current_cell != last_cell:
                             # 计算当前单元格和上一个单元格之间的所有单元格
@@ -728,13 +891,19 @@ class MapEditor:
                                 for x in range(last_x + step, curr_x + step, step):
                                     self.add_point_to_line((x, last_y))
                             else:
-                                # 对于对角线移动，仍然只添加目标单元格
-                                # 这样可以避免意外添加不必要的单元格
-                                self.add_point_to_line(current_cell)
+                                # 对角线移动：线条的相邻点必须上下左右相邻，先横向再纵向走到目标单元格
+                                step = 1 if curr_x > last_x else -1
+                                for x in range(last_x + step, curr_x + step, step):
+                                    self.add_point_to_line((x, last_y))
+                                step = 1 if curr_y > last_y else -1
+                                for y in range(last_y + step, curr_y + step, step):
+                                    self.add_point_to_line((curr_x, y))
 
             elif event.type == pygame.MOUSEBUTTONUP:
                 if event.button == 1 and self.dragging:
                     self.end_line()
+                elif event.button in (2, 3):
+                    self.panning = False
 
         return True
 
@@ -742,42 +911,79 @@ class MapEditor:
         """显示临时消息"""
         self.temp_message = message
         self.message_time = pygame.time.get_ticks() + duration
+        # 先按无消息重画一次，盖掉可能还没过期的上一条消息
+        self.redraw_all = True
 
-    def draw_temp_message(self):
-        """绘制临时消息"""
-        if self.temp_message and pygame.time.get_ticks() < self.message_time:
-            text_surface = self.font.render(self.temp_message, True, WHITE)
-            text_rect = text_surface.get_rect(center=(self.window_width // 2, self.window_height // 2))
+    def draw_temp_message(self) -> Optional[pygame.Rect]:
+        """绘制临时消息，返回消息所占区域"""
+        text_surface = self.render_text(self.temp_message, 24, WHITE)
+        text_rect = text_surface.get_rect(center=(self.window_width // 2, self.window_height // 2))
 
-            # 绘制半透明背景
-            bg_rect = pygame.Rect(text_rect.x - 10, text_rect.y - 5, text_rect.width + 20, text_rect.height + 10)
-            pygame.draw.rect(self.screen, (0, 0, 0, 180), bg_rect, border_radius=5)
+        # 绘制半透明背景
+        bg_rect = pygame.Rect(text_rect.x - 10, text_rect.y - 5, text_rect.width + 20, text_rect.height + 10)
+        pygame.draw.rect(self.screen, (0, 0, 0, 180), bg_rect, border_radius=5)
 
-            # 绘制文本
-            self.screen.blit(text_surface, text_rect)
-        else:
+        # 绘制文本
+        self.screen.blit(text_surface, text_rect)
+        return bg_rect
+
+    def render_frame(self) -> List[pygame.Rect]:
+        """只重画有变化的部分，返回需要提交到屏幕的矩形列表"""
+        rects = []
+        # 临时消息到期：按无消息的画面整体重画一次
+        if self.temp_message and pygame.time.get_ticks() >= self.message_time:
             self.temp_message = None
+            self.redraw_all = True
 
-    def run(self):
-        """运行编辑器"""
-        running = True
-        while running:
+        if self.redraw_all:
             self.screen.fill(WHITE)
-
-            # 绘制网格
             self.draw_grid()
-
-            # 绘制侧边栏
+            self.screen.blit(self.grid_surface, (0, 0))
             self.draw_sidebar()
+            self.dirty_cells.clear()
+            self.redraw_all = False
+            self.sidebar_dirty = False
+            self.message_rect = None
+            rects.append(self.screen.get_rect())
+        else:
+            for x, y in self.dirty_cells:
+                if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+                    rect = self.draw_cell(x, y)
+                    # 视口外的格子不画也不提交
+                    if rect.width and rect.height:
+                        self.screen.blit(self.grid_surface, rect, rect)
+                        rects.append(rect)
+            # 格子有改动时线条计数可能变了，侧边栏一起重画
+            if self.dirty_cells:
+                self.sidebar_dirty = True
+            self.dirty_cells.clear()
+            if self.sidebar_dirty:
+                self.draw_sidebar()
+                self.sidebar_dirty = False
+                rects.append(pygame.Rect(self.view_width, 0, self.sidebar_width, self.window_height))
+
+        # 消息浮在最上层：刚出现或被下面的重画盖住时补画
+        if self.temp_message and (self.message_rect is None or self.message_rect.collidelist(rects) != -1):
+            self.message_rect = self.draw_temp_message()
+            rects.append(self.message_rect)
+        return rects
 
-            # 绘制临时消息
-            self.draw_temp_message()
-
+    def run(self):
+        """运行编辑器"""
+        running = True
+        while running:
             # 处理事件
             running = self.handle_events()
+            if not running:
+                break
+
+            # 只提交变化的区域；没有变化时不画也不提交
+            rects = self.render_frame()
+            if rects:
+                pygame.display.update(rects)
 
-            # 更新显示
-            pygame.display.flip()
+            # 限制帧率，空闲时让出 CPU
+            self.clock.tick(FPS)
 
         pygame.quit()
 
@@ -0,0 +1,229 @@
+"""
+map_format.py
+
+一笔画地图文件的读写（map_editor.py 和 map_batch.py 共用，不依赖 pygame）
+
+支持的格式（读取时自动识别，不看扩展名）：
+- cells        编辑器原有格式：每个格子一条 {x, y, id, nodeIndex}，空格子 id=0 / nodeIndex=-1
+- sparse       稀疏 JSON：只存线条，{"format": "sparse", "width", "height", "lines": [{"id", "points": [x0, y0, x1, y1, ...]}]}
+- sparse.gz    稀疏 JSON 再 gzip 压缩（文件头 1f 8b）
+- binary       二进制：文件头 + 每条线 (id, 点数, uint16 坐标数组)
+
+稀疏格式里点的顺序就是 nodeIndex 顺序（第 i 个点 nodeIndex = i + 1），
+文件大小和解析时间只与线条格数有关，与网格宽高无关。
+
+读取统一返回 (width, height, lines, errors)：
+lines 为 {id: [(nodeIndex, x, y), ...]}，id / nodeIndex 都从 1 开始（与 cells 格式一致）。
+"""
+
+import gzip
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+FORMAT_CELLS = 'cells'
+FORMAT_SPARSE = 'sparse'
+FORMAT_SPARSE_GZ = 'sparse.gz'
+FORMAT_BINARY = 'binary'
+FORMATS = [FORMAT_CELLS, FORMAT_SPARSE, FORMAT_SPARSE_GZ, FORMAT_BINARY]
+
+# 导出时按扩展名选择格式，未匹配的按 cells 处理
+FORMAT_EXTENSIONS = [
+    ('.sparse.json', FORMAT_SPARSE),
+    ('.json.gz', FORMAT_SPARSE_GZ),
+    ('.mapb', FORMAT_BINARY),
+    ('.json', FORMAT_CELLS),
+]
+
+SPARSE_VERSION = 1
+GZIP_MAGIC = b'\x1f\x8b'
+BINARY_MAGIC = b'MAP\x01'
+# 魔数, 宽, 高, 线条数
+BINARY_HEADER = struct.Struct('<4sHHI')
+# 线条 id, 点数
+BINARY_LINE = struct.Struct('<II')
+
+
+class MapFormatError(Exception):
+    pass
+
+
+def format_for_path(path):
+    lower = path.lower()
+    for ext, fmt in FORMAT_EXTENSIONS:
+        if lower.endswith(ext):
+            return fmt
+    return FORMAT_CELLS
+
+
+def detect_format(data):
+    if data[:2] == GZIP_MAGIC:
+        return FORMAT_SPARSE_GZ
+    if data[:4] == BINARY_MAGIC:
+        return FORMAT_BINARY
+    # JSON：顶层是列表为 cells，是对象为 sparse
+    head = data[:64].lstrip(b'\xef\xbb\xbf \t\r\n')
+    return FORMAT_SPARSE if head[:1] == b'{' else FORMAT_CELLS
+
+
+# ----------------- 编码 -----------------
+
+def encode_map(width, height, lines, fmt=FORMAT_SPARSE):
+    """
+    lines 为 {id: [(x, y), ...]}（id 从 1 开始，点按 nodeIndex 顺序），返回文件内容 bytes
+    """
+    if fmt == FORMAT_CELLS:
+        cells = [{"x": x, "y": y, "id": 0, "nodeIndex": -1} for y in range(height) for x in range(width)]
+        for line_id in sorted(lines):
+            for n, (x, y) in enumerate(lines[line_id], 1):
+                cell = cells[y * width + x]
+                # 重叠的格子只记录先出现的线条（cells 格式每格只能存一个 id）
+                if not cell["id"]:
+                    cell.update(id=line_id, nodeIndex=n)
+        return json.dumps(cells, indent=2, ensure_ascii=False).encode('utf-8')
+    if fmt in (FORMAT_SPARSE, FORMAT_SPARSE_GZ):
+        payload = {
+            "format": FORMAT_SPARSE,
+            "version": SPARSE_VERSION,
+            "width": width,
+            "height": height,
+            "lines": [{"id": line_id, "points": [v for p in lines[line_id] for v in p]}
+                      for line_id in sorted(lines)],
+        }
+        data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        # mtime=0 让同一张地图每次导出的字节完全一致，方便版本管理
+        return gzip.compress(data, mtime=0) if fmt == FORMAT_SPARSE_GZ else data
+    if fmt == FORMAT_BINARY:
+        parts = [BINARY_HEADER.pack(BINARY_MAGIC, width, height, len(lines))]
+        for line_id in sorted(lines):
+            coords = array('H', [v for p in lines[line_id] for v in p])
+            if sys.byteorder != 'little':
+                coords.byteswap()
+            parts.append(BINARY_LINE.pack(line_id, len(lines[line_id])))
+            parts.append(coords.tobytes())
+        return b''.join(parts)
+    raise ValueError(f'未知格式: {fmt}')
+
+
+# ----------------- 解码 -----------------
+
+def parse_cells(data):
+    """解析 cells 格式（已 json.load 的列表），网格大小取最大坐标 + 1"""
+    if not isinstance(data, list):
+        raise MapFormatError('顶层应为格子列表')
+    width = height = 0
+    lines = {}
+    seen = set()
+    errors = []
+    for cell in data:
+        try:
+            x, y, line_id, node_index = int(cell['x']), int(cell['y']), int(cell['id']), int(cell['nodeIndex'])
+        except (KeyError, TypeError, ValueError):
+            raise MapFormatError(f'格子记录格式错误: {cell!r}')
+        if x < 0 or y < 0:
+            errors.append(f'坐标为负: ({x}, {y})')
+            continue
+        width = max(width, x + 1)
+        height = max(height, y + 1)
+        if (x, y) in seen:
+            errors.append(f'格子 ({x}, {y}) 重复出现')
+        seen.add((x, y))
+        if line_id > 0:
+            lines.setdefault(line_id, []).append((node_index, x, y))
+    return width, height, lines, errors
+
+
+def parse_sparse(data):
+    if not isinstance(data, dict) or data.get('format') != FORMAT_SPARSE:
+        raise MapFormatError('不是稀疏地图格式')
+    version = data.get('version', SPARSE_VERSION)
+    if type(version) is not int:
+        raise MapFormatError(f'稀疏地图版本号应为整数: {version!r}')
+    if version > SPARSE_VERSION:
+        raise MapFormatError(f'稀疏地图版本 {version} 过新')
+    try:
+        width, height = int(data['width']), int(data['height'])
+        flat = [(int(line['id']), line['points']) for line in data['lines']]
+    except (KeyError, TypeError, ValueError):
+        raise MapFormatError('稀疏地图缺少 width / height / lines')
+    for line_id, coords in flat:
+        # JSON 里的坐标可能是小数、字符串或嵌套列表，二进制格式读出来的一定是整数
+        if not isinstance(coords, list) or not all(type(v) is int for v in coords):
+            raise MapFormatError(f'线条 {line_id} 的坐标不是整数列表')
+    return width, height, points_to_lines(width, height, flat), []
+
+
+def parse_binary(data):
+    if len(data) < BINARY_HEADER.size:
+        raise MapFormatError('二进制地图文件过短')
+    _, width, height, count = BINARY_HEADER.unpack_from(data)
+    pos = BINARY_HEADER.size
+    flat = []
+    for _ in range(count):
+        if pos + BINARY_LINE.size > len(data):
+            raise MapFormatError('二进制地图文件被截断')
+        line_id, n = BINARY_LINE.unpack_from(data, pos)
+        pos += BINARY_LINE.size
+        coords = array('H')
+        coords.frombytes(data[pos:pos + n * 4])
+        if len(coords) != n * 2:
+            raise MapFormatError('二进制地图文件被截断')
+        if sys.byteorder != 'little':
+            coords.byteswap()
+        flat.append((line_id, coords))
+        pos += n * 4
+    return width, height, points_to_lines(width, height, flat), []
+
+
+def points_to_lines(width, height, flat):
+    """[(id, [x0, y0, x1, y1, ...]), ...] -> {id: [(nodeIndex, x, y), ...]}"""
+    if width < 1 or height < 1:
+        raise MapFormatError(f'网格大小 {width}x{height} 无效')
+    lines = {}
+    for line_id, coords in flat:
+        # 编号 0 在 cells 格式里表示空格子，编辑器里会变成“无线条”
+        if line_id < 1:
+            raise MapFormatError(f'线条编号 {line_id} 无效（应从 1 开始）')
+        # 稀疏 / 二进制格式每条线只出现一次，重复的编号合并起来会丢掉其中一条的点
+        if line_id in lines:
+            raise MapFormatError(f'线条编号 {line_id} 重复')
+        if len(coords) % 2:
+            raise MapFormatError(f'线条 {line_id} 的坐标数不是偶数')
+        xs, ys = coords[0::2], coords[1::2]
+        # 越界的点没法放进编辑器网格，直接当作文件损坏
+        if xs and not (0 <= min(xs) and max(xs) < width and 0 <= min(ys) and max(ys) < height):
+            raise MapFormatError(f'线条 {line_id} 超出网格 {width}x{height}')
+        lines[line_id] = list(zip(range(1, len(xs) + 1), xs, ys))
+    return lines
+
+
+def decode_map(data):
+    """自动识别格式并解析文件内容 bytes，返回 (width, height, lines, errors)"""
+    fmt = detect_format(data)
+    if fmt == FORMAT_SPARSE_GZ:
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise MapFormatError(f'gzip 解压失败: {e}')
+        fmt = detect_format(data)
+        if fmt == FORMAT_SPARSE_GZ:
+            raise MapFormatError('gzip 嵌套')
+    if fmt == FORMAT_BINARY:
+        return parse_binary(data)
+    parsed = json.loads(data)
+    return parse_sparse(parsed) if fmt == FORMAT_SPARSE else parse_cells(parsed)
+
+
+def load_map(path):
+    """读取地图文件（任意支持的格式），返回 (width, height, lines, errors)"""
+    with open(path, 'rb') as f:
+        return decode_map(f.read())
+
+
+def save_map(path, width, height, lines, fmt=None):
+    """按 fmt（缺省按扩展名判断）写出地图，lines 为 {id: [(x, y), ...]}"""
+    data = encode_map(width, height, lines, fmt or format_for_path(path))
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,203 @@
+"""
+map_generator.py
+
+一笔画关卡批量生成工具（命令行，多进程）
+- 随机 DFS 按 Warnsdorff 规则（优先走出路最少的格子，平局随机）走出一条尽量覆盖整个网格的长路径，
+  走不满时重开若干次取最长的一条，走不到的格子就是障碍
+- 从路径起点开始往后切段：每段尽量长，且用 map_solver 验证从段首出发只有唯一的一笔画解，
+  每段就是一条线条（只剩一个格子的段留空当障碍）
+- 按难度筛选：难度 = 玩家在设计路径上遇到的分叉点数 / 线条格子数，不在目标范围内的地图丢弃重来
+- 每张地图使用 seed + 序号 作为随机种子，同样的参数总能得到同样的关卡；ProcessPoolExecutor 多核并行
+- 输出与 map_editor.py export_to_json 相同的 x, y, id, nodeIndex JSON（扩展名为 .sparse.json / .json.gz / .mapb 时按 map_format.py 的对应格式）
+
+使用方法：
+    python map_generator.py --count 200 --size 12x12 --difficulty 中等 --seed 42 -o levels/
+    python map_generator.py --count 50 --size 16x10 --max-lines 6 --ext .sparse.json -o big/
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from map_format import save_map
+from map_solver import check_line
+
+# 难度 -> 分叉点密度范围 [下限, 上限)
+DIFFICULTY_LEVELS = {
+    '简单': (0.0, 0.15),
+    '中等': (0.15, 0.25),
+    '困难': (0.25, 1.0),
+    '任意': (0.0, 1.0),
+}
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+# 长路径走不满网格时最多重开几次
+WALK_RESTARTS = 50
+# 切段时连续多少个更长的候选都不唯一就停止延长
+SPLIT_LOOKAHEAD = 12
+# 单次唯一解检查最多搜索的节点数，超出按不唯一处理；
+# 用节点数而不是时限，结果与机器快慢、负载无关（同样的种子总得到同样的关卡）
+CHECK_MAX_NODES = 20_000
+
+
+# ----------------- 长路径 -----------------
+
+def random_walk(width, height, rng, restarts=WALK_RESTARTS):
+    """随机 DFS + Warnsdorff 规则，返回走过的格子列表（按顺序），尽量覆盖全部格子"""
+    total = width * height
+    best = []
+    for _ in range(restarts):
+        start = (rng.randrange(width), rng.randrange(height))
+        path = [start]
+        visited = {start}
+
+        def onward(cell):
+            x, y = cell
+            return [(x + dx, y + dy) for dx, dy in DIRECTIONS
+                    if 0 <= x + dx < width and 0 <= y + dy < height and (x + dx, y + dy) not in visited]
+
+        while True:
+            moves = onward(path[-1])
+            if not moves:
+                break
+            _, _, cell = min((len(onward(c)), rng.random(), c) for c in moves)
+            path.append(cell)
+            visited.add(cell)
+        if len(path) > len(best):
+            best = path
+        if len(best) == total:
+            break
+    return best
+
+
+# ----------------- 切段 -----------------
+
+def split_path(width, height, path, lookahead=SPLIT_LOOKAHEAD):
+    """
+    把长路径切成若干段，每段从段首出发都只有唯一解
+    段尾延长时唯一性不是单调的（段尾贴着段内更早的格子时一定能“翻转”出另一个解，往后走几步又可能恢复唯一），
+    所以一直试到连续 lookahead 个候选都不唯一为止，取其中最长的唯一段；
+    搜索超过 CHECK_MAX_NODES 个节点仍没有结论的候选也算不唯一
+    """
+    segments = []
+    i = 0
+    while i < len(path):
+        best = i + 1
+        misses = 0
+        j = i + 2
+        while j <= len(path) and misses < lookahead:
+            if check_line(width, height, path[i:j], max_nodes=CHECK_MAX_NODES)['solutions'] == 1:
+                best = j
+                misses = 0
+            else:
+                misses += 1
+            j += 1
+        segments.append(path[i:best])
+        i = best
+    return segments
+
+
+def count_choices(points):
+    """沿设计路径走时，当前格子有不止一个未走的相邻线条格子的次数（不含终点）"""
+    cells = set(points)
+    visited = set()
+    choices = 0
+    for x, y in points[:-1]:
+        visited.add((x, y))
+        onward = sum((x + dx, y + dy) in cells and (x + dx, y + dy) not in visited for dx, dy in DIRECTIONS)
+        choices += onward > 1
+    return choices
+
+
+# ----------------- 关卡 -----------------
+
+def generate_level(width, height, difficulty='任意', max_lines=None, rng=random, attempts=200):
+    """
+    返回 {'lines': {id: [(x, y), ...]}, 'choices', 'density', 'cells', 'attempts'}，id 从 1 开始
+    attempts 次都达不到难度 / 线条数要求时抛出 RuntimeError
+    """
+    low, high = DIFFICULTY_LEVELS[difficulty]
+    for attempt in range(1, attempts + 1):
+        segments = [s for s in split_path(width, height, random_walk(width, height, rng)) if len(s) >= 2]
+        if not segments or (max_lines and len(segments) > max_lines):
+            continue
+        cells = sum(len(s) for s in segments)
+        choices = sum(count_choices(s) for s in segments)
+        density = choices / cells
+        if low <= density < high:
+            return {
+                'lines': {i: s for i, s in enumerate(segments, 1)},
+                'choices': choices,
+                'density': round(density, 3),
+                'cells': cells,
+                'attempts': attempt,
+            }
+    raise RuntimeError(f'{attempts} 次尝试都没有生成符合要求的 {width}x{height} 关卡')
+
+
+def generate_one(task):
+    """子进程入口：task = (序号, 宽, 高, 难度, 最多线条数, 种子)"""
+    index, width, height, difficulty, max_lines, seed = task
+    level = generate_level(width, height, difficulty, max_lines, random.Random(seed))
+    level.update(index=index, seed=seed)
+    return level
+
+
+def generate_batch(count, width, height, difficulty='任意', max_lines=None, seed=None, workers=None):
+    """按序号顺序产出关卡（生成器），workers 为 None 时使用全部 CPU 核"""
+    if seed is None:
+        seed = random.randrange(1 << 30)
+    tasks = [(i, width, height, difficulty, max_lines, seed + i) for i in range(count)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        yield from map(generate_one, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(generate_one, tasks, chunksize=max(1, min(16, count // (workers * 8))))
+
+
+def parse_size(text):
+    try:
+        width, height = (int(v) for v in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError('尺寸格式应为 宽x高，例如 12x12')
+    if not (2 <= width <= 1000 and 2 <= height <= 1000):
+        raise argparse.ArgumentTypeError('宽高需在 2~1000 之间')
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多进程批量生成一笔画关卡')
+    parser.add_argument('--count', type=int, default=100, help='生成数量')
+    parser.add_argument('--size', type=parse_size, default=(12, 12), help='网格尺寸 宽x高（默认 12x12）')
+    parser.add_argument('--difficulty', default='任意', choices=list(DIFFICULTY_LEVELS), help='难度（分叉点密度）')
+    parser.add_argument('--max-lines', type=int, help='每张地图最多几条线条（越少每条线越长）')
+    parser.add_argument('--seed', type=int, help='起始随机种子（第 i 张地图使用 seed + i）')
+    parser.add_argument('--workers', type=int, help='进程数，默认 CPU 核数')
+    parser.add_argument('--ext', default='.json', choices=['.json', '.sparse.json', '.json.gz', '.mapb'],
+                        help='输出格式（默认与编辑器导出相同的 .json）')
+    parser.add_argument('-o', '--out-dir', default='levels', help='输出目录')
+    args = parser.parse_args()
+
+    width, height = args.size
+    os.makedirs(args.out_dir, exist_ok=True)
+    digits = len(str(max(args.count - 1, 1)))
+    start = time.time()
+    n = 0
+    try:
+        for n, level in enumerate(generate_batch(args.count, width, height, args.difficulty, args.max_lines,
+                                                 args.seed, args.workers), 1):
+            name = f"level_{level['index']:0{digits}d}{args.ext}"
+            save_map(os.path.join(args.out_dir, name), width, height, level['lines'])
+            print(f"\r{n}/{args.count}  {name}: {len(level['lines'])} 条线，分叉密度 {level['density']}",
+                  end='', file=sys.stderr, flush=True)
+    except RuntimeError as e:
+        print(f'\n{e}（可放宽 --difficulty / --max-lines）', file=sys.stderr)
+    elapsed = max(time.time() - start, 1e-9)
+    print(f'\n完成 {n} 张，用时 {elapsed:.1f}s（{n / elapsed * 60:.0f} 张/分钟），输出到 {args.out_dir}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+map_history.py
+
+map_editor.py 的撤销 / 重做（命令模式，不依赖 pygame）
+
+每次编辑操作记录成一条命令，命令只保存被改动的部分（增量）：
+- ('add', 线编号, 点列表, 起点列表)       新增整条线（画完一条线）
+- ('remove', 线编号, 点列表, 起点列表)    删除整条线（橡皮擦、清除所有线条）
+- ('extend', 线编号, 点列表, 是否接在线头)  往已有线条一端按顺序接上若干点（拖到其它线条端点时的合并）
+- ('state', 格子, 旧状态, 新状态)          起点标记变化
+撤销 / 重做直接在 GridModel 上应用增量，耗时只与增量大小有关，不重建网格。
+历史按保存的格子数计内存预算，超出时丢弃最早的命令。
+"""
+
+from collections import deque
+from typing import List, Tuple
+
+from map_model import START, GridModel
+
+# 撤销 / 重做历史里最多保存多少个格子（每个点、每次状态变化各算一个）
+HISTORY_CELL_BUDGET = 1_000_000
+
+
+def line_starts(model: GridModel, line_id: int) -> Tuple:
+    """线条上标记为起点的端点"""
+    info = model.lines[line_id]
+    ends = (info.head,) if info.head == info.tail else (info.head, info.tail)
+    return tuple(cell for cell in ends if model.get_state(cell) == START)
+
+
+def delta_size(delta) -> int:
+    return 1 if delta[0] == 'state' else len(delta[2])
+
+
+def apply_delta(model: GridModel, delta, undo: bool = False):
+    kind = delta[0]
+    if kind == 'state':
+        _, cell, old, new = delta
+        model.set_state(cell, old if undo else new)
+    elif kind == 'extend':
+        _, line_id, cells, at_head = delta
+        if undo:
+            model.trim(line_id, len(cells), at_head)
+        else:
+            model.extend(line_id, cells, at_head)
+    elif (kind == 'add') != undo:
+        _, line_id, points, starts = delta
+        model.add_line(points, line_id)
+        for cell in starts:
+            model.set_state(cell, START)
+    else:
+        model.remove_line(delta[1])
+
+
+class EditHistory:
+    def __init__(self, budget: int = HISTORY_CELL_BUDGET):
+        self.budget = budget
+        self.undo_stack = deque()  # [(增量列表, 格子数), ...]，最新的在右边
+        self.redo_stack: List = []
+        self.pending: List = []
+        self.size = 0
+
+    def record(self, delta):
+        """记录当前操作的一个增量（必须在改动 model 之前或之后立即调用，顺序即应用顺序）"""
+        self.pending.append(delta)
+
+    def record_line(self, kind: str, model: GridModel, line_id: int):
+        """记录整条线的新增（改动之后调用）或删除（改动之前调用）"""
+        self.record((kind, line_id, model.points(line_id), line_starts(model, line_id)))
+
+    def commit(self):
+        """把当前操作的增量合成一条命令，新操作会清空重做栈"""
+        if not self.pending:
+            return
+        size = sum(map(delta_size, self.pending))
+        self.undo_stack.append((self.pending, size))
+        self.pending = []
+        self.size += size - sum(s for _, s in self.redo_stack)
+        self.redo_stack = []
+        # 超出预算时丢弃最早的命令（至少保留刚提交的这一条）
+        while self.size > self.budget and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft()[1]
+
+    def undo(self, model: GridModel) -> bool:
+        if not self.undo_stack:
+            return False
+        command = self.undo_stack.pop()
+        for delta in reversed(command[0]):
+            apply_delta(model, delta, undo=True)
+        self.redo_stack.append(command)
+        return True
+
+    def redo(self, model: GridModel) -> bool:
+        if not self.redo_stack:
+            return False
+        command = self.redo_stack.pop()
+        for delta in command[0]:
+            apply_delta(model, delta)
+        self.undo_stack.append(command)
+        return True
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.pending = []
+        self.size = 0
@@ -0,0 +1,300 @@
+"""
+map_model.py
+
+map_editor.py 的网格数据模型（不依赖 pygame）
+
+每个格子的数据存在按行展开的 array 里（下标 = y * width + x）：
+- state  0 空 / 1 起点 / 2 线条
+- owner  所属线条编号，-1 表示空
+- seq    在线条里的序号；点编号 = seq - 线条的 first_seq，往线头前面加点时序号递减，
+         所以线头、线尾加点都是 O(1)，不用给整条线重新编号
+- nxt / prv  线条里下一个 / 上一个点的方向（DIRECTIONS 的下标，-1 表示端点），
+         每条线就是嵌在网格里的双向链表；存方向而不是下标，调整网格宽度时不用改写
+
+线条之间不重叠（每个格子最多属于一条线），线条元数据只有头尾和序号范围，
+所以查询格子归属 O(1)，加点 / 擦线 / 合并 / 调整网格大小都只和涉及的格子数有关。
+"""
+
+import heapq
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+Cell = Tuple[int, int]
+
+EMPTY, START, LINE = 0, 1, 2
+NO_LINE = -1
+NO_LINK = -1
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def direction(a: Cell, b: Cell) -> int:
+    """a 到相邻格子 b 的方向下标"""
+    return DIRECTIONS.index((b[0] - a[0], b[1] - a[1]))
+
+
+class LineInfo:
+    __slots__ = ('head', 'tail', 'first_seq', 'last_seq')
+
+    def __init__(self, head: Cell, seq: int):
+        self.head = head
+        self.tail = head
+        self.first_seq = seq
+        self.last_seq = seq
+
+    def __len__(self):
+        return self.last_seq - self.first_seq + 1
+
+
+class GridModel:
+    def __init__(self, width: int, height: int, on_change: Optional[Callable[[Cell], None]] = None):
+        """on_change(cell) 在格子内容（状态、归属、编号）变化时调用，编辑器用它标记重画"""
+        self.on_change = on_change or (lambda cell: None)
+        self.width = width
+        self.height = height
+        self.lines: Dict[int, LineInfo] = {}
+        self.free_ids: List[int] = []
+        self.next_id = 0
+        self.allocate(width, height)
+
+    def allocate(self, width: int, height: int):
+        n = width * height
+        self.width = width
+        self.height = height
+        self.state = array('b', bytes(n))
+        self.owner = array('i', [NO_LINE]) * n
+        self.seq = array('i', [0]) * n
+        self.nxt = array('b', [NO_LINK]) * n
+        self.prv = array('b', [NO_LINK]) * n
+
+    # ----------------- 查询 -----------------
+
+    def index(self, cell: Cell) -> int:
+        return cell[1] * self.width + cell[0]
+
+    def in_bounds(self, cell: Cell) -> bool:
+        return 0 <= cell[0] < self.width and 0 <= cell[1] < self.height
+
+    def get_state(self, cell: Cell) -> int:
+        return self.state[self.index(cell)]
+
+    def set_state(self, cell: Cell, value: int):
+        self.state[self.index(cell)] = value
+        self.on_change(cell)
+
+    def line_at(self, cell: Cell) -> Optional[int]:
+        line_id = self.owner[self.index(cell)]
+        return None if line_id == NO_LINE else line_id
+
+    def line_info(self, cell: Cell) -> Tuple[Optional[int], Optional[int]]:
+        """(线编号, 点编号)，点编号从 0 开始"""
+        i = self.index(cell)
+        line_id = self.owner[i]
+        if line_id == NO_LINE:
+            return None, None
+        return line_id, self.seq[i] - self.lines[line_id].first_seq
+
+    def length(self, line_id: int) -> int:
+        return len(self.lines[line_id])
+
+    def iter_points(self, line_id: int, reverse: bool = False) -> Iterator[Cell]:
+        info = self.lines[line_id]
+        cell = info.tail if reverse else info.head
+        links = self.prv if reverse else self.nxt
+        while True:
+            yield cell
+            d = links[self.index(cell)]
+            if d == NO_LINK:
+                return
+            dx, dy = DIRECTIONS[d]
+            cell = (cell[0] + dx, cell[1] + dy)
+
+    def points(self, line_id: int) -> List[Cell]:
+        return list(self.iter_points(line_id))
+
+    def start_of(self, line_id: int) -> Cell:
+        """起点：标记为起点的端点，都没标记时为线头"""
+        info = self.lines[line_id]
+        if self.get_state(info.tail) == START and self.get_state(info.head) != START:
+            return info.tail
+        return info.head
+
+    # ----------------- 线条编号 -----------------
+
+    # next_id 是分配的扫描位置：它之下没被占用的编号都在 free_ids 里（只放释放过的编号），
+    # 它之上可能有导入、撤销时指定的编号，分配时逐个跳过。
+    # 不为跳过的编号预先建表，导入编号很大（比如 50000000）的线条也只占用与线条数相关的内存。
+
+    def allocate_id(self) -> int:
+        """最小的未使用编号"""
+        while self.free_ids:
+            line_id = heapq.heappop(self.free_ids)
+            if line_id not in self.lines and line_id < self.next_id:
+                return line_id
+        while self.next_id in self.lines:
+            self.next_id += 1
+        self.next_id += 1
+        return self.next_id - 1
+
+    def release_id(self, line_id: int):
+        if line_id == self.next_id - 1:
+            self.next_id -= 1
+        elif line_id < self.next_id:
+            heapq.heappush(self.free_ids, line_id)
+
+    def reset_ids(self):
+        """线条整体替换后重新整理可用编号（导入、调整网格大小）"""
+        self.next_id = 0
+        self.free_ids = []
+
+    # ----------------- 编辑 -----------------
+
+    def occupy(self, cell: Cell, line_id: int, seq: int, state: int = LINE):
+        i = self.index(cell)
+        self.state[i] = state
+        self.owner[i] = line_id
+        self.seq[i] = seq
+        self.nxt[i] = NO_LINK
+        self.prv[i] = NO_LINK
+        self.on_change(cell)
+
+    def vacate(self, cell: Cell):
+        i = self.index(cell)
+        self.state[i] = EMPTY
+        self.owner[i] = NO_LINE
+        self.nxt[i] = NO_LINK
+        self.prv[i] = NO_LINK
+        self.on_change(cell)
+
+    def new_line(self, cell: Cell, line_id: Optional[int] = None) -> int:
+        """以 cell 为唯一的点新建线条，返回编号（缺省分配最小的未使用编号）"""
+        if line_id is None:
+            line_id = self.allocate_id()
+        self.lines[line_id] = LineInfo(cell, 0)
+        self.occupy(cell, line_id, 0)
+        return line_id
+
+    def append(self, line_id: int, cell: Cell):
+        """在线尾后面加一个相邻的空格子"""
+        info = self.lines[line_id]
+        tail = info.tail
+        info.last_seq += 1
+        self.occupy(cell, line_id, info.last_seq)
+        self.nxt[self.index(tail)] = direction(tail, cell)
+        self.prv[self.index(cell)] = direction(cell, tail)
+        info.tail = cell
+
+    def prepend(self, line_id: int, cell: Cell):
+        """在线头前面加一个相邻的空格子（其余点的编号整体 +1，由调用方决定是否重画整条线）"""
+        info = self.lines[line_id]
+        head = info.head
+        info.first_seq -= 1
+        self.occupy(cell, line_id, info.first_seq)
+        self.prv[self.index(head)] = direction(head, cell)
+        self.nxt[self.index(cell)] = direction(cell, head)
+        info.head = cell
+
+    def add_line(self, points: List[Cell], line_id: Optional[int] = None, start: Optional[Cell] = None) -> int:
+        """按顺序添加整条线（导入、撤销），start 为要标记为起点的端点"""
+        line_id = self.new_line(points[0], line_id)
+        for cell in points[1:]:
+            self.append(line_id, cell)
+        if start is not None:
+            self.set_state(start, START)
+        return line_id
+
+    def remove_line(self, line_id: int) -> List[Cell]:
+        """删除整条线，返回它的点（按顺序）"""
+        points = self.points(line_id)
+        for cell in points:
+            self.vacate(cell)
+        del self.lines[line_id]
+        self.release_id(line_id)
+        return points
+
+    def extend(self, line_id: int, cells: List[Cell], at_head: bool = False):
+        """按顺序把 cells 逐个接到线头（at_head）或线尾"""
+        if not at_head:
+            for cell in cells:
+                self.append(line_id, cell)
+            return
+        for cell in cells:
+            self.prepend(line_id, cell)
+        # 线头加点后原有点的编号都变了
+        for point in self.iter_points(line_id):
+            self.on_change(point)
+
+    def trim(self, line_id: int, count: int, at_head: bool = False) -> List[Cell]:
+        """从线头（at_head）或线尾去掉 count 个点（少于线条长度），返回去掉的点（从端点往里）"""
+        info = self.lines[line_id]
+        links = self.nxt if at_head else self.prv
+        removed = []
+        for _ in range(count):
+            cell = info.head if at_head else info.tail
+            dx, dy = DIRECTIONS[links[self.index(cell)]]
+            inner = (cell[0] + dx, cell[1] + dy)
+            self.vacate(cell)
+            removed.append(cell)
+            if at_head:
+                self.prv[self.index(inner)] = NO_LINK
+                info.head = inner
+                info.first_seq += 1
+            else:
+                self.nxt[self.index(inner)] = NO_LINK
+                info.tail = inner
+                info.last_seq -= 1
+        if at_head:
+            for point in self.iter_points(line_id):
+                self.on_change(point)
+        return removed
+
+    def merge(self, source: int, target: int, cell: Cell) -> Tuple[List[Cell], bool]:
+        """
+        把线条 source 接到线条 target 的端点 cell 上：source 的线尾与 cell 相邻，
+        合并后 target 的方向不变，source 的点按连接顺序逐个挂到 target 的头或尾，O(len(source))
+        返回 (按连接顺序挂上去的点, 是否接在线头)，撤销时用 trim 去掉
+        """
+        at_head = cell == self.lines[target].head
+        # source 头 ... source 尾 -> cell：不论接在哪头，都是从 source 尾往回逐个挂上去
+        moving = self.points(source)[::-1]
+        for point in moving:
+            self.vacate(point)
+        del self.lines[source]
+        self.release_id(source)
+        self.extend(target, moving, at_head)
+        return moving, at_head
+
+    def clear(self):
+        self.lines = {}
+        self.free_ids = []
+        self.next_id = 0
+        self.allocate(self.width, self.height)
+
+    def resize(self, width: int, height: int) -> List[int]:
+        """
+        调整网格大小，越界的线条整条删除，返回被删除的线条编号
+        只扫描被裁掉的区域找越界线条，其余数据按行整段复制
+        """
+        old_width = self.width
+        dropped = set(self.owner[height * old_width:])
+        if width < old_width:
+            for y in range(min(height, self.height)):
+                dropped.update(self.owner[y * old_width + width:(y + 1) * old_width])
+        dropped.discard(NO_LINE)
+        for line_id in dropped:
+            for cell in self.points(line_id):
+                i = self.index(cell)
+                self.state[i] = EMPTY
+                self.owner[i] = NO_LINE
+            del self.lines[line_id]
+
+        old = (self.state, self.owner, self.seq, self.nxt, self.prv)
+        old_height = self.height
+        self.allocate(width, height)
+        keep_w = min(width, old_width)
+        for y in range(min(height, old_height)):
+            src = slice(y * old_width, y * old_width + keep_w)
+            dst = slice(y * width, y * width + keep_w)
+            for new, prev in zip((self.state, self.owner, self.seq, self.nxt, self.prv), old):
+                new[dst] = prev[src]
+        self.reset_ids()
+        return sorted(dropped)
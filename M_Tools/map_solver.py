@@ -0,0 +1,235 @@
+"""
+map_solver.py
+
+一笔画地图求解 / 唯一解检查（map_editor.py 的“验证”按钮和 map_batch.py --solve 共用，不依赖 pygame）
+
+关卡模型：
+- 文件里每个 id 的格子是一道独立的一笔画题，其余格子（空格子和其他线条的格子）都是障碍
+- 从该线条的起点出发，一笔走完所有格子（固定起点的哈密顿路径）
+- 设计者画的线条本身就是一个解，检查的重点是解是否唯一
+
+搜索用整数做位棋盘：格子 (x, y) 对应第 y * (width + 1) + x 位，
+每行末尾空一列，左右移位时不会串到下一行。每个节点做四种剪枝：
+- 死格：某个未走格子已经没有任何可走的邻居 -> 无解
+- 端点数：只剩一个可走邻居的格子只能当终点，超过一个 -> 无解
+- 奇偶性：按棋盘黑白着色，路径黑白交替，剩余格子的黑白差只能是 0 或偏向笔头颜色 1 个（终点确定时只能是一个值）
+- 连通性：未走格子必须连成一块（否则笔头走进一块就回不到另一块）
+并用 (未走格子, 笔头) 做记忆化，相同残局只搜一次。
+"""
+
+import sys
+import time
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(m):
+        return bin(m).count('1')
+
+# 记忆化表的上限，超过后清空，避免大图吃光内存
+MEMO_LIMIT = 1 << 20
+
+
+class SolverTimeout(Exception):
+    pass
+
+
+class PathSolver:
+    def __init__(self, width, height, cells, start):
+        """cells: 可走格子 [(x, y), ...]；start: 起点 (x, y)"""
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.playable = 0
+        for x, y in cells:
+            self.playable |= 1 << self.bit(x, y)
+        self.start = self.bit(*start)
+        # 棋盘着色：(x + y) 为偶数的格子
+        self.black = 0
+        for y in range(height):
+            for x in range(y % 2, width, 2):
+                self.black |= 1 << self.bit(x, y)
+        self.nodes = 0
+        self.limit = 2
+        self.max_nodes = None
+        self.deadline = None
+        self.memo = {}
+        self.path = []
+        self.solutions = []
+
+    def bit(self, x, y):
+        return y * self.stride + x
+
+    def cell(self, index):
+        return index % self.stride, index // self.stride
+
+    def neighbors(self, m):
+        s = self.stride
+        return (m << 1) | (m >> 1) | (m << s) | (m >> s)
+
+    # ----------------- 剪枝 -----------------
+
+    def feasible(self, unvisited, head):
+        """unvisited 不含笔头"""
+        # 统计每个未走格子在 area = unvisited + 笔头 里的邻居数（按位计数到 2 为止）
+        area = unvisited | (1 << head)
+        s = self.stride
+        ones = twos = 0
+        for n in (area >> 1, area << 1, area >> s, area << s):
+            twos |= ones & n
+            ones |= n
+        if unvisited & ~ones:
+            return False
+        ends = unvisited & ~twos
+        if ends & (ends - 1):
+            return False
+        # 路径从笔头开始黑白交替：黑白差为 0，或笔头颜色多 1 个；
+        # 终点已经确定（唯一的死胡同格）时，黑白差由笔头和终点的颜色唯一决定
+        diff = 2 * popcount(area & self.black) - popcount(area)
+        head_color = 1 if self.black >> head & 1 else -1
+        if ends:
+            end_color = 1 if self.black & ends else -1
+            if diff != (head_color if head_color == end_color else 0):
+                return False
+        elif diff not in (0, head_color):
+            return False
+        # 连通性：剩下的路径是一整段，未走格子必须自成一个连通块（笔头的邻居只是入口）
+        reach = unvisited & -unvisited
+        while True:
+            grown = reach | (self.neighbors(reach) & unvisited)
+            if grown == reach:
+                return reach == unvisited
+            reach = grown
+
+    # ----------------- 搜索 -----------------
+
+    def search(self, unvisited, head):
+        """返回从该状态出发的解数（最多 self.limit 个，记忆化的值与调用顺序无关）"""
+        self.nodes += 1
+        if self.max_nodes and self.nodes > self.max_nodes:
+            raise SolverTimeout
+        if not self.nodes & 4095 and self.deadline and time.perf_counter() > self.deadline:
+            raise SolverTimeout
+        if not unvisited:
+            self.solutions.append([self.cell(b) for b in self.path])
+            return 1
+        key = (unvisited, head)
+        if key in self.memo:
+            return self.memo[key]
+
+        count = 0
+        if self.feasible(unvisited, head):
+            # 按 Warnsdorff 规则先走出路少的格子，有解时能更快找到
+            moves = []
+            for d in (1, -1, self.stride, -self.stride):
+                nxt = head + d
+                if nxt >= 0 and unvisited >> nxt & 1:
+                    moves.append((popcount(self.neighbors(1 << nxt) & unvisited), nxt))
+            moves.sort()
+            for _, nxt in moves:
+                self.path.append(nxt)
+                count += self.search(unvisited & ~(1 << nxt), nxt)
+                self.path.pop()
+                if count >= self.limit:
+                    count = self.limit
+                    break
+        if len(self.memo) >= MEMO_LIMIT:
+            self.memo.clear()
+        self.memo[key] = count
+        return count
+
+    def solve(self, limit=2, max_nodes=None, timeout=None, known=None):
+        """
+        返回解数（最多 limit 个）；找到的解保存在 self.solutions（记忆化命中的解不会重复记录）
+        known 为已知的一个解（设计者画的路径）时，只找与它不同的解：
+        从路径末尾往前，依次尝试在第 k 步走出不同的一步，越晚分叉剩下的区域越小，
+        有第二个解时通常很快就能找到；证明唯一解时搜的还是同一棵树，记忆化在各分叉之间共用
+        超过 max_nodes 个节点或 timeout 秒时抛出 SolverTimeout
+        """
+        self.nodes = 0
+        self.memo = {}
+        self.solutions = []
+        self.limit = limit
+        self.max_nodes = max_nodes
+        self.deadline = time.perf_counter() + timeout if timeout else None
+        if not self.playable >> self.start & 1:
+            return 0
+        known = [self.bit(x, y) for x, y in known] if known else None
+        if known and not self.is_solution(known):
+            known = None
+        depth = popcount(self.playable) + 100
+        old_limit = sys.getrecursionlimit()
+        if depth > old_limit:
+            sys.setrecursionlimit(depth)
+        try:
+            if not known:
+                self.path = [self.start]
+                return self.search(self.playable & ~(1 << self.start), self.start)
+            self.solutions.append([self.cell(b) for b in known])
+            count = 1
+            for k in range(len(known) - 2, -1, -1):
+                head = known[k]
+                unvisited = self.playable
+                for b in known[:k + 1]:
+                    unvisited &= ~(1 << b)
+                for d in (1, -1, self.stride, -self.stride):
+                    nxt = head + d
+                    if nxt < 0 or nxt == known[k + 1] or not unvisited >> nxt & 1:
+                        continue
+                    self.path = known[:k + 1] + [nxt]
+                    count += self.search(unvisited & ~(1 << nxt), nxt)
+                    if count >= limit:
+                        return limit
+            return count
+        finally:
+            sys.setrecursionlimit(old_limit)
+            self.memo = {}
+
+    def is_solution(self, path):
+        """path（位序号列表）是否从起点出发、上下左右相邻、恰好走满所有可走格子"""
+        if not path or path[0] != self.start or len(set(path)) != len(path):
+            return False
+        steps = (1, self.stride)
+        if any(abs(b - a) not in steps for a, b in zip(path, path[1:])):
+            return False
+        covered = 0
+        for b in path:
+            covered |= 1 << b
+        return covered == self.playable
+
+
+def check_line(width, height, points, start=None, max_nodes=None, timeout=None):
+    """
+    检查一条线条对应的题目：points 为线条经过的格子（按 nodeIndex 顺序），start 缺省为第一个点
+    返回 {'solutions': 0/1/2（2 表示至少两个，超时为 None）, 'nodes', 'ms', 'alternative'}
+    alternative 为与设计路径不同的另一个解（找到时）
+    """
+    start = start or points[0]
+    solver = PathSolver(width, height, points, start)
+    designed = list(points) if start == points[0] else list(reversed(points))
+    t0 = time.perf_counter()
+    try:
+        count = solver.solve(limit=2, max_nodes=max_nodes, timeout=timeout, known=designed)
+    except SolverTimeout:
+        count = None
+    return {
+        'solutions': count,
+        'nodes': solver.nodes,
+        'ms': round((time.perf_counter() - t0) * 1000, 2),
+        'alternative': next((s for s in solver.solutions if s != designed), None),
+    }
+
+
+def check_level(width, height, lines, max_nodes=None, timeout=None):
+    """
+    检查整张地图：lines 为 {id: [(x, y), ...]}（按 nodeIndex 顺序，第一个点为起点）
+    timeout 为整张地图的总时限；返回 {id: check_line 的结果}
+    """
+    deadline = time.perf_counter() + timeout if timeout else None
+    results = {}
+    for line_id in sorted(lines):
+        if not lines[line_id]:
+            continue
+        remaining = max(deadline - time.perf_counter(), 1e-3) if deadline else None
+        results[line_id] = check_line(width, height, lines[line_id], max_nodes=max_nodes, timeout=remaining)
+    return results
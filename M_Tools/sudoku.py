@@ -5,11 +5,14 @@ sudoku_game.py
 功能清单：
 - 更精致的 UI（Canvas 渐变背景、圆角按钮风格化/emoji 图标、简单动画）
 - 高亮当前行/列/宫
-- 回溯求解器 + 求解计数（用于唯一解检测）
-- 生成器：在移除格子时检查是否保持唯一解（可配置）
-- 铅笔记号（候选数）显示，多次点击切换候选/清除
-- 撤销 / 重做（按动作存栈）
-- 存档（保存/加载为 JSON）
+- 盘面规格可选：4x4 / 6x6 / 9x9 / 12x12 / 16x16 以及随机区域的锯齿数独（SudokuSpec）
+- 回溯求解器 + 位掩码求解引擎（MRV + 唯一候选传播）+ Dancing Links 解计数（用于唯一解检测）
+- 生成器：在移除格子时检查是否保持唯一解（可配置），并按人类解题技巧评估难度；
+  现场出题在后台进程里进行（显示进度，切换难度时旧请求直接终止）
+- 铅笔记号（候选数）显示，多次点击切换候选/清除；自动铅笔、逻辑提示、冲突数字实时标红
+- 撤销 / 重做（每个动作存一条差异记录，重置/提示/求解/铅笔也可撤销，历史有上限）
+- 存档（紧凑二进制快照 + 只追加的操作日志，每步自动存档，崩溃后读档重放；兼容旧版 JSON 存档）
+- 预生成题库（SQLite，sudoku_bank.py 批量生成；新游戏直接取题，后台自动补货）
 - 计时器、难度选择、提示、重置、求解
 
 使用方法：
@@ -26,7 +29,14 @@ import random
 import time
 import json
 import copy
+import itertools
+import multiprocessing
+import os
+import queue
+import sqlite3
+import struct
 import threading
+from collections import deque
 
 # ----------------- 常量 -----------------
 CELL_SIZE = 64
@@ -41,10 +51,26 @@ LINE_COLOR = '#2b2b2b'
 FIXED_COLOR = '#0b2545'
 USER_COLOR = '#0b7a3f'
 ERROR_COLOR = '#ff7b7b'
+CONFLICT_COLOR = '#d62828'
+# 难度 -> 目标空格数（随机挖空保持唯一解时实际能挖到 58 个左右，再多基本挖不动）
+# 45 空基本只需要唯一候选，中等以上要多挖才有足够比例的题用到 DIFFICULTY_RATING 里的技巧
+DIFFICULTY_LEVELS = {'简单': 30, '中等': 55, '困难': 58, '专家': 58}
+# 唯一解挖空挖不到目标空格数时，换挖空顺序重试的次数（达到目标会提前结束）
+CARVE_ATTEMPTS = 20
+# 预生成题库（SQLite），与脚本放在同一目录
+BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sudoku_bank.db')
+BANK_LOW_WATER = 20
+BANK_TARGET = 100
+# 大于 9 的数字用字母显示/输入（12x12、16x16）
+SYMBOLS = '0123456789ABCDEFG'
+# 盘面选择 -> (边长, 是否锯齿)
+BOARD_KINDS = {'9x9 标准': (9, False), '9x9 锯齿': (9, True), '4x4': (4, False), '6x6': (6, False),
+               '12x12': (12, False), '16x16': (16, False)}
 BG_START = '#f6fbff'
 BG_END = '#e6f2ff'
 
-# ----------------- 算法（回溯 + 解计数） -----------------
+# ----------------- 算法（朴素回溯 + 解计数，只作为 sudoku_bench.py 的对照基准） -----------------
+# 实际求解和解计数用后面的 solve_backtrack / count_solutions（位掩码引擎）
 
 def find_empty(board):
     for r in range(9):
@@ -71,7 +97,7 @@ def valid(board, row, col, val):
     return True
 
 
-def solve_backtrack(board):
+def solve_backtrack_naive(board):
     pos = find_empty(board)
     if not pos:
         return True
@@ -79,13 +105,13 @@ def solve_backtrack(board):
     for val in range(1, 10):
         if valid(board, r, c, val):
             board[r][c] = val
-            if solve_backtrack(board):
+            if solve_backtrack_naive(board):
                 return True
             board[r][c] = 0
     return False
 
 
-def count_solutions(board, limit=2):
+def count_solutions_naive(board, limit=2):
     """回溯计数解的数量。limit 表示找到 limit 个解时可以提前返回。"""
     pos = find_empty(board)
     if not pos:
@@ -95,7 +121,7 @@ def count_solutions(board, limit=2):
     for val in range(1, 10):
         if valid(board, r, c, val):
             board[r][c] = val
-            cnt = count_solutions(board, limit)
+            cnt = count_solutions_naive(board, limit)
             count += cnt
             board[r][c] = 0
             if count >= limit:
@@ -103,66 +129,1387 @@ def count_solutions(board, limit=2):
     return count
 
 
-def generate_full_board():
-    # 生成完整解（随机化回溯）
-    board = [[0]*9 for _ in range(9)]
-    numbers = list(range(1, 10))
+# ----------------- 盘面规格：NxN + 任意区域（锯齿） -----------------
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(m):
+        return bin(m).count('1')
+
+
+def box_shape(size):
+    """标准宫的 (高, 宽)：4->2x2, 6->2x3, 9->3x3, 12->3x4, 16->4x4"""
+    h = int(size ** 0.5)
+    while h > 1 and size % h:
+        h -= 1
+    if h <= 1:
+        raise ValueError(f'{size}x{size} 没有标准宫划分，请提供 regions')
+    return h, size // h
+
+
+class SudokuSpec:
+    """
+    盘面规格：边长 size（数字 1..size）+ 区域表 regions（每格所属区域编号 0..size-1，长度 size*size）。
+    regions 缺省时按标准宫划分；传入任意区域表即为锯齿数独。
+    units 为行、列、区域三类单元（各 size 个），cell_units[i] 为格子 i 所在的三个单元编号。
+    """
+
+    def __init__(self, size=9, regions=None, name=None):
+        n = size
+        self.size = n
+        self.cells = n * n
+        if regions is None:
+            bh, bw = box_shape(n)
+            regions = [(i // n // bh) * (n // bw) + (i % n) // bw for i in range(n * n)]
+            self.box = (bh, bw)
+        else:
+            self.box = None
+        self.regions = list(regions)
+        if len(self.regions) != n * n or any(self.regions.count(k) != n for k in range(n)):
+            raise ValueError('regions 必须把盘面分成 size 个、每个 size 格的区域')
+        self.name = name or (f'{n}x{n}' if self.box else f'{n}x{n} 锯齿')
+        self.all_mask = ((1 << n) - 1) << 1
+        self.units = ([[r * n + c for c in range(n)] for r in range(n)] +
+                      [[r * n + c for r in range(n)] for c in range(n)] +
+                      [[i for i in range(n * n) if self.regions[i] == k] for k in range(n)])
+        self.cell_units = [(i // n, n + i % n, 2 * n + self.regions[i]) for i in range(n * n)]
+        self.peers = [sorted({j for u in self.cell_units[i] for j in self.units[u]} - {i}) for i in range(n * n)]
+
+    @property
+    def standard9(self):
+        return self.size == 9 and self.box is not None
+
+    def empty_board(self):
+        return [[0] * self.size for _ in range(self.size)]
+
+
+STANDARD_SPEC = SudokuSpec(9)
+
+
+def random_regions(size, rng=random, swaps=None):
+    """
+    生成随机锯齿区域表：从标准宫出发，反复把一个边界格换给相邻区域、再换回一个格子，
+    保持每个区域格数不变且连通；最后确认该区域表能生成完整解，否则重来。
+    """
+    n = size
+    swaps = swaps if swaps is not None else n * n
+
+    def neighbors(i):
+        r, c = divmod(i, n)
+        if r > 0:
+            yield i - n
+        if r < n - 1:
+            yield i + n
+        if c > 0:
+            yield i - 1
+        if c < n - 1:
+            yield i + 1
+
+    def connected(regions, k):
+        cells = [i for i in range(n * n) if regions[i] == k]
+        seen = {cells[0]}
+        stack = [cells[0]]
+        while stack:
+            i = stack.pop()
+            for j in neighbors(i):
+                if regions[j] == k and j not in seen:
+                    seen.add(j)
+                    stack.append(j)
+        return len(seen) == len(cells)
+
+    while True:
+        regions = SudokuSpec(n).regions
+        for _ in range(swaps * 20):
+            if swaps <= 0:
+                break
+            a = rng.randrange(n * n)
+            ka = regions[a]
+            others = [regions[j] for j in neighbors(a) if regions[j] != ka]
+            if not others:
+                continue
+            kb = rng.choice(others)
+            # 区域 kb 中与区域 ka 相邻、且不是 a 的格子
+            back = [i for i in range(n * n) if regions[i] == kb and any(regions[j] == ka for j in neighbors(i) if j != a)]
+            if not back:
+                continue
+            b = rng.choice(back)
+            regions[a], regions[b] = kb, ka
+            if connected(regions, ka) and connected(regions, kb):
+                swaps -= 1
+            else:
+                regions[a], regions[b] = ka, kb
+        spec = SudokuSpec(n, regions)
+        if generate_full_board(spec, max_restarts=2) is not None:
+            return regions
+
+
+# ----------------- 位掩码求解引擎（MRV + 唯一候选传播） -----------------
+# 候选数用 bit 1..n 表示；下面这些 9x9 常量供只支持标准 9x9 的引擎（DLX、难度评估）使用
+ALL_MASK = STANDARD_SPEC.all_mask
+UNITS = STANDARD_SPEC.units
+POPCOUNT = [popcount(m) for m in range(1 << 10)]
+BIT_DIGIT = {1 << d: d for d in range(1, 17)}
+
+
+def mask_digits(mask):
+    """把候选掩码拆成数字列表（从小到大）"""
+    return [d for d in range(1, mask.bit_length()) if mask >> d & 1]
+
+
+class SearchLimit(Exception):
+    """搜索节点数超过 max_nodes"""
+
+
+class BitmaskSolver:
+    """
+    行/列/区域各自维护已用数字掩码，搜索时：
+    - 先做唯一候选（naked single）和隐性唯一（hidden single）传播
+    - 再挑候选数最少的格子（MRV）分支
+    - 通过 trail 记录本层填入的格子，回溯时按 trail 撤销
+    外部接口仍然是 list-of-lists board；spec 缺省为标准 9x9，也可以是任意 SudokuSpec。
+    """
+
+    def __init__(self, board, spec=None):
+        self.spec = spec = spec or STANDARD_SPEC
+        self.grid = [0] * spec.cells
+        self.used = [0] * (3 * spec.size)
+        self.consistent = True
+        self.nodes = 0
+        self.max_nodes = None
+        n = spec.size
+        for r in range(n):
+            for c in range(n):
+                v = board[r][c]
+                if v == 0:
+                    continue
+                i = r * n + c
+                if not (self.candidates(i) >> v) & 1:
+                    # 题面本身冲突，必然无解
+                    self.consistent = False
+                self.place(i, v)
+
+    def candidates(self, i):
+        a, b, c = self.spec.cell_units[i]
+        used = self.used
+        return self.spec.all_mask & ~(used[a] | used[b] | used[c])
+
+    def place(self, i, v):
+        bit = 1 << v
+        self.grid[i] = v
+        used = self.used
+        for u in self.spec.cell_units[i]:
+            used[u] |= bit
+
+    def unplace(self, i):
+        bit = ~(1 << self.grid[i])
+        self.grid[i] = 0
+        used = self.used
+        for u in self.spec.cell_units[i]:
+            used[u] &= bit
+
+    def undo(self, trail):
+        for i in reversed(trail):
+            self.unplace(i)
+        trail.clear()
+
+    def propagate(self, trail):
+        """反复应用唯一候选/隐性唯一，填入的格子追加到 trail。出现矛盾返回 False。"""
+        grid = self.grid
+        cells = range(self.spec.cells)
+        all_mask = self.spec.all_mask
+        changed = True
+        while changed:
+            changed = False
+            # naked single：格子只剩一个候选
+            for i in cells:
+                if grid[i]:
+                    continue
+                m = self.candidates(i)
+                if not m:
+                    return False
+                if not m & (m - 1):
+                    self.place(i, BIT_DIGIT[m])
+                    trail.append(i)
+                    changed = True
+            # hidden single：某数字在一个单元里只剩一个位置
+            for unit in self.spec.units:
+                once = twice = placed = 0
+                for i in unit:
+                    if grid[i]:
+                        placed |= 1 << grid[i]
+                    else:
+                        m = self.candidates(i)
+                        twice |= once & m
+                        once |= m
+                if (once | placed) != all_mask:
+                    return False
+                hidden = once & ~twice
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for i in unit:
+                        if not grid[i] and self.candidates(i) & bit:
+                            self.place(i, BIT_DIGIT[bit])
+                            trail.append(i)
+                            changed = True
+                            break
+                    else:
+                        return False
+        return True
 
-    def fill():
-        pos = find_empty(board)
-        if not pos:
-            return True
-        r, c = pos
-        random.shuffle(numbers)
-        for val in numbers:
-            if valid(board, r, c, val):
-                board[r][c] = val
-                if fill():
-                    return True
-                board[r][c] = 0
+    def pick_cell(self):
+        """MRV：返回候选数最少的空格及其候选掩码；已填满返回 (-1, 0)"""
+        best, best_mask, best_n = -1, 0, self.spec.size + 1
+        grid = self.grid
+        for i in range(self.spec.cells):
+            if grid[i]:
+                continue
+            m = self.candidates(i)
+            n = popcount(m)
+            if n < best_n:
+                best, best_mask, best_n = i, m, n
+                if n <= 2:
+                    break
+        return best, best_mask
+
+    def search(self, limit=1, rng=None, max_nodes=None):
+        """
+        深度优先搜索，最多找到 limit 个解后停止。
+        第一个解保存在 self.solution（扁平列表）。rng 不为空时随机化数字顺序。
+        max_nodes 不为空时，访问节点数超过它就放弃（self.aborted 为 True，返回已找到的解数）。
+        """
+        self.solution = None
+        self.count = 0
+        self.aborted = False
+        self.max_nodes = None if max_nodes is None else self.nodes + max_nodes
+        if self.consistent:
+            try:
+                self._search(limit, rng)
+            except SearchLimit:
+                self.aborted = True
+        return self.count
+
+    def _search(self, limit, rng):
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise SearchLimit
+        trail = []
+        try:
+            if self.propagate(trail):
+                i, mask = self.pick_cell()
+                if i < 0:
+                    self.count += 1
+                    if self.solution is None:
+                        self.solution = self.grid[:]
+                else:
+                    digits = mask_digits(mask)
+                    if rng is not None:
+                        rng.shuffle(digits)
+                    for v in digits:
+                        self.place(i, v)
+                        try:
+                            self._search(limit, rng)
+                        finally:
+                            self.unplace(i)
+                        if self.count >= limit:
+                            break
+        finally:
+            self.undo(trail)
+
+    def solution_board(self):
+        n = self.spec.size
+        s = self.solution
+        return [s[r * n:(r + 1) * n] for r in range(n)]
+
+
+def solve_backtrack(board, spec=None):
+    """原地填入解，返回是否有解（位掩码引擎，接口与原来的回溯版相同）"""
+    solver = BitmaskSolver(board, spec)
+    if not solver.search(limit=1):
         return False
+    for r, row in enumerate(solver.solution_board()):
+        board[r][:] = row
+    return True
+
 
-    fill()
-    return board
+def count_solutions(board, limit=2, spec=None):
+    """计数解的数量，找到 limit 个解时提前返回；board 不会被修改"""
+    return BitmaskSolver(board, spec).search(limit=limit)
+
+
+# 非 9x9 盘面唯一解检查的节点上限（见 PuzzleCarver）
+UNIQUE_CHECK_NODES = 30
+# 大盘面/锯齿盘面随机填满时偶尔会陷入很深的搜索，超过这么多节点就换个随机顺序重来
+FILL_MAX_NODES = 3000
+
+
+def generate_full_board(spec=None, max_restarts=None):
+    # 生成完整解（随机化位掩码搜索）；重启 max_restarts 次仍失败返回 None（默认一直重试）
+    spec = spec or STANDARD_SPEC
+    attempt = 0
+    while max_restarts is None or attempt <= max_restarts:
+        solver = BitmaskSolver(spec.empty_board(), spec)
+        if solver.search(limit=1, rng=random, max_nodes=FILL_MAX_NODES):
+            return solver.solution_board()
+        attempt += 1
+    return None
 
 
-def make_puzzle_with_uniqueness(full_board, empties, ensure_unique=True):
-    board = [row[:] for row in full_board]
-    coords = [(r, c) for r in range(9) for c in range(9)]
-    random.shuffle(coords)
-    removed = 0
-    for r, c in coords:
-        if removed >= empties:
+
+# ----------------- Dancing Links（Algorithm X）解计数引擎 -----------------
+# 精确覆盖矩阵：324 列（格子/行-数字/列-数字/宫-数字各 81 列），729 行（每个格子填每个数字）
+# 矩阵只构建一次；题面的已知数以"选中行"的方式压栈（cover），去掉已知数就出栈（uncover），
+# 这样相邻两次计数之间只需要撤销/重做变化的那几行，而不用重建矩阵。
+
+class DancingLinks:
+    def __init__(self):
+        n_cols = 324
+        # 0 号为表头，1..324 为列头
+        self.L = list(range(-1, n_cols))
+        self.L[0] = n_cols
+        self.R = list(range(1, n_cols + 2)); self.R[n_cols] = 0
+        self.U = list(range(n_cols + 1))
+        self.D = list(range(n_cols + 1))
+        self.C = list(range(n_cols + 1))
+        self.S = [0] * (n_cols + 1)
+        self.covered = [False] * (n_cols + 1)
+        # row_node[(r*9+c)*9 + v-1] = 该行第一个节点
+        self.row_node = [0] * 729
+        for r in range(9):
+            for c in range(9):
+                b = (r // 3) * 3 + c // 3
+                for v in range(1, 10):
+                    cols = (1 + r * 9 + c, 82 + r * 9 + v - 1, 163 + c * 9 + v - 1, 244 + b * 9 + v - 1)
+                    self.row_node[(r * 9 + c) * 9 + v - 1] = self._add_row(cols)
+        # 已选中的已知数栈：(cell, val, node)，node 为 None 表示与已有已知数冲突
+        self.clues = []
+        self.conflicts = 0
+        self.nodes = 0
+
+    def _add_row(self, cols):
+        first = len(self.C)
+        for k, col in enumerate(cols):
+            x = first + k
+            self.C.append(col)
+            self.U.append(self.U[col])
+            self.D.append(col)
+            self.D[self.U[col]] = x
+            self.U[col] = x
+            self.S[col] += 1
+            self.L.append(first + (k - 1) % len(cols))
+            self.R.append(first + (k + 1) % len(cols))
+        return first
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        self.covered[c] = True
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+        self.covered[c] = False
+
+    # ---- 已知数的增量压栈 / 出栈 ----
+    def push_clue(self, r, c, v):
+        node = self.row_node[(r * 9 + c) * 9 + v - 1]
+        j = node
+        while True:
+            if self.covered[self.C[j]]:
+                # 与已有已知数冲突：记录下来，计数时直接返回 0
+                self.clues.append((r * 9 + c, v, None))
+                self.conflicts += 1
+                return
+            j = self.R[j]
+            if j == node:
+                break
+        while True:
+            self.cover(self.C[j])
+            j = self.R[j]
+            if j == node:
+                break
+        self.clues.append((r * 9 + c, v, node))
+
+    def pop_clue(self):
+        cell, v, node = self.clues.pop()
+        if node is None:
+            self.conflicts -= 1
+            return cell, v
+        j = self.L[node]
+        while True:
+            self.uncover(self.C[j])
+            if j == node:
+                break
+            j = self.L[j]
+        return cell, v
+
+    def sync(self, board):
+        """
+        让已知数栈与 board 一致。栈底与 board 相同的部分保留，
+        只回退第一个不一致位置之上的已知数，再把仍然需要的和新增的重新压栈。
+        """
+        wanted = {r * 9 + c: board[r][c] for r in range(9) for c in range(9) if board[r][c]}
+        keep = 0
+        for cell, v, _ in self.clues:
+            if wanted.get(cell) != v:
+                break
+            keep += 1
+        replay = []
+        while len(self.clues) > keep:
+            cell, v = self.pop_clue()
+            if wanted.get(cell) == v:
+                replay.append((cell, v))
+        present = {cell for cell, _, _ in self.clues}
+        for cell, v in reversed(replay):
+            self.push_clue(cell // 9, cell % 9, v)
+            present.add(cell)
+        for cell, v in wanted.items():
+            if cell not in present:
+                self.push_clue(cell // 9, cell % 9, v)
+
+    # ---- 计数 ----
+    def count_solutions(self, board, limit=2):
+        """与 count_solutions 相同的接口；board 不会被修改，矩阵在多次调用之间复用"""
+        self.sync(board)
+        return self.count_current(limit)
+
+    def count_current(self, limit=2):
+        """对当前已知数栈计数"""
+        if self.conflicts:
+            return 0
+        self.count = 0
+        self._search(limit)
+        return self.count
+
+    def _search(self, limit):
+        self.nodes += 1
+        R, D, S = self.R, self.D, self.S
+        if R[0] == 0:
+            self.count += 1
+            return
+        # 选择剩余行数最少的列
+        c = R[0]
+        best, best_s = c, S[c]
+        while c != 0 and best_s > 1:
+            if S[c] < best_s:
+                best, best_s = c, S[c]
+            c = R[c]
+        if best_s == 0:
+            return
+        c = best
+        self.cover(c)
+        r = D[c]
+        while r != c:
+            j = R[r]
+            while j != r:
+                self.cover(self.C[j])
+                j = R[j]
+            self._search(limit)
+            j = self.L[r]
+            while j != r:
+                self.uncover(self.C[j])
+                j = self.L[j]
+            if self.count >= limit:
+                break
+            r = D[r]
+        self.uncover(c)
+
+
+class PuzzleCarver:
+    """
+    在已知完整解上逐格挖空的增量生成器。
+    - 当前题面一直保持唯一解（解就是 solution），所以挖掉 (r, c) 后如果出现第二个解，
+      它一定在 (r, c) 上与 solution 不同：只需把 (r, c) 试填为其它数字，看是否还有解
+    - 挖空失败的格子记入 essential：之后题面只会更少已知数，它永远不能再挖，不再重试
+    - 标准 9x9 的检查共用一个 DancingLinks 矩阵，已知数按挖空顺序的逆序压栈；
+      其它盘面（spec）用 BitmaskSolver 检查，单次检查超过 UNIQUE_CHECK_NODES 个节点就当作“可能有第二解”保留该格，
+      这样题面仍然保证唯一解，16x16 也能在几秒内挖完
+    """
+
+    def __init__(self, full_board, order=None, spec=None):
+        self.spec = spec = spec or STANDARD_SPEC
+        n = spec.size
+        self.solution = [row[:] for row in full_board]
+        self.board = [row[:] for row in full_board]
+        self.order = order if order is not None else [(r, c) for r in range(n) for c in range(n)]
+        self.essential = set()
+        self.removed = 0
+        self.dlx = None
+        if spec.standard9:
+            self.dlx = DancingLinks()
+            for r, c in reversed(self.order):
+                self.dlx.push_clue(r, c, self.board[r][c])
+
+    def has_other_solution(self, r, c):
+        """board[r][c] 已挖空时，判断是否存在 (r, c) 处不同于 solution 的解"""
+        if self.dlx:
+            self.dlx.sync(self.board)
+        bits = self._candidates(r, c) & ~(1 << self.solution[r][c])
+        for v in mask_digits(bits):
+            if self.dlx:
+                self.dlx.push_clue(r, c, v)
+                found = self.dlx.count_current(limit=1)
+                self.dlx.pop_clue()
+            else:
+                self.board[r][c] = v
+                solver = BitmaskSolver(self.board, self.spec)
+                found = solver.search(limit=1, max_nodes=UNIQUE_CHECK_NODES) or solver.aborted
+                self.board[r][c] = 0
+            if found:
+                return True
+        return False
+
+    def _candidates(self, r, c):
+        n = self.spec.size
+        b = self.board
+        used = 0
+        for j in self.spec.peers[r * n + c]:
+            used |= 1 << b[j // n][j % n]
+        return self.spec.all_mask & ~used
+
+    def try_remove(self, r, c):
+        if (r, c) in self.essential or self.board[r][c] == 0:
+            return False
+        self.board[r][c] = 0
+        if self.has_other_solution(r, c):
+            self.board[r][c] = self.solution[r][c]
+            self.essential.add((r, c))
+            return False
+        self.removed += 1
+        return True
+
+    def carve(self, empties):
+        """按 order 继续挖空直到挖够 empties 个或无格可挖，返回题面副本"""
+        for r, c in self.order:
+            if self.removed >= empties:
+                break
+            self.try_remove(r, c)
+        return [row[:] for row in self.board]
+
+
+def make_puzzle_with_uniqueness(full_board, empties, ensure_unique=True, attempts=1, spec=None):
+    """
+    从完整解挖出 empties 个空格。ensure_unique 时保证唯一解；
+    唯一解题面挖到极小后就挖不动了，attempts > 1 时换不同的挖空顺序多试几次，取空格最多的一次。
+    spec 缺省为标准 9x9。
+    """
+    n = len(full_board)
+    coords = [(r, c) for r in range(n) for c in range(n)]
+    if not ensure_unique:
+        board = [row[:] for row in full_board]
+        for r, c in random.sample(coords, min(empties, n * n)):
+            board[r][c] = 0
+        return board
+    best = None
+    for _ in range(max(1, attempts)):
+        random.shuffle(coords)
+        carver = PuzzleCarver(full_board, coords[:], spec)
+        puzzle = carver.carve(empties)
+        if best is None or carver.removed > best[0]:
+            best = (carver.removed, puzzle)
+        if carver.removed >= empties:
             break
-        backup = board[r][c]
-        board[r][c] = 0
-        if ensure_unique:
-            # 检查唯一解
-            copied = [row[:] for row in board]
-            cnt = count_solutions(copied, limit=2)
-            if cnt != 1:
-                # 不唯一，回退
-                board[r][c] = backup
+    return best[1]
+
+# ----------------- 难度评估：按人类解题技巧逐步求解 -----------------
+# 候选网格为 81 个位掩码，技巧按难度从低到高排列；每一步都从最简单的技巧重新开始尝试，
+# 评分 = 用到的最难技巧 + 总步数。所有技巧都失效时记为“需要试探”。
+# 每步从头重试的代价靠增量状态压下来：唯一候选的格子、每个单元里每个数字的候选位置数（隐性唯一）
+# 和“有空格没有候选”都在删候选时顺手更新，按单元扫描的技巧记住每个单元上次扫描无果时的时间戳，
+# 单元之后没变过就跳过。
+CELL_UNITS = STANDARD_SPEC.cell_units
+PEERS = STANDARD_SPEC.peers
+PEER_SETS = [set(p) for p in PEERS]
+# 宫与行/列的交叉部分：(宫, 线) -> 交叉的格子
+BOX_LINE_CELLS = {(18 + b, u): [i for i in UNITS[18 + b] if i in set(UNITS[u])]
+                  for b in range(9) for u in range(18)
+                  if set(UNITS[18 + b]) & set(UNITS[u])}
+
+
+class LogicSolver:
+    """只用逻辑技巧（不猜测）求解，用于评估难度和给出逻辑提示"""
+
+    def __init__(self, board):
+        self.grid = [0] * 81
+        self.valid = True
+        used = [0] * 27
+        for i in range(81):
+            v = board[i // 9][i % 9]
+            if v:
+                bit = 1 << v
+                units = CELL_UNITS[i]
+                if any(used[u] & bit for u in units):
+                    self.valid = False
+                self.grid[i] = v
+                for u in units:
+                    used[u] |= bit
+        self.cand = cand = [0 if self.grid[i] else ALL_MASK & ~(used[a] | used[b] | used[c])
+                            for i, (a, b, c) in enumerate(CELL_UNITS)]
+        # 增量状态：只剩一个候选的空格、每个单元里每个数字的候选位置数和只剩一个位置的 (单元, 数字)、
+        # 是否出现没有候选的空格、每个单元最后一次改动的时间戳，
+        # 以及各技巧在每个单元（或单元组合）上扫描无果时的时间戳
+        self.singles = {i for i in range(81) if cand[i] and not cand[i] & (cand[i] - 1)}
+        self.dead = any(not self.grid[i] and not cand[i] for i in range(81))
+        self.positions = [[0] * 10 for _ in range(27)]
+        self.hidden = set()
+        for u, unit in enumerate(UNITS):
+            counts = self.positions[u]
+            for i in unit:
+                m = cand[i]
+                while m:
+                    bit = m & -m
+                    m ^= bit
+                    counts[BIT_DIGIT[bit]] += 1
+            self.hidden.update((u, d) for d in range(1, 10) if counts[d] == 1)
+        self.tick = 0
+        self.unit_stamp = [0] * 27
+        self.scanned = {}
+
+    def _changed(self, j, old, m):
+        """格子 j 的候选从 old 变成 m 后更新增量状态"""
+        stamp, tick, positions = self.unit_stamp, self.tick, self.positions
+        removed = old & ~m
+        for u in CELL_UNITS[j]:
+            stamp[u] = tick
+            counts = positions[u]
+            bits = removed
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                d = BIT_DIGIT[bit]
+                counts[d] -= 1
+                if counts[d] == 1:
+                    self.hidden.add((u, d))
+        if not m & (m - 1):
+            if m:
+                self.singles.add(j)
+            elif not self.grid[j]:
+                self.dead = True
+
+    def place(self, i, v):
+        self.tick += 1
+        cand = self.cand
+        self.grid[i] = v
+        self._changed(i, cand[i], 0)
+        cand[i] = 0
+        self.singles.discard(i)
+        # 同伴格只会删掉 v 这一个候选，_changed 的逻辑在这里展开（这是最热的循环）
+        bit = 1 << v
+        stamp, tick, positions, hidden, singles = self.unit_stamp, self.tick, self.positions, self.hidden, self.singles
+        for j in PEERS[i]:
+            m = cand[j]
+            if m & bit:
+                m ^= bit
+                cand[j] = m
+                for u in CELL_UNITS[j]:
+                    stamp[u] = tick
+                    counts = positions[u]
+                    counts[v] -= 1
+                    if counts[v] == 1:
+                        hidden.add((u, v))
+                if not m & (m - 1):
+                    if m:
+                        singles.add(j)
+                    else:
+                        self.dead = True
+
+    def eliminate(self, cells, mask):
+        """从 cells 中删除 mask 里的候选，返回是否有变化"""
+        changed = False
+        cand = self.cand
+        for j in cells:
+            m = cand[j]
+            if m & mask:
+                if not changed:
+                    self.tick += 1
+                    changed = True
+                cand[j] = m & ~mask
+                self._changed(j, m, m & ~mask)
+        return changed
+
+    def mark_scanned(self, key):
+        self.scanned[key] = self.tick
+
+    def broken(self):
+        return self.dead
+
+    def solved(self):
+        return all(self.grid)
+
+    # ---- 技巧：每个函数应用一次，返回是否取得进展 ----
+    def naked_single(self):
+        while self.singles:
+            i = self.singles.pop()
+            m = self.cand[i]
+            # 集合里可能有已经填上或又被删成 0 的格子
+            if m and not m & (m - 1):
+                self.place(i, BIT_DIGIT[m])
+                return True
+        return False
+
+    def hidden_single(self):
+        cand = self.cand
+        while self.hidden:
+            u, d = self.hidden.pop()
+            # 集合里可能有之后又被删成 0 个位置（已填或无解）的记录
+            if self.positions[u][d] != 1:
+                continue
+            bit = 1 << d
+            for i in UNITS[u]:
+                if cand[i] & bit:
+                    self.place(i, d)
+                    return True
+        return False
+
+    def locked_candidates(self):
+        """区块摒除：宫内某数只在一条线上（pointing），或线上某数只在一个宫里（claiming）"""
+        cand, stamp, scanned = self.cand, self.unit_stamp, self.scanned
+        for (box, line), cross in BOX_LINE_CELLS.items():
+            key = ('locked', box, line)
+            seen = scanned.get(key, -1)
+            if stamp[box] <= seen and stamp[line] <= seen:
                 continue
-        removed += 1
-    return board
+            inside = 0
+            for i in cross:
+                inside |= cand[i]
+            if not inside:
+                continue
+            box_rest = line_rest = 0
+            for i in UNITS[box]:
+                if i not in cross:
+                    box_rest |= cand[i]
+            for i in UNITS[line]:
+                if i not in cross:
+                    line_rest |= cand[i]
+            pointing = inside & ~box_rest & line_rest
+            if pointing:
+                self.eliminate([i for i in UNITS[line] if i not in cross], pointing)
+                return True
+            claiming = inside & ~line_rest & box_rest
+            if claiming:
+                self.eliminate([i for i in UNITS[box] if i not in cross], claiming)
+                return True
+            self.mark_scanned(key)
+        return False
+
+    def _naked_subset(self, size):
+        cand, stamp, scanned = self.cand, self.unit_stamp, self.scanned
+        for u, unit in enumerate(UNITS):
+            key = ('naked', size, u)
+            if stamp[u] <= scanned.get(key, -1):
+                continue
+            cells = [i for i in unit if cand[i] and POPCOUNT[cand[i]] <= size]
+            for combo in itertools.combinations(cells, size):
+                union = 0
+                for i in combo:
+                    union |= cand[i]
+                if POPCOUNT[union] == size:
+                    others = [i for i in unit if i not in combo]
+                    if self.eliminate(others, union):
+                        return True
+            self.mark_scanned(key)
+        return False
+
+    def _hidden_subset(self, size):
+        cand, stamp, scanned = self.cand, self.unit_stamp, self.scanned
+        for u, unit in enumerate(UNITS):
+            key = ('hidden', size, u)
+            if stamp[u] <= scanned.get(key, -1):
+                continue
+            counts = self.positions[u]
+            where = {d: [i for i in unit if cand[i] >> d & 1]
+                     for d in range(1, 10) if 2 <= counts[d] <= size}
+            for digits in itertools.combinations(where, size):
+                cells = set()
+                for d in digits:
+                    cells.update(where[d])
+                if len(cells) == size:
+                    keep = 0
+                    for d in digits:
+                        keep |= 1 << d
+                    if self.eliminate(cells, ALL_MASK & ~keep):
+                        return True
+            self.mark_scanned(key)
+        return False
+
+    def naked_pair(self):
+        return self._naked_subset(2)
+
+    def hidden_pair(self):
+        return self._hidden_subset(2)
+
+    def naked_triple(self):
+        return self._naked_subset(3)
+
+    def hidden_triple(self):
+        return self._hidden_subset(3)
+
+    def _fish(self, size):
+        """X-Wing(2) / 剑鱼(3)：size 条行（列）里某数只出现在同样 size 列（行）上"""
+        cand = self.cand
+        for d in range(1, 10):
+            bit = 1 << d
+            for base, cover in ((0, 9), (9, 0)):
+                lines = []
+                for k in range(9):
+                    if not 2 <= self.positions[base + k][d] <= size:
+                        continue
+                    pos = 0
+                    for n, i in enumerate(UNITS[base + k]):
+                        if cand[i] & bit:
+                            pos |= 1 << n
+                    lines.append((k, pos))
+                for combo in itertools.combinations(lines, size):
+                    pos = 0
+                    for _, p in combo:
+                        pos |= p
+                    if POPCOUNT[pos] != size:
+                        continue
+                    base_lines = {k for k, _ in combo}
+                    targets = [i for n in range(9) if pos >> n & 1
+                               for k, i in enumerate(UNITS[cover + n]) if k not in base_lines]
+                    if self.eliminate(targets, bit):
+                        return True
+        return False
+
+    def x_wing(self):
+        return self._fish(2)
+
+    def swordfish(self):
+        return self._fish(3)
+
+    def xy_wing(self):
+        cand = self.cand
+        bivalue = [i for i in range(81) if POPCOUNT[cand[i]] == 2]
+        for pivot in bivalue:
+            pm = cand[pivot]
+            wings = [j for j in PEERS[pivot] if POPCOUNT[cand[j]] == 2 and POPCOUNT[cand[j] & pm] == 1]
+            for a, b in itertools.combinations(wings, 2):
+                ma, mb = cand[a], cand[b]
+                if ma == mb or (ma & pm) == (mb & pm):
+                    continue
+                z = ma & mb & ~pm
+                if z and POPCOUNT[ma | mb | pm] == 3:
+                    common = PEER_SETS[a] & PEER_SETS[b]
+                    common.discard(pivot)
+                    if self.eliminate(common, z):
+                        return True
+        return False
+
+
+# (名称, 方法名)，顺序即难度等级（从 1 开始）
+TECHNIQUES = [
+    ('隐性唯一', 'hidden_single'),
+    ('唯一候选', 'naked_single'),
+    ('区块摒除', 'locked_candidates'),
+    ('显性数对', 'naked_pair'),
+    ('隐性数对', 'hidden_pair'),
+    ('显性三数组', 'naked_triple'),
+    ('隐性三数组', 'hidden_triple'),
+    ('X-Wing', 'x_wing'),
+    ('XY-Wing', 'xy_wing'),
+    ('剑鱼', 'swordfish'),
+]
+GUESS_LEVEL = len(TECHNIQUES) + 1
+# 难度 -> 可接受的技巧等级范围 (最低, 最高)，各难度互不重叠：
+# 简单只用唯一数，中等要用到区块摒除/数对，困难要用到三数组及以上的技巧，专家是这些技巧都解不出、需要试探的题
+DIFFICULTY_RATING = {'简单': (1, 2), '中等': (3, 4), '困难': (5, GUESS_LEVEL - 1), '专家': (GUESS_LEVEL, GUESS_LEVEL)}
+# 生成时评分不达标的最大重试次数
+RATE_ATTEMPTS = 50
+
+
+def rate_puzzle(board):
+    """
+    用 TECHNIQUES 逐步求解并评分，board 不会被修改。返回 dict：
+    - level：用到的最难技巧等级（1..len(TECHNIQUES)），只靠技巧解不出时为 GUESS_LEVEL
+    - technique：对应名称
+    - steps：应用技巧的总步数
+    - counts：每种技巧的使用次数
+    - solved：是否只靠技巧解完；题面冲突时 level 为 0
+    """
+    solver = LogicSolver(board)
+    result = {'level': 0, 'technique': '', 'steps': 0, 'counts': {}, 'solved': False}
+    if not solver.valid:
+        return result
+    methods = [getattr(solver, name) for _, name in TECHNIQUES]
+    while not solver.solved():
+        if solver.broken():
+            result['level'] = 0
+            return result
+        for level, method in enumerate(methods, 1):
+            if method():
+                name = TECHNIQUES[level - 1][0]
+                result['steps'] += 1
+                result['counts'][name] = result['counts'].get(name, 0) + 1
+                if level > result['level']:
+                    result['level'] = level
+                    result['technique'] = name
+                break
+        else:
+            result['level'] = GUESS_LEVEL
+            result['technique'] = '需要试探'
+            return result
+    result['solved'] = True
+    return result
+
+
+# ----------------- 候选数跟踪：驱动铅笔记号、提示和冲突高亮 -----------------
+
+class CandidateTracker:
+    """
+    跟踪玩家当前盘面：行/列/区域里每个数字出现的次数（玩家可能填出冲突，所以用计数而不是掩码），
+    由计数得到各单元的已用掩码，格子的候选数 = all_mask 去掉三个单元的已用掩码。
+    set() 只更新所在的三个单元，冲突格也只在这三个单元里重新判断，不用扫描整个盘面。
+    """
+
+    def __init__(self, board, spec=None):
+        self.spec = spec = spec or STANDARD_SPEC
+        n = spec.size
+        self.values = [0] * spec.cells
+        self.counts = [[0] * (n + 1) for _ in range(3 * n)]
+        self.used = [0] * (3 * n)
+        self.conflicts = set()
+        for r in range(n):
+            for c in range(n):
+                if board[r][c]:
+                    self.set(r, c, board[r][c])
+
+    def set(self, r, c, v):
+        spec = self.spec
+        i = r * spec.size + c
+        old = self.values[i]
+        if old == v:
+            return
+        units = spec.cell_units[i]
+        counts, used = self.counts, self.used
+        if old:
+            for u in units:
+                counts[u][old] -= 1
+                if not counts[u][old]:
+                    used[u] &= ~(1 << old)
+        self.values[i] = v
+        if v:
+            for u in units:
+                counts[u][v] += 1
+                used[u] |= 1 << v
+        # 只有三个单元里数值为 old / v 的格子冲突状态可能改变
+        self.conflicts.discard(i)
+        for u in units:
+            for j in spec.units[u]:
+                d = self.values[j]
+                if d and (d == old or d == v):
+                    if any(counts[w][d] > 1 for w in spec.cell_units[j]):
+                        self.conflicts.add(j)
+                    else:
+                        self.conflicts.discard(j)
+
+    def candidates(self, r, c):
+        """空格的候选掩码；已填格返回 0"""
+        i = r * self.spec.size + c
+        if self.values[i]:
+            return 0
+        a, b, w = self.spec.cell_units[i]
+        return self.spec.all_mask & ~(self.used[a] | self.used[b] | self.used[w])
+
+    def is_conflict(self, r, c):
+        return r * self.spec.size + c in self.conflicts
+
+    def find_single(self):
+        """
+        找一个只靠唯一候选/隐性唯一就能确定的格子，返回 (r, c, v, 技巧名)；找不到返回 None。
+        有冲突时候选数不可靠，直接返回 None。
+        """
+        if self.conflicts:
+            return None
+        n = self.spec.size
+        masks = [self.candidates(i // n, i % n) for i in range(self.spec.cells)]
+        for i, m in enumerate(masks):
+            if m and not m & (m - 1):
+                return i // n, i % n, BIT_DIGIT[m], '唯一候选'
+        for unit in self.spec.units:
+            once = twice = 0
+            for i in unit:
+                twice |= once & masks[i]
+                once |= masks[i]
+            hidden = once & ~twice
+            if hidden:
+                bit = hidden & -hidden
+                for i in unit:
+                    if masks[i] & bit:
+                        return i // n, i % n, BIT_DIGIT[bit], '隐性唯一'
+        return None
+
+
+# ----------------- 题库：预生成题目的 SQLite 存储 + 后台补货 -----------------
+
+def board_to_str(board):
+    """9x9 board -> 81 个字符（0 表示空格）"""
+    return ''.join(str(v) for row in board for v in row)
+
+
+def str_to_board(text):
+    return [[int(ch) for ch in text[r * 9:(r + 1) * 9]] for r in range(9)]
+
+
+def generate_puzzle(difficulty, attempts=RATE_ATTEMPTS, progress=None):
+    """
+    按难度生成一道唯一解题目，返回 (puzzle, full_board)。
+    空格数由 DIFFICULTY_LEVELS 决定，再用 rate_puzzle 确认所需技巧落在 DIFFICULTY_RATING 范围内；
+    重试 attempts 次仍不达标时返回最接近的一道。progress(已试次数, attempts) 在每次尝试后调用。
+    """
+    low, high = DIFFICULTY_RATING[difficulty]
+    best = None
+    attempts = max(1, attempts)
+    for i in range(attempts):
+        full_board = generate_full_board()
+        puzzle = make_puzzle_with_uniqueness(full_board, DIFFICULTY_LEVELS[difficulty], True, CARVE_ATTEMPTS)
+        level = rate_puzzle(puzzle)['level']
+        if progress:
+            progress(i + 1, attempts)
+        if low <= level <= high:
+            return puzzle, full_board
+        miss = low - level if level < low else level - high
+        if best is None or miss < best[0]:
+            best = (miss, puzzle, full_board)
+    return best[1], best[2]
+
+
+def bank_refill_worker(tasks, out):
+    """
+    题库补货子进程入口：从 tasks 取难度，生成一道题放进 out；取到 None 时退出。
+    出题是纯 CPU 计算，放在子进程里才不会因为 GIL 拖慢 Tk 界面。
+    """
+    # 各子进程的随机状态必须各自重新播种，否则会出同一道题
+    random.seed()
+    while True:
+        difficulty = tasks.get()
+        if difficulty is None:
+            return
+        out.put((difficulty, *generate_puzzle(difficulty)))
+
+
+class PuzzleBank:
+    """
+    每道题一行：difficulty + 81 字符的题面/解。
+    draw() 取走该难度下 id 最小的一道（走 (difficulty, id) 索引，O(1)），
+    库存低于 low_water 时唤醒后台线程补到 target。
+    后台线程只负责派活和写库，出题在 bank_refill_worker 子进程里进行；
+    子进程第一次真正需要补货时才启动，库存充足时启动程序不会多占一个核。
+    """
+
+    def __init__(self, path=BANK_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS puzzles ('
+                          'id INTEGER PRIMARY KEY, difficulty TEXT NOT NULL, '
+                          'puzzle TEXT NOT NULL, solution TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_puzzles_difficulty ON puzzles (difficulty, id)')
+        self.conn.commit()
+        self.counts = {d: 0 for d in DIFFICULTY_LEVELS}
+        for d, n in self.conn.execute('SELECT difficulty, COUNT(*) FROM puzzles GROUP BY difficulty'):
+            self.counts[d] = n
+        self.low_water = BANK_LOW_WATER
+        self.target = BANK_TARGET
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._refiller = None
+        self._worker_lock = threading.Lock()
+        self._worker = None
+        self._tasks = None
+        self._results = None
+
+    def count(self, difficulty):
+        return self.counts.get(difficulty, 0)
+
+    def add(self, difficulty, puzzle, solution):
+        self.add_many(difficulty, [(puzzle, solution)])
+
+    def add_many(self, difficulty, items):
+        rows = [(difficulty, board_to_str(p), board_to_str(s)) for p, s in items]
+        with self.lock:
+            self.conn.executemany('INSERT INTO puzzles (difficulty, puzzle, solution) VALUES (?, ?, ?)', rows)
+            self.conn.commit()
+            self.counts[difficulty] = self.counts.get(difficulty, 0) + len(rows)
+
+    def draw(self, difficulty):
+        """取走一道题，返回 (puzzle, full_board)；库存为空返回 None"""
+        with self.lock:
+            row = self.conn.execute('SELECT id, puzzle, solution FROM puzzles WHERE difficulty = ? '
+                                    'ORDER BY id LIMIT 1', (difficulty,)).fetchone()
+            if row is None:
+                item = None
+            else:
+                self.conn.execute('DELETE FROM puzzles WHERE id = ?', (row[0],))
+                self.conn.commit()
+                self.counts[difficulty] -= 1
+                item = (str_to_board(row[1]), str_to_board(row[2]))
+        if self.count(difficulty) < self.low_water:
+            self._wakeup.set()
+        return item
+
+    def start_refiller(self, low_water=BANK_LOW_WATER, target=BANK_TARGET):
+        self.low_water = low_water
+        self.target = target
+        if self._refiller is None:
+            self._refiller = threading.Thread(target=self._refill_loop, daemon=True)
+            self._refiller.start()
+        # 只有库存低于 low_water 才补货，之后由 draw() 在取题时唤醒
+        if any(self.count(d) < self.low_water for d in DIFFICULTY_LEVELS):
+            self._wakeup.set()
+
+    def _start_worker(self):
+        """启动出题子进程；已经 close() 时返回 False"""
+        with self._worker_lock:
+            if self._stop.is_set():
+                return False
+            if self._worker is None:
+                # spawn：不把 Tk 和题库线程 fork 进子进程
+                ctx = multiprocessing.get_context('spawn')
+                self._tasks = ctx.Queue()
+                self._results = ctx.Queue()
+                self._worker = ctx.Process(target=bank_refill_worker, args=(self._tasks, self._results), daemon=True)
+                self._worker.start()
+            return True
+
+    def _refill_loop(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            for difficulty in DIFFICULTY_LEVELS:
+                # 一道一道补，GUI 随时都能拿到新补的题；等结果时线程阻塞在队列上，不占 GIL
+                while not self._stop.is_set() and self.count(difficulty) < self.target:
+                    if not self._start_worker():
+                        return
+                    self._tasks.put(difficulty)
+                    item = self._results.get()
+                    if item is None or self._stop.is_set():
+                        return
+                    self.add(*item)
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        with self._worker_lock:
+            if self._worker is not None:
+                self._worker.terminate()
+                self._worker.join()
+                self._worker = None
+                # 唤醒可能还在等结果的补货线程
+                self._results.put(None)
+        # 等补货线程退出后再关连接，避免它在关闭后写库
+        if self._refiller is not None:
+            self._refiller.join()
+        with self.lock:
+            self.conn.close()
 
 # ----------------- 应用：撤销/重做、存档、铅笔记号 -----------------
 
+# ----------------- 紧凑存档 + 操作日志 -----------------
+# 存档（.sudoku）为二进制：文件头 + [区域表] + 完整解/题面/当前盘面（每格 bit_length(n) 位，9x9 即半字节）
+# + 当前盘面空格的铅笔掩码（每格 n 位），9x9 存档约 230 字节。
+# 存档旁的 <存档>.journal 是只追加的操作日志：每个动作写一条记录（长度与改动的格子数成正比），
+# 读档时在存档快照上重放，程序崩溃也只会丢失最后一条没写完的记录（续写前先截掉它）。
+# 撤销/重做记录带着对应动作的差异，存档之前的动作在读档后也能正确撤销。
+
+SAVE_MAGIC = b'SDK\x01'
+SAVE_HEADER = struct.Struct('<4sBBBI')  # 魔数, 边长, 标志位, 难度序号, 用时（秒）
+SAVE_FLAG_JIGSAW = 1
+SAVE_FLAG_UNIQUE = 2
+# 未手动存档时的自动存档位置（与脚本同目录）
+AUTOSAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sudoku_autosave.sudoku')
+
+JOURNAL_HEADER = struct.Struct('<BHHI')  # 操作, 改动格数, 铅笔改动数, 用时（秒）
+JOURNAL_CELL = struct.Struct('<BBBB')    # 行, 列, 旧值, 新值
+JOURNAL_PENCIL = struct.Struct('<BBH')   # 行, 列, 铅笔掩码异或量（右移一位，16x16 也放得下）
+OP_DIFF, OP_UNDO, OP_REDO = range(1, 4)
+
+
+def pack_bits(values, width):
+    acc = 0
+    for i, v in enumerate(values):
+        acc |= v << (i * width)
+    return acc.to_bytes((len(values) * width + 7) // 8, 'little')
+
+
+def unpack_bits(data, pos, count, width):
+    """从 data[pos:] 读出 count 个 width 位的值，返回 (值列表, 新位置)"""
+    end = pos + (count * width + 7) // 8
+    if end > len(data):
+        raise ValueError('存档数据不完整')
+    acc = int.from_bytes(data[pos:end], 'little')
+    mask = (1 << width) - 1
+    return [(acc >> (i * width)) & mask for i in range(count)], end
+
+
+def encode_save(state):
+    """
+    state: size, regions（标准宫为 None）, full_board, puzzle, board, pencils（位掩码）,
+    difficulty, ensure_unique, elapsed；固定格由 puzzle 非零推出，不单独存
+    """
+    n = state['size']
+    levels = list(DIFFICULTY_LEVELS)
+    flags = (SAVE_FLAG_JIGSAW if state['regions'] else 0) | (SAVE_FLAG_UNIQUE if state['ensure_unique'] else 0)
+    diff = levels.index(state['difficulty']) if state['difficulty'] in levels else 0xFF
+    parts = [SAVE_HEADER.pack(SAVE_MAGIC, n, flags, diff, int(state['elapsed']))]
+    if state['regions']:
+        parts.append(pack_bits(state['regions'], max(1, (n - 1).bit_length())))
+    width = n.bit_length()
+    for key in ('full_board', 'puzzle', 'board'):
+        parts.append(pack_bits([v for row in state[key] for v in row], width))
+    # 铅笔只存当前盘面的空格，掩码右移一位去掉不用的 bit 0
+    parts.append(pack_bits([m >> 1 for brow, prow in zip(state['board'], state['pencils'])
+                            for v, m in zip(brow, prow) if v == 0], n))
+    return b''.join(parts)
+
+
+def decode_save(data):
+    magic, n, flags, diff, elapsed = SAVE_HEADER.unpack_from(data)
+    if magic != SAVE_MAGIC:
+        raise ValueError('不是数独存档')
+    pos = SAVE_HEADER.size
+    regions = None
+    if flags & SAVE_FLAG_JIGSAW:
+        regions, pos = unpack_bits(data, pos, n * n, max(1, (n - 1).bit_length()))
+    state = {'size': n, 'regions': regions, 'elapsed': elapsed, 'ensure_unique': bool(flags & SAVE_FLAG_UNIQUE)}
+    levels = list(DIFFICULTY_LEVELS)
+    state['difficulty'] = levels[diff] if diff < len(levels) else None
+    width = n.bit_length()
+    for key in ('full_board', 'puzzle', 'board'):
+        flat, pos = unpack_bits(data, pos, n * n, width)
+        state[key] = [flat[r * n:(r + 1) * n] for r in range(n)]
+    empties = [(r, c) for r in range(n) for c in range(n) if state['board'][r][c] == 0]
+    masks, pos = unpack_bits(data, pos, len(empties), n)
+    state['pencils'] = [[0] * n for _ in range(n)]
+    for (r, c), m in zip(empties, masks):
+        state['pencils'][r][c] = m << 1
+    return state
+
+
+def remove_autosave():
+    for path in (AUTOSAVE_PATH, AUTOSAVE_PATH + '.journal'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def autosave_unfinished():
+    """自动存档里是否有玩了一半的对局：有进度（填过数、标过铅笔或日志里有操作），且还没填对"""
+    try:
+        with open(AUTOSAVE_PATH, 'rb') as f:
+            state = decode_save(f.read())
+    except (OSError, ValueError, struct.error):
+        return False
+    if state['board'] == state['full_board']:
+        return False
+    if state['board'] != state['puzzle'] or any(any(row) for row in state['pencils']):
+        return True
+    return bool(MoveJournal.read(AUTOSAVE_PATH + '.journal')[0])
+
+
+class MoveJournal:
+    """只追加的操作日志；clock 返回当前用时（秒），随记录一起写入"""
+
+    def __init__(self, path, clock=None, truncate=False, keep=None):
+        """keep：续写前把日志截到这个长度（去掉末尾没写完的记录）"""
+        self.path = path
+        self.clock = clock
+        self.f = open(path, 'wb' if truncate else 'ab')
+        if keep is not None:
+            self.f.truncate(keep)
+
+    def append(self, op, action=((), ())):
+        cells, pencils = action
+        elapsed = int(self.clock()) if self.clock else 0
+        parts = [JOURNAL_HEADER.pack(op, len(cells), len(pencils), elapsed)]
+        parts += [JOURNAL_CELL.pack(*cell) for cell in cells]
+        parts += [JOURNAL_PENCIL.pack(r, c, delta >> 1) for r, c, delta in pencils]
+        self.f.write(b''.join(parts))
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+    @staticmethod
+    def read(path):
+        """
+        读出全部完整记录，返回 ([(操作, 动作, 用时), ...], 完整记录的总长度)；
+        末尾写了一半的记录（崩溃）直接忽略，续写时按返回的长度截掉
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        records = []
+        pos = 0
+        while pos + JOURNAL_HEADER.size <= len(data):
+            op, ncells, npencils, elapsed = JOURNAL_HEADER.unpack_from(data, pos)
+            end = pos + JOURNAL_HEADER.size + ncells * JOURNAL_CELL.size + npencils * JOURNAL_PENCIL.size
+            if end > len(data):
+                break
+            pos += JOURNAL_HEADER.size
+            cells = tuple(JOURNAL_CELL.unpack_from(data, pos + i * JOURNAL_CELL.size) for i in range(ncells))
+            pos += ncells * JOURNAL_CELL.size
+            pencils = tuple((r, c, delta << 1) for r, c, delta in
+                            (JOURNAL_PENCIL.unpack_from(data, pos + i * JOURNAL_PENCIL.size) for i in range(npencils)))
+            pos = end
+            records.append((op, (cells, pencils), elapsed))
+        return records, pos
+
+
+# 撤销栈最多保留的动作数，更早的动作被丢弃（长时间对局内存有上限）
+HISTORY_LIMIT = 500
+
+
 class ActionStack:
-    def __init__(self):
-        self.stack = []
+    """
+    每个动作是一条差异记录 (cells, pencils)：
+    cells 为改动过的格子 (行, 列, 旧值, 新值)，pencils 为铅笔掩码变化 (行, 列, 异或量)。
+    撤销/重做只需按记录改回/改过去，代价与改动格数成正比；重置、提示、求解也都是普通动作。
+    """
+
+    def __init__(self, journal=None, limit=HISTORY_LIMIT):
+        self.stack = deque(maxlen=limit)
         self.redo_stack = []
+        # 每个动作（含撤销/重做）同步写入操作日志
+        self.journal = journal
 
     def push(self, action):
         self.stack.append(action)
         self.redo_stack.clear()
+        if self.journal:
+            self.journal.append(OP_DIFF, action)
 
     def undo(self):
         if not self.stack:
             return None
         a = self.stack.pop()
         self.redo_stack.append(a)
+        if self.journal:
+            self.journal.append(OP_UNDO, a)
         return a
 
     def redo(self):
@@ -170,8 +1517,131 @@ class ActionStack:
             return None
         a = self.redo_stack.pop()
         self.stack.append(a)
+        if self.journal:
+            self.journal.append(OP_REDO, a)
         return a
 
+    def replay_undo(self, action):
+        """重放日志里的撤销：存档之前的动作不在栈里，直接放进重做栈"""
+        if self.stack:
+            self.stack.pop()
+        self.redo_stack.append(action)
+
+    def replay_redo(self, action):
+        if self.redo_stack:
+            self.redo_stack.pop()
+        self.stack.append(action)
+
+# ----------------- 后台出题（独立进程，可取消） -----------------
+
+def generate_for_kind(kind, difficulty, ensure_unique, progress=None):
+    """按盘面类型（BOARD_KINDS 的键）出一道题，返回 (puzzle, full_board, spec)"""
+    size, jigsaw = BOARD_KINDS[kind]
+    spec = SudokuSpec(size, random_regions(size)) if jigsaw else SudokuSpec(size)
+    if spec.standard9 and ensure_unique:
+        puzzle, full_board = generate_puzzle(difficulty, progress=progress)
+    else:
+        # 其它盘面按格子数等比例换算空格数；难度评估只支持标准 9x9，这里只保证唯一解
+        if progress:
+            progress(1, 3)
+        full_board = generate_full_board(spec)
+        if progress:
+            progress(2, 3)
+        empties = round(DIFFICULTY_LEVELS[difficulty] * spec.cells / 81)
+        puzzle = make_puzzle_with_uniqueness(full_board, empties, ensure_unique, spec=spec)
+    return puzzle, full_board, spec
+
+
+def generation_worker(out, kind, difficulty, ensure_unique):
+    """
+    出题子进程入口，通过队列 out 回报：
+    ('progress', 已完成, 总数)、('done', puzzle, full_board, regions) 或 ('error', 信息)
+    """
+    # 各子进程的随机状态必须各自重新播种，否则会出同一道题
+    random.seed()
+    try:
+        puzzle, full_board, spec = generate_for_kind(kind, difficulty, ensure_unique,
+                                                     lambda done, total: out.put(('progress', done, total)))
+        out.put(('done', puzzle, full_board, None if spec.box else spec.regions))
+    except Exception as e:
+        out.put(('error', str(e)))
+
+
+class PuzzleGenerator:
+    """
+    后台出题：每个请求在独立进程里运行，进度和结果通过队列交回；
+    Tk 线程用 after 轮询队列，回调都在 Tk 线程里执行。
+    新请求到来（或 cancel）时直接终止上一个进程，过期的题目不再占用 CPU。
+    """
+
+    POLL_MS = 50
+
+    def __init__(self, master, on_done, on_progress=None, on_error=None):
+        self.master = master
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_error = on_error
+        # spawn：不把 Tk 和题库线程 fork 进子进程
+        self.ctx = multiprocessing.get_context('spawn')
+        self.process = None
+        self.queue = None
+        self.poll_job = None
+
+    @property
+    def busy(self):
+        return self.process is not None
+
+    def request(self, kind, difficulty, ensure_unique):
+        self.cancel()
+        # 每个请求用新队列，被终止进程残留的消息不会串到新请求里
+        self.queue = self.ctx.Queue()
+        self.process = self.ctx.Process(target=generation_worker, args=(self.queue, kind, difficulty, ensure_unique),
+                                        daemon=True)
+        self.process.start()
+        self.poll_job = self.master.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        if self.poll_job is not None:
+            self.master.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join()
+            self.process = None
+        if self.queue is not None:
+            self.queue.close()
+            self.queue = None
+
+    def _poll(self):
+        self.poll_job = None
+        alive = self.process.is_alive()
+        try:
+            while True:
+                msg = self.queue.get_nowait()
+                if msg[0] == 'progress':
+                    if self.on_progress:
+                        self.on_progress(msg[1], msg[2])
+                    continue
+                self.cancel()
+                if msg[0] == 'done':
+                    _, puzzle, full_board, regions = msg
+                    size = len(full_board)
+                    spec = STANDARD_SPEC if size == 9 and regions is None else SudokuSpec(size, regions)
+                    self.on_done(puzzle, full_board, spec)
+                elif self.on_error:
+                    self.on_error(msg[1])
+                return
+        except queue.Empty:
+            pass
+        if not alive:
+            # 子进程没交结果就退出了（例如被系统杀掉）
+            self.cancel()
+            if self.on_error:
+                self.on_error('出题进程意外退出')
+            return
+        self.poll_job = self.master.after(self.POLL_MS, self._poll)
+
 # ----------------- 主界面 -----------------
 
 class SudokuApp:
@@ -180,16 +1650,29 @@ class SudokuApp:
         master.title('数独增强版')
         master.resizable(False, False)
 
-        self.difficulty_map = {'简单': 30, '中等': 45, '困难': 55}
+        self.difficulty_map = dict(DIFFICULTY_LEVELS)
         self.difficulty = '中等'
         self.ensure_unique = True
+        self.board_kind = '9x9 标准'
+        self.spec = STANDARD_SPEC
 
-        self.full_board = generate_full_board()
-        self.puzzle = make_puzzle_with_uniqueness(self.full_board, self.difficulty_map[self.difficulty], self.ensure_unique)
+        # 题库不可用（例如目录只读）时退回现场生成
+        try:
+            self.bank = PuzzleBank()
+            self.bank.start_refiller()
+        except sqlite3.Error:
+            self.bank = None
+        self.generator = PuzzleGenerator(master, self.on_generated, self.on_generate_progress, self.on_generate_error)
+        master.protocol('WM_DELETE_WINDOW', self.on_close)
+
+        # 先显示空盘面，第一局在界面建好后由 new_game 开局（题库为空时在后台出题，不卡启动）
+        self.puzzle = self.spec.empty_board()
+        self.full_board = self.spec.empty_board()
         self.board = [row[:] for row in self.puzzle]
         self.fixed = [[(self.puzzle[r][c] != 0) for c in range(9)] for r in range(9)]
-        # pencil marks: 每个格子为 set()
-        self.pencils = [[set() for _ in range(9)] for _ in range(9)]
+        # pencil marks: 每个格子为候选位掩码（bit n 表示数字 n）
+        self.pencils = self.spec.empty_board()
+        self.tracker = CandidateTracker(self.board, self.spec)
 
         self.selected = (0, 0)
         self.action_stack = ActionStack()
@@ -198,16 +1681,42 @@ class SudokuApp:
         self.running = False
         self.elapsed = 0
 
+        # 自动存档：快照 + 操作日志，手动存档后改为写到玩家选的文件旁边
+        self.save_path = AUTOSAVE_PATH
+        self.journal = None
+
         self.build_ui()
+        # 上次没玩完（或异常退出）留下的自动存档可以直接接着玩
+        resumed = False
+        if autosave_unfinished() and messagebox.askyesno('恢复', '发现上次未完成的对局，是否继续？'):
+            try:
+                resumed = self.open_save(AUTOSAVE_PATH)
+            except (OSError, ValueError, KeyError, struct.error):
+                pass
+        if not resumed:
+            self.new_game()
         self.draw_board()
         self.start_timer()
 
+    def on_close(self):
+        # 关窗时结束出题子进程、补货进程和题库连接，日志文件也要关掉
+        self.generator.cancel()
+        if self.bank:
+            self.bank.close()
+        self.close_journal()
+        self.master.destroy()
+
     def build_ui(self):
         # Canvas
         self.canvas = tk.Canvas(self.master, width=BOARD_SIZE+GRID_PADDING*2, height=BOARD_SIZE+GRID_PADDING*2, bg='white', highlightthickness=0)
         self.canvas.grid(row=0, column=0, rowspan=8, padx=12, pady=12)
         self.canvas.bind('<Button-1>', self.on_click)
         self.master.bind('<Key>', self.on_key)
+        self.canvas.bind('<Configure>', self.on_canvas_resize)
+        self.bg_image = None
+        self.bg_size = None
+        self.bg_item = None
+        self.create_board_items()
 
         # controls
         cf = tk.Frame(self.master)
@@ -219,21 +1728,27 @@ class SudokuApp:
         diff.grid(row=1, column=0)
         diff.bind('<<ComboboxSelected>>', self.change_difficulty)
 
+        self.kind_var = tk.StringVar(value=self.board_kind)
+        kind = ttk.Combobox(cf, textvariable=self.kind_var, values=list(BOARD_KINDS), state='readonly', width=10)
+        kind.grid(row=2, column=0, pady=(6,0))
+        kind.bind('<<ComboboxSelected>>', self.change_board_kind)
+
         self.unique_var = tk.BooleanVar(value=self.ensure_unique)
-        tk.Checkbutton(cf, text='生成唯一解', variable=self.unique_var, command=self.toggle_unique).grid(row=2, column=0, pady=(6,6))
+        tk.Checkbutton(cf, text='生成唯一解', variable=self.unique_var, command=self.toggle_unique).grid(row=3, column=0, pady=(6,6))
 
         btns = [
             ('🔁 新游戏', self.new_game),
             ('🧭 检查', self.check_solution),
             ('✨ 求解', self.solve_and_show),
             ('💡 提示', self.hint_one),
+            ('✏ 自动铅笔', self.auto_pencil),
             ('📝 存档', self.save_file),
             ('📂 读取', self.load_file),
             ('↶ 撤销', self.undo),
             ('↷ 重做', self.redo),
             ('♻ 重置答案', self.reset_user_entries),
         ]
-        r = 3
+        r = 4
         for text, cmd in btns:
             b = ttk.Button(cf, text=text, command=cmd, width=14)
             b.grid(row=r, column=0, pady=4)
@@ -241,26 +1756,43 @@ class SudokuApp:
 
         # pencil / normal toggle
         self.mode_var = tk.StringVar(value='normal')
-        tk.Radiobutton(cf, text='输入', variable=self.mode_var, value='normal').grid(row=12, column=0, sticky='w')
-        tk.Radiobutton(cf, text='铅笔', variable=self.mode_var, value='pencil').grid(row=13, column=0, sticky='w')
+        tk.Radiobutton(cf, text='输入', variable=self.mode_var, value='normal').grid(row=r, column=0, sticky='w')
+        tk.Radiobutton(cf, text='铅笔', variable=self.mode_var, value='pencil').grid(row=r+1, column=0, sticky='w')
 
         # timer
         self.timer_label = tk.Label(cf, text='用时 00:00', font=('Helvetica', 12))
-        self.timer_label.grid(row=14, column=0, pady=(10,0))
-
-        note = tk.Label(cf, text='操作：点击格子选中，1-9 输入，Backspace 清除。铅笔模式用于候选数。')
-        note.grid(row=15, column=0, pady=(6,0))
-
-    def draw_gradient_bg(self):
-        # 简单的竖直渐变（多条细矩形）
-        self.canvas.delete('bg')
-        steps = 40
-        for i in range(steps):
-            r = i / (steps - 1)
-            color = self._interp_color(BG_START, BG_END, r)
-            y0 = i * (BOARD_SIZE + GRID_PADDING*2) / steps
-            y1 = (i+1) * (BOARD_SIZE + GRID_PADDING*2) / steps
-            self.canvas.create_rectangle(0, y0, BOARD_SIZE + GRID_PADDING*2, y1, fill=color, outline=color, tags='bg')
+        self.timer_label.grid(row=r+2, column=0, pady=(10,0))
+
+        # 后台出题进度
+        self.progress_var = tk.DoubleVar(value=0)
+        ttk.Progressbar(cf, variable=self.progress_var, maximum=1, length=120).grid(row=r+3, column=0, pady=(6,0))
+
+        note = tk.Label(cf, text='操作：点击格子选中，1-9（16x16 等大盘面用 A-G）输入，Backspace 清除。铅笔模式用于候选数。')
+        note.grid(row=r+4, column=0, pady=(6,0))
+
+    def draw_gradient_bg(self, width=BOARD_SIZE + GRID_PADDING*2, height=BOARD_SIZE + GRID_PADDING*2):
+        # 竖直渐变渲染成一张 PhotoImage，画布上只占一个 image 元素；
+        # 图片按画布尺寸缓存，只有窗口尺寸变化（on_canvas_resize）时才重新生成
+        if (width, height) != self.bg_size:
+            img = tk.PhotoImage(width=width, height=height)
+            steps = 40
+            for i in range(steps):
+                color = self._interp_color(BG_START, BG_END, i / (steps - 1))
+                y0 = i * height // steps
+                y1 = (i+1) * height // steps
+                if y1 > y0:
+                    img.put(color, to=(0, y0, width, y1))
+            self.bg_image = img
+            self.bg_size = (width, height)
+        if self.bg_item is None:
+            self.bg_item = self.canvas.create_image(0, 0, anchor='nw', image=self.bg_image)
+        else:
+            self.canvas.itemconfig(self.bg_item, image=self.bg_image)
+        self.canvas.tag_lower(self.bg_item)
+
+    def on_canvas_resize(self, event):
+        if (event.width, event.height) != self.bg_size:
+            self.draw_gradient_bg(event.width, event.height)
 
     def _interp_color(self, a, b, t):
         # 颜色 '#rrggbb'
@@ -271,72 +1803,130 @@ class SudokuApp:
         cz = int(az + (bz-az)*t)
         return f'#{cx:02x}{cy:02x}{cz:02x}'
 
-    def draw_board(self):
+    def create_board_items(self):
+        # 所有画布元素按当前盘面规格创建一次并保存句柄，draw_board 只更新变化的部分；
+        # 换盘面规格（边长/区域）时整体重建
         self.canvas.delete('all')
-        self.draw_gradient_bg()
+        self.bg_item = None
+        if self.bg_size:
+            self.draw_gradient_bg(*self.bg_size)
+        else:
+            self.draw_gradient_bg()
+
+        spec = self.spec
+        n = spec.size
         off = GRID_PADDING
+        cs = self.cell = BOARD_SIZE / n
+        scale = 9 / n
+        self.font_main = ('Helvetica', min(28, max(10, round(18 * scale))))
+        self.font_fixed = self.font_main + ('bold',)
+        self.font_pencil = ('Helvetica', min(12, max(5, round(8 * scale))))
+
+        # 高亮 (行/列/区域)：每格一个底色块，选中格变化时切换显示
+        self.highlight_items = [[self.canvas.create_rectangle(off + cc*cs, off + rr*cs, off + (cc+1)*cs, off + (rr+1)*cs,
+                                                              fill=HIGHLIGHT_COLOR, width=0, state='hidden')
+                                 for cc in range(n)] for rr in range(n)]
+        self.highlighted = set()
+
+        # 网格线：区域边界（含外框）画粗线，相邻同段合并成一条
+        reg = spec.regions
+        for i in range(n + 1):
+            runs = []
+            for j in range(n):
+                if i in (0, n):
+                    thick = (True, True)
+                else:
+                    thick = (reg[j*n + i-1] != reg[j*n + i], reg[(i-1)*n + j] != reg[i*n + j])
+                runs.append(thick)
+            for axis in (0, 1):
+                j = 0
+                while j < n:
+                    k = j
+                    while k < n and runs[k][axis] == runs[j][axis]:
+                        k += 1
+                    w = 3 if runs[j][axis] else 1
+                    if axis == 0:
+                        self.canvas.create_line(off + i*cs, off + j*cs, off + i*cs, off + k*cs, width=w, fill=LINE_COLOR)
+                    else:
+                        self.canvas.create_line(off + j*cs, off + i*cs, off + k*cs, off + i*cs, width=w, fill=LINE_COLOR)
+                    j = k
+
+        # 铅笔记号：每格 n 个小字，在 k x k 小格里排列 1..n
+        k = 1
+        while k * k < n:
+            k += 1
+        sub = cs / k
+        self.pencil_items = [[[] for _ in range(n)] for _ in range(n)]
+        for rr in range(n):
+            for cc in range(n):
+                sx = off + cc*cs
+                sy = off + rr*cs
+                for d in range(1, n + 1):
+                    x = sx + sub * ((d-1) % k + 0.5)
+                    y = sy + sub * ((d-1) // k + 0.5)
+                    self.pencil_items[rr][cc].append(self.canvas.create_text(x, y, text='', font=self.font_pencil, fill='#444'))
+
+        # 数字
+        self.digit_items = [[self.canvas.create_text(off + cc*cs + cs/2, off + rr*cs + cs/2, text='', font=self.font_main)
+                             for cc in range(n)] for rr in range(n)]
+
+        # 选中框 + 冲突闪烁块
+        self.select_item = self.canvas.create_rectangle(0, 0, 0, 0, outline=SELECT_COLOR, width=3)
+        self.error_item = self.canvas.create_rectangle(0, 0, 0, 0, fill=ERROR_COLOR, state='hidden')
+        self.flash_job = None
+
+        # 每格上次画出的 (数字, 是否固定, 是否冲突, 铅笔掩码)，以及上次的选中格
+        self.rendered = [[(0, False, False, 0) for _ in range(n)] for _ in range(n)]
+        self.rendered_selected = None
 
-        # 高亮 (行/列/宫)
+    def draw_board(self):
+        off = GRID_PADDING
+        n = self.spec.size
+        cs = self.cell
         r, c = self.selected
-        self.canvas.create_rectangle(off, off + r*CELL_SIZE, off + 9*CELL_SIZE, off + (r+1)*CELL_SIZE, fill=HIGHLIGHT_COLOR, width=0)
-        self.canvas.create_rectangle(off + c*CELL_SIZE, off, off + (c+1)*CELL_SIZE, off + 9*CELL_SIZE, fill=HIGHLIGHT_COLOR, width=0)
-        br = (r//3)*3; bc = (c//3)*3
-        self.canvas.create_rectangle(off + bc*CELL_SIZE, off + br*CELL_SIZE, off + (bc+3)*CELL_SIZE, off + (br+3)*CELL_SIZE, fill=HIGHLIGHT_COLOR, width=0)
-
-        # 网格线
-        for i in range(10):
-            w = 3 if i % 3 == 0 else 1
-            x0 = off + i*CELL_SIZE
-            y0 = off
-            x1 = x0
-            y1 = off + 9*CELL_SIZE
-            self.canvas.create_line(x0, y0, x1, y1, width=w, fill=LINE_COLOR)
-            y0 = off + i*CELL_SIZE
-            x0 = off
-            y1 = y0
-            x1 = off + 9*CELL_SIZE
-            self.canvas.create_line(x0, y0, x1, y1, width=w, fill=LINE_COLOR)
-
-        # 铅笔记号先画小字
-        for rr in range(9):
-            for cc in range(9):
-                if self.board[rr][cc] == 0 and self.pencils[rr][cc]:
-                    sx = off + cc*CELL_SIZE
-                    sy = off + rr*CELL_SIZE
-                    # 在 3x3 小格里排列 1..9
-                    for n in range(1, 10):
-                        if n in self.pencils[rr][cc]:
-                            i = (n-1) // 3
-                            j = (n-1) % 3
-                            x = sx + 8 + j * 18
-                            y = sy + 8 + i * 18
-                            self.canvas.create_text(x, y, text=str(n), font=FONT_PENCIL, fill='#444')
-
-        # 画数字
-        for rr in range(9):
-            for cc in range(9):
+        if self.rendered_selected != self.selected:
+            # 只切换新旧高亮集合的差集
+            highlighted = {divmod(i, n) for u in self.spec.cell_units[r*n + c] for i in self.spec.units[u]}
+            for rr, cc in self.highlighted - highlighted:
+                self.canvas.itemconfig(self.highlight_items[rr][cc], state='hidden')
+            for rr, cc in highlighted - self.highlighted:
+                self.canvas.itemconfig(self.highlight_items[rr][cc], state='normal')
+            self.highlighted = highlighted
+            sx = off + c*cs
+            sy = off + r*cs
+            self.canvas.coords(self.select_item, sx, sy, sx+cs, sy+cs)
+            self.rendered_selected = self.selected
+
+        for rr in range(n):
+            for cc in range(n):
                 val = self.board[rr][cc]
-                if val != 0:
-                    x = off + cc*CELL_SIZE + CELL_SIZE/2
-                    y = off + rr*CELL_SIZE + CELL_SIZE/2
-                    if self.fixed[rr][cc]:
-                        self.canvas.create_text(x, y, text=str(val), font=FONT_FIXED, fill=FIXED_COLOR)
-                    else:
-                        self.canvas.create_text(x, y, text=str(val), font=FONT_MAIN, fill=USER_COLOR)
-
-        # 选中框动画风格
-        sx = off + c*CELL_SIZE
-        sy = off + r*CELL_SIZE
-        self.canvas.create_rectangle(sx, sy, sx+CELL_SIZE, sy+CELL_SIZE, outline=SELECT_COLOR, width=3)
+                state = (val, self.fixed[rr][cc], self.tracker.is_conflict(rr, cc), self.pencils[rr][cc] if val == 0 else 0)
+                if state != self.rendered[rr][cc]:
+                    self.render_cell(rr, cc, state)
+
+    def render_cell(self, rr, cc, state):
+        val, fixed, conflict, pencil = state
+        old_val, old_fixed, old_conflict, old_pencil = self.rendered[rr][cc]
+        if (val, fixed, conflict) != (old_val, old_fixed, old_conflict):
+            item = self.digit_items[rr][cc]
+            if val == 0:
+                self.canvas.itemconfig(item, text='')
+            elif fixed:
+                self.canvas.itemconfig(item, text=SYMBOLS[val], font=self.font_fixed, fill=CONFLICT_COLOR if conflict else FIXED_COLOR)
+            else:
+                self.canvas.itemconfig(item, text=SYMBOLS[val], font=self.font_main, fill=CONFLICT_COLOR if conflict else USER_COLOR)
+        for d in mask_digits(pencil ^ old_pencil):
+            self.canvas.itemconfig(self.pencil_items[rr][cc][d-1], text=SYMBOLS[d] if pencil >> d & 1 else '')
+        self.rendered[rr][cc] = state
 
     # ----------------- 事件 -----------------
     def on_click(self, event):
         x, y = event.x, event.y
         off = GRID_PADDING
-        if not (off <= x <= off + 9*CELL_SIZE and off <= y <= off + 9*CELL_SIZE):
+        if not (off <= x < off + BOARD_SIZE and off <= y < off + BOARD_SIZE):
             return
-        c = int((x - off) // CELL_SIZE)
-        r = int((y - off) // CELL_SIZE)
+        c = int((x - off) // self.cell)
+        r = int((y - off) // self.cell)
         self.selected = (r, c)
         self.draw_board()
 
@@ -346,75 +1936,143 @@ class SudokuApp:
         if self.fixed[r][c]:
             return
         if key in ('BackSpace', 'Delete'):
-            prev = self.board[r][c]
-            if prev != 0:
-                self.action_stack.push(('set', r, c, prev, 0))
-            else:
-                # 删除铅笔时不入撤销栈
-                pass
-            self.board[r][c] = 0
-            self.pencils[r][c].clear()
+            # 数字和铅笔一起清除，作为一个动作
+            self.change({(r, c): 0}, {(r, c): 0})
             self.draw_board()
             return
-        if key in [str(i) for i in range(1, 10)]:
-            val = int(key)
+        val = self.key_value(key)
+        if val:
             if self.mode_var.get() == 'normal':
-                prev = self.board[r][c]
-                if prev == val:
+                if self.board[r][c] == val:
                     # 如果相同就清除
-                    self.action_stack.push(('set', r, c, prev, 0))
-                    self.board[r][c] = 0
+                    self.change({(r, c): 0})
                 else:
-                    self.action_stack.push(('set', r, c, prev, val))
-                    self.board[r][c] = val
-                    self.pencils[r][c].clear()
+                    self.change({(r, c): val}, {(r, c): 0})
                     # 若插入导致冲突，闪烁
-                    if not valid(self.board, r, c, val):
+                    if self.tracker.is_conflict(r, c):
                         self.flash_cell_error(r, c)
                 self.draw_board()
             else:
                 # pencil 模式：切换候选
-                if val in self.pencils[r][c]:
-                    self.pencils[r][c].remove(val)
-                else:
-                    self.pencils[r][c].add(val)
+                self.change(pencils={(r, c): self.pencils[r][c] ^ 1 << val})
                 self.draw_board()
             # 自动完成检测
             if self.is_complete():
                 self.stop_timer()
                 if self.board == self.full_board:
+                    self.finish_game()
                     messagebox.showinfo('完成', f'恭喜，你完成了数独！用时 {self.format_time(self.elapsed)}')
                 else:
                     messagebox.showwarning('注意', '已填满，但可能不正确。')
 
+    def key_value(self, key):
+        # 1-9，以及 12x12/16x16 盘面上的 A-G；不是当前盘面的数字键时返回 0
+        if len(key) == 1:
+            val = SYMBOLS.find(key.upper())
+            if 1 <= val <= self.spec.size:
+                return val
+        return 0
+
+    def set_cell(self, r, c, val):
+        # 所有单格改动都经过这里，保持候选数跟踪同步
+        self.board[r][c] = val
+        self.tracker.set(r, c, val)
+
+    def change(self, cells=None, pencils=None):
+        """
+        把 cells {(行, 列): 新值} 和 pencils {(行, 列): 新铅笔掩码} 作为一个动作应用并入撤销栈；
+        只记录真正变化的格子，没有变化时不入栈
+        """
+        cell_diff = tuple((r, c, self.board[r][c], v) for (r, c), v in (cells or {}).items() if self.board[r][c] != v)
+        pencil_diff = tuple((r, c, self.pencils[r][c] ^ m) for (r, c), m in (pencils or {}).items() if self.pencils[r][c] != m)
+        if not cell_diff and not pencil_diff:
+            return None
+        action = (cell_diff, pencil_diff)
+        self.apply_action(action)
+        self.action_stack.push(action)
+        return action
+
+    def apply_action(self, action, undo=False):
+        cells, pencils = action
+        for r, c, old, new in cells:
+            self.set_cell(r, c, old if undo else new)
+        # 异或量正反两个方向通用
+        for r, c, delta in pencils:
+            self.pencils[r][c] ^= delta
+
+    def reload_board(self, board):
+        # 整盘替换（重置/求解/读档）时重建候选数跟踪
+        self.board = board
+        self.tracker = CandidateTracker(self.board, self.spec)
+
     def flash_cell_error(self, r, c):
         off = GRID_PADDING
-        x0 = off + c*CELL_SIZE
-        y0 = off + r*CELL_SIZE
-        x1 = x0 + CELL_SIZE
-        y1 = y0 + CELL_SIZE
-        rect = self.canvas.create_rectangle(x0, y0, x1, y1, fill=ERROR_COLOR)
-        self.master.after(250, lambda: (self.canvas.delete(rect), self.draw_board()))
+        x0 = off + c*self.cell
+        y0 = off + r*self.cell
+        x1 = x0 + self.cell
+        y1 = y0 + self.cell
+        self.canvas.coords(self.error_item, x0, y0, x1, y1)
+        self.canvas.itemconfig(self.error_item, state='normal')
+        if self.flash_job is not None:
+            self.master.after_cancel(self.flash_job)
+        self.flash_job = self.master.after(250, self._hide_flash)
+
+    def _hide_flash(self):
+        self.flash_job = None
+        self.canvas.itemconfig(self.error_item, state='hidden')
 
     # ----------------- 功能按钮 -----------------
     def new_game(self):
-        # 生成新题（线程化避免界面卡死）
-        def _gen():
-            self.master.config(cursor='watch')
-            self.full_board = generate_full_board()
-            empties = self.difficulty_map[self.difficulty]
-            self.puzzle = make_puzzle_with_uniqueness(self.full_board, empties, self.ensure_unique)
-            self.board = [row[:] for row in self.puzzle]
-            self.fixed = [[(self.puzzle[r][c] != 0) for c in range(9)] for r in range(9)]
-            self.pencils = [[set() for _ in range(9)] for _ in range(9)]
-            self.action_stack = ActionStack()
-            self.selected = (0, 0)
-            self.start_time = time.time()
-            self.running = True
-            self.elapsed = 0
-            self.master.config(cursor='')
-            self.draw_board()
-        threading.Thread(target=_gen).start()
+        kind = self.board_kind
+        self.generator.cancel()
+        self.master.config(cursor='')
+        self.progress_var.set(0)
+        # 标准 9x9 优先从题库直接取题（唯一解题目），取不到再现场生成
+        if BOARD_KINDS[kind] == (9, False) and self.ensure_unique and self.bank:
+            item = self.bank.draw(self.difficulty)
+            if item:
+                self.start_game(*item)
+                return
+
+        # 现场生成放到后台进程，界面不卡；连续切换难度时上一个请求直接作废
+        self.master.config(cursor='watch')
+        self.generator.request(kind, self.difficulty, self.ensure_unique)
+
+    def on_generated(self, puzzle, full_board, spec):
+        self.master.config(cursor='')
+        self.progress_var.set(0)
+        self.start_game(puzzle, full_board, spec)
+
+    def on_generate_progress(self, done, total):
+        self.progress_var.set(done / total)
+
+    def on_generate_error(self, message):
+        self.master.config(cursor='')
+        self.progress_var.set(0)
+        messagebox.showerror('出题失败', message)
+
+    def start_game(self, puzzle, full_board, spec=None):
+        self.set_spec(spec or STANDARD_SPEC)
+        n = self.spec.size
+        self.full_board = full_board
+        self.puzzle = puzzle
+        self.reload_board([row[:] for row in self.puzzle])
+        self.fixed = [[(self.puzzle[r][c] != 0) for c in range(n)] for r in range(n)]
+        self.pencils = self.spec.empty_board()
+        self.action_stack = ActionStack()
+        self.selected = (0, 0)
+        self.start_time = time.time()
+        self.running = True
+        self.elapsed = 0
+        # 新的一局回到自动存档，不覆盖玩家手动存的上一局
+        self.checkpoint(AUTOSAVE_PATH)
+        self.draw_board()
+
+    def set_spec(self, spec):
+        # 盘面规格（边长或区域）变了才重建画布元素
+        if (spec.size, spec.regions) != (self.spec.size, self.spec.regions):
+            self.spec = spec
+            self.create_board_items()
 
     def change_difficulty(self, event=None):
         v = self.diff_var.get()
@@ -422,32 +2080,34 @@ class SudokuApp:
             self.difficulty = v
             self.new_game()
 
+    def change_board_kind(self, event=None):
+        v = self.kind_var.get()
+        if v in BOARD_KINDS:
+            self.board_kind = v
+            self.new_game()
+
     def toggle_unique(self):
         self.ensure_unique = self.unique_var.get()
 
     def check_solution(self):
-        # 规则检查（行列宫）
-        for r in range(9):
-            row = self.board[r]
-            if 0 in row:
-                messagebox.showwarning('检查', '还有空格未填写')
-                return
-            if len(set(row)) != 9:
-                messagebox.showwarning('检查', f'第 {r+1} 行有重复')
-                return
-        for c in range(9):
-            col = [self.board[r][c] for r in range(9)]
-            if len(set(col)) != 9:
-                messagebox.showwarning('检查', f'第 {c+1} 列有重复')
+        # 规则检查（行列宫/区域）
+        n = self.spec.size
+        if any(0 in row for row in self.board):
+            messagebox.showwarning('检查', '还有空格未填写')
+            return
+        for k, unit in enumerate(self.spec.units):
+            if len({self.board[i // n][i % n] for i in unit}) != n:
+                kind, idx = divmod(k, n)
+                if kind == 0:
+                    messagebox.showwarning('检查', f'第 {idx+1} 行有重复')
+                elif kind == 1:
+                    messagebox.showwarning('检查', f'第 {idx+1} 列有重复')
+                else:
+                    messagebox.showwarning('检查', '有宫内重复' if self.spec.box else '有区域内重复')
                 return
-        for br in range(0, 9, 3):
-            for bc in range(0, 9, 3):
-                block = [self.board[r][c] for r in range(br, br+3) for c in range(bc, bc+3)]
-                if len(set(block)) != 9:
-                    messagebox.showwarning('检查', '有宫内重复')
-                    return
         if self.board == self.full_board:
             self.stop_timer()
+            self.finish_game()
             messagebox.showinfo('检查', '答案正确！')
         else:
             messagebox.showinfo('检查', '规则通过，但与生成解不一致（可能有多解）')
@@ -455,36 +2115,48 @@ class SudokuApp:
     def solve_and_show(self):
         if not messagebox.askyesno('求解', '显示完整解将结束本题，是否继续？'):
             return
-        self.board = [row[:] for row in self.full_board]
-        self.pencils = [[set() for _ in range(9)] for _ in range(9)]
+        n = self.spec.size
+        self.change({(r, c): self.full_board[r][c] for r in range(n) for c in range(n)},
+                    {(r, c): 0 for r in range(n) for c in range(n)})
         self.draw_board()
         self.stop_timer()
+        self.finish_game()
 
     def hint_one(self):
-        # 填一个空格或修正错误格
-        for r in range(9):
-            for c in range(9):
+        # 优先给出靠唯一候选/隐性唯一就能推出的格子（并选中它），推不出时再直接填一个空格或修正错误格
+        single = self.tracker.find_single()
+        if single:
+            r, c, val, technique = single
+            if self.full_board[r][c] == val:
+                self.change({(r, c): val}, {(r, c): 0})
+                self.selected = (r, c)
+                self.draw_board()
+                return
+        n = self.spec.size
+        for r in range(n):
+            for c in range(n):
                 if self.board[r][c] == 0:
-                    val = self.full_board[r][c]
-                    self.action_stack.push(('set', r, c, 0, val))
-                    self.board[r][c] = val
+                    self.change({(r, c): self.full_board[r][c]})
                     self.draw_board()
                     return
-        for r in range(9):
-            for c in range(9):
+        for r in range(n):
+            for c in range(n):
                 if self.board[r][c] != self.full_board[r][c]:
-                    prev = self.board[r][c]
-                    val = self.full_board[r][c]
-                    self.action_stack.push(('set', r, c, prev, val))
-                    self.board[r][c] = val
+                    self.change({(r, c): self.full_board[r][c]})
                     self.draw_board()
                     return
         messagebox.showinfo('提示', '没有可提示的格子')
 
+    def auto_pencil(self):
+        # 用候选数跟踪一次性填好所有空格的铅笔记号（整体作为一个可撤销动作）
+        n = self.spec.size
+        self.change(pencils={(r, c): self.tracker.candidates(r, c) for r in range(n) for c in range(n)})
+        self.draw_board()
+
     def reset_user_entries(self):
-        self.action_stack.push(('reset', None))
-        self.board = [row[:] for row in self.puzzle]
-        self.pencils = [[set() for _ in range(9)] for _ in range(9)]
+        n = self.spec.size
+        self.change({(r, c): self.puzzle[r][c] for r in range(n) for c in range(n)},
+                    {(r, c): 0 for r in range(n) for c in range(n)})
         self.draw_board()
 
     # ----------------- 撤销 / 重做 -----------------
@@ -492,69 +2164,141 @@ class SudokuApp:
         a = self.action_stack.undo()
         if a is None:
             return
-        typ = a[0]
-        if typ == 'set':
-            _, r, c, prev, new = a
-            # 反向操作：将值设回 prev
-            self.board[r][c] = prev
-        elif typ == 'reset':
-            # 取消重置：无法完全恢复 -> 重新生成为 puzzle
-            self.board = [row[:] for row in self.puzzle]
+        self.apply_action(a, undo=True)
         self.draw_board()
 
     def redo(self):
         a = self.action_stack.redo()
         if a is None:
             return
-        typ = a[0]
-        if typ == 'set':
-            _, r, c, prev, new = a
-            self.board[r][c] = new
-        elif typ == 'reset':
-            self.board = [row[:] for row in self.puzzle]
+        self.apply_action(a)
         self.draw_board()
 
     # ----------------- 存档 / 读取 -----------------
-    def save_file(self):
-        path = filedialog.asksaveasfilename(defaultextension='.sudoku', filetypes=[('Sudoku save', '*.sudoku'), ('JSON', '*.json')])
-        if not path:
-            return
-        payload = {
+    def snapshot(self):
+        return {
+            'size': self.spec.size,
+            'regions': None if self.spec.box else self.spec.regions,
             'full_board': self.full_board,
             'puzzle': self.puzzle,
             'board': self.board,
-            'pencils': [[sorted(list(s)) for s in row] for row in self.pencils],
-            'fixed': self.fixed,
+            'pencils': self.pencils,
             'difficulty': self.difficulty,
             'ensure_unique': self.ensure_unique,
             'elapsed': self.elapsed,
         }
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(payload, f, ensure_ascii=False)
-        messagebox.showinfo('存档', '保存成功')
+
+    def checkpoint(self, path=None):
+        """写一份紧凑快照到 path（缺省为当前存档位置）并清空其操作日志，之后的动作都追加到日志里"""
+        path = path or self.save_path
+        self.close_journal()
+        try:
+            # 先清空日志再替换快照：中途崩溃最多退回上一份快照，不会把旧日志重放到新快照上
+            journal = MoveJournal(path + '.journal', self.get_elapsed, truncate=True)
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(encode_save(self.snapshot()))
+            os.replace(tmp, path)
+        except OSError:
+            # 目录不可写时只是不自动存档
+            return False
+        self.save_path = path
+        self.journal = journal
+        self.action_stack.journal = journal
+        return True
+
+    def finish_game(self):
+        """对局结束（填对或看了答案）：自动存档没有继续的必要，停止记录并删除；手动存档保持不变"""
+        if self.save_path == AUTOSAVE_PATH:
+            self.close_journal()
+            remove_autosave()
+
+    def close_journal(self):
+        if self.journal:
+            self.journal.close()
+        self.journal = None
+        self.action_stack.journal = None
+
+    def get_elapsed(self):
+        return self.elapsed
+
+    def replay_journal(self, records):
+        # 重放时日志已断开，不会把记录再写一遍
+        for op, action, elapsed in records:
+            if op == OP_DIFF:
+                self.apply_action(action)
+                self.action_stack.push(action)
+            elif op == OP_UNDO:
+                self.apply_action(action, undo=True)
+                self.action_stack.replay_undo(action)
+            elif op == OP_REDO:
+                self.apply_action(action)
+                self.action_stack.replay_redo(action)
+            self.elapsed = elapsed
+
+    def save_file(self):
+        path = filedialog.asksaveasfilename(defaultextension='.sudoku', filetypes=[('Sudoku save', '*.sudoku')])
+        if not path:
+            return
+        if self.checkpoint(path):
+            # 对局已经转到手动存档，自动存档里的快照过时了
+            if os.path.abspath(path) != AUTOSAVE_PATH:
+                remove_autosave()
+            messagebox.showinfo('存档', '保存成功')
+        else:
+            messagebox.showerror('存档', '保存失败')
 
     def load_file(self):
         path = filedialog.askopenfilename(filetypes=[('Sudoku save', '*.sudoku'), ('JSON', '*.json')])
         if not path:
             return
-        with open(path, 'r', encoding='utf-8') as f:
-            payload = json.load(f)
         try:
-            self.full_board = payload['full_board']
-            self.puzzle = payload['puzzle']
-            self.board = payload['board']
-            self.pencils = [[set(x) for x in row] for row in payload['pencils']]
-            self.fixed = payload['fixed']
-            self.difficulty = payload.get('difficulty', self.difficulty)
-            self.ensure_unique = payload.get('ensure_unique', self.ensure_unique)
-            self.elapsed = payload.get('elapsed', 0)
-            self.start_time = time.time() - self.elapsed
-            self.running = True
-            self.draw_board()
+            self.open_save(path)
             messagebox.showinfo('读取', '读取成功')
         except Exception as e:
             messagebox.showerror('读取失败', str(e))
 
+    def open_save(self, path):
+        """读取紧凑存档并重放其操作日志；也兼容旧版 JSON 存档"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        compact = data.startswith(SAVE_MAGIC)
+        if compact:
+            state = decode_save(data)
+        else:
+            state = json.loads(data.decode('utf-8'))
+            state['pencils'] = [[sum(1 << n for n in x) for x in row] for row in state['pencils']]
+        # 旧存档没有 size/regions，按标准 9x9 读取
+        size = state.get('size', 9)
+        regions = state.get('regions')
+        self.close_journal()
+        self.set_spec(STANDARD_SPEC if size == 9 and regions is None else SudokuSpec(size, regions))
+        self.full_board = state['full_board']
+        self.puzzle = state['puzzle']
+        self.reload_board(state['board'])
+        self.pencils = state['pencils']
+        self.fixed = [[v != 0 for v in row] for row in self.puzzle]
+        self.difficulty = state.get('difficulty') or self.difficulty
+        self.ensure_unique = state.get('ensure_unique', self.ensure_unique)
+        self.elapsed = state.get('elapsed', 0)
+        self.action_stack = ActionStack()
+        if compact:
+            records, end = MoveJournal.read(path + '.journal')
+            self.replay_journal(records)
+            try:
+                self.journal = MoveJournal(path + '.journal', self.get_elapsed, keep=end)
+                self.action_stack.journal = self.journal
+                self.save_path = path
+            except OSError:
+                self.journal = None
+        else:
+            # 旧版存档不覆盖，转成自动存档继续记录
+            self.checkpoint(AUTOSAVE_PATH)
+        self.start_time = time.time() - self.elapsed
+        self.running = True
+        self.draw_board()
+        return True
+
     # ----------------- 计时器 -----------------
     def start_timer(self):
         if self.start_time is None:
@@ -578,8 +2322,9 @@ class SudokuApp:
         return f"{m:02d}:{s:02d}"
 
     def is_complete(self):
-        for r in range(9):
-            for c in range(9):
+        n = self.spec.size
+        for r in range(n):
+            for c in range(n):
                 if self.board[r][c] == 0:
                     return False
         return True
@@ -587,6 +2332,8 @@ class SudokuApp:
 # ----------------- 运行 -----------------
 
 if __name__ == '__main__':
+    # 打包成可执行文件后，spawn 出来的子进程要在这里直接转去跑任务，不能再打开一个界面
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = SudokuApp(root)
     root.mainloop()
@@ -0,0 +1,61 @@
+"""
+sudoku_bank.py
+
+数独题库预生成工具（命令行）
+- 按难度批量生成唯一解题目，写入 SQLite 题库（默认与 sudoku.py 同目录的 sudoku_bank.db）
+- sudoku.py 的“新游戏”直接从题库取题，库存不足时后台自动补货
+
+使用方法：
+    python sudoku_bank.py --count 2000                 # 每个难度生成 2000 道
+    python sudoku_bank.py --count 500 -d 困难 -d 专家   # 只生成指定难度
+    python sudoku_bank.py --stats                      # 查看库存
+"""
+
+import argparse
+import random
+import time
+
+from sudoku import BANK_PATH, DIFFICULTY_LEVELS, PuzzleBank, generate_puzzle
+
+# 每攒够多少道题写一次库
+FLUSH_EVERY = 100
+
+
+def fill_bank(bank, difficulty, count):
+    buf = []
+    start = time.time()
+    for i in range(1, count + 1):
+        buf.append(generate_puzzle(difficulty))
+        if len(buf) >= FLUSH_EVERY or i == count:
+            bank.add_many(difficulty, buf)
+            buf = []
+            rate = i / max(time.time() - start, 1e-9)
+            print(f'\r{difficulty}: {i}/{count}  ({rate:.1f} 道/秒)', end='', flush=True)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预生成数独题库')
+    parser.add_argument('--db', default=BANK_PATH, help='题库路径（默认 %(default)s）')
+    parser.add_argument('--count', type=int, default=1000, help='每个难度生成多少道题')
+    parser.add_argument('-d', '--difficulty', action='append', choices=list(DIFFICULTY_LEVELS),
+                        help='只生成指定难度，可重复；默认全部')
+    parser.add_argument('--seed', type=int, help='随机种子（便于复现）')
+    parser.add_argument('--stats', action='store_true', help='只打印各难度库存')
+    args = parser.parse_args()
+
+    bank = PuzzleBank(args.db)
+    try:
+        if not args.stats:
+            if args.seed is not None:
+                random.seed(args.seed)
+            for difficulty in args.difficulty or DIFFICULTY_LEVELS:
+                fill_bank(bank, difficulty, args.count)
+        for difficulty in DIFFICULTY_LEVELS:
+            print(f'{difficulty}: {bank.count(difficulty)}')
+    finally:
+        bank.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+sudoku_bench.py
+
+数独求解器 / 生成器性能基准（命令行）
+- 求解类基准在 sudoku_corpus/ 下的题库上逐题运行（hard.txt：经典难题；17clue.txt：17 提示数题）
+- 生成类基准按固定种子重复运行 --runs 次
+- 报告每秒题数、p50/p99 延迟和访问节点数，结果保存为 JSON，可用 --compare 与上次结果对比
+
+新增引擎时在 SOLVER_BENCHMARKS / GENERATOR_BENCHMARKS 里登记一个函数即可。
+
+使用方法：
+    python sudoku_bench.py                                  # 全部基准，结果写入 sudoku_bench.json
+    python sudoku_bench.py -b solve_bitmask -b count_dlx    # 只跑指定基准
+    python sudoku_bench.py -o new.json --compare old.json   # 与旧结果对比
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import sudoku
+from sudoku import (DIFFICULTY_LEVELS, BitmaskSolver, DancingLinks, count_solutions_naive,
+                    generate_full_board, make_puzzle_with_uniqueness, rate_puzzle, solve_backtrack_naive)
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sudoku_corpus')
+# 每秒题数下降超过这个比例时在对比结果里标记为回退
+REGRESSION_RATIO = 0.9
+
+
+class BenchTimeout(Exception):
+    pass
+
+
+def load_corpus(path):
+    """每行 81 个字符，'.' 或 '0' 表示空格，# 开头为注释"""
+    boards = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            line = line.replace('.', '0')
+            boards.append([[int(ch) for ch in line[r * 9:(r + 1) * 9]] for r in range(9)])
+    return boards
+
+
+# ----------------- 求解类基准：fn(board, deadline) -> 访问节点数 -----------------
+
+def _naive_nodes(fn, board, deadline):
+    # 朴素回溯每个搜索节点调用一次 find_empty，临时包一层来计数并检查超时
+    orig = sudoku.find_empty
+    nodes = 0
+
+    def counted(b):
+        nonlocal nodes
+        nodes += 1
+        if not nodes & 1023 and time.perf_counter() > deadline:
+            raise BenchTimeout
+        return orig(b)
+
+    sudoku.find_empty = counted
+    try:
+        fn(board)
+    finally:
+        sudoku.find_empty = orig
+    return nodes
+
+
+def bench_solve_backtrack(board, deadline):
+    return _naive_nodes(solve_backtrack_naive, board, deadline)
+
+
+def bench_count_solutions(board, deadline):
+    return _naive_nodes(lambda b: count_solutions_naive(b, limit=2), board, deadline)
+
+
+def bench_solve_bitmask(board, deadline):
+    solver = BitmaskSolver(board)
+    solver.search(limit=1)
+    return solver.nodes
+
+
+def bench_count_bitmask(board, deadline):
+    solver = BitmaskSolver(board)
+    solver.search(limit=2)
+    return solver.nodes
+
+
+def bench_count_dlx(board, deadline):
+    dlx = DancingLinks()
+    dlx.count_solutions(board, limit=2)
+    return dlx.nodes
+
+
+def bench_rate_puzzle(board, deadline):
+    return rate_puzzle(board)['steps']
+
+
+SOLVER_BENCHMARKS = {
+    'solve_backtrack': bench_solve_backtrack,
+    'count_solutions': bench_count_solutions,
+    'solve_bitmask': bench_solve_bitmask,
+    'count_bitmask': bench_count_bitmask,
+    'count_dlx': bench_count_dlx,
+    'rate_puzzle': bench_rate_puzzle,
+}
+
+
+# ----------------- 生成类基准：fn() -> 访问节点数（无则 None） -----------------
+
+def bench_generate_full_board():
+    generate_full_board()
+
+
+def _make_puzzle_bench(empties):
+    def run():
+        make_puzzle_with_uniqueness(generate_full_board(), empties)
+    return run
+
+
+GENERATOR_BENCHMARKS = {'generate_full_board': bench_generate_full_board}
+for _name, _empties in DIFFICULTY_LEVELS.items():
+    GENERATOR_BENCHMARKS[f'make_puzzle_with_uniqueness[{_name}]'] = _make_puzzle_bench(_empties)
+
+
+# ----------------- 运行与统计 -----------------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(name, corpus, total, latencies, nodes, timeouts):
+    elapsed = sum(latencies)
+    latencies = sorted(latencies)
+    nodes = [n for n in nodes if n is not None]
+    return {
+        'bench': name,
+        'corpus': corpus,
+        'n': total,
+        'completed': len(latencies),
+        'timeouts': timeouts,
+        'total_s': round(elapsed, 6),
+        'per_sec': round(len(latencies) / elapsed, 3) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None,
+        'mean_nodes': round(sum(nodes) / len(nodes), 1) if nodes else None,
+    }
+
+
+def run_solver_bench(name, fn, corpus, boards, budget, timeout):
+    """
+    budget 为该基准在该题库上的总时间预算（秒），超出后剩余题目记为超时；
+    timeout 为单题时限（朴素回溯在难题上可能要跑几分钟）
+    """
+    latencies, nodes = [], []
+    deadline = time.perf_counter() + budget
+    timeouts = 0
+    for board in boards:
+        if time.perf_counter() > deadline:
+            timeouts += 1
+            continue
+        work = [row[:] for row in board]
+        t0 = time.perf_counter()
+        try:
+            n = fn(work, min(deadline, t0 + timeout))
+        except BenchTimeout:
+            timeouts += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+        nodes.append(n)
+    return summarize(name, corpus, len(boards), latencies, nodes, timeouts)
+
+
+def run_generator_bench(name, fn, runs, seed, budget):
+    random.seed(seed)
+    latencies, nodes = [], []
+    deadline = time.perf_counter() + budget
+    timeouts = 0
+    for _ in range(runs):
+        if time.perf_counter() > deadline:
+            timeouts += 1
+            continue
+        t0 = time.perf_counter()
+        n = fn()
+        latencies.append(time.perf_counter() - t0)
+        nodes.append(n)
+    return summarize(name, 'generated', runs, latencies, nodes, timeouts)
+
+
+def format_row(r):
+    def fmt(v, spec):
+        return format(v, spec) if v is not None else format('-', spec[0] + spec[1:].split('.')[0])
+    return (f"{r['bench']:<40} {r['corpus']:<10} {r['completed']:>4}/{r['n']:<4} "
+            f"{fmt(r['per_sec'], '>10.1f')} {fmt(r['p50_ms'], '>10.2f')} {fmt(r['p99_ms'], '>10.2f')} "
+            f"{fmt(r['mean_nodes'], '>12.1f')}")
+
+
+def compare(results, old_path):
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {(r['bench'], r['corpus']): r for r in json.load(f)['results']}
+    print(f'\n与 {old_path} 对比（每秒题数 新/旧）：')
+    for r in results:
+        prev = old.get((r['bench'], r['corpus']))
+        if not prev or not prev['per_sec'] or not r['per_sec']:
+            continue
+        ratio = r['per_sec'] / prev['per_sec']
+        flag = '  <-- 回退' if ratio < REGRESSION_RATIO else ''
+        print(f"{r['bench']:<40} {r['corpus']:<10} {ratio:>6.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数独求解器 / 生成器基准')
+    parser.add_argument('-b', '--bench', action='append',
+                        choices=list(SOLVER_BENCHMARKS) + list(GENERATOR_BENCHMARKS),
+                        help='只跑指定基准，可重复；默认全部')
+    parser.add_argument('-c', '--corpus', action='append',
+                        help='题库文件，可重复；默认 sudoku_corpus/*.txt')
+    parser.add_argument('--runs', type=int, default=20, help='生成类基准的运行次数')
+    parser.add_argument('--seed', type=int, default=2024, help='生成类基准的随机种子')
+    parser.add_argument('--budget', type=float, default=30.0, help='每个基准在每个题库上的时间预算（秒）')
+    parser.add_argument('--timeout', type=float, default=5.0, help='求解类基准的单题时限（秒）')
+    parser.add_argument('-o', '--output', default='sudoku_bench.json', help='结果 JSON 路径')
+    parser.add_argument('--compare', help='与之前保存的结果 JSON 对比')
+    args = parser.parse_args()
+
+    selected = args.bench or list(SOLVER_BENCHMARKS) + list(GENERATOR_BENCHMARKS)
+    corpus_paths = args.corpus or sorted(glob.glob(os.path.join(CORPUS_DIR, '*.txt')))
+    corpora = [(os.path.splitext(os.path.basename(p))[0], load_corpus(p)) for p in corpus_paths]
+
+    print(f"{'bench':<40} {'corpus':<10} {'done':>9} {'puzzles/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'nodes':>12}")
+    results = []
+    for name in selected:
+        if name in SOLVER_BENCHMARKS:
+            for corpus, boards in corpora:
+                results.append(run_solver_bench(name, SOLVER_BENCHMARKS[name], corpus, boards, args.budget, args.timeout))
+                print(format_row(results[-1]), flush=True)
+        else:
+            results.append(run_generator_bench(name, GENERATOR_BENCHMARKS[name], args.runs, args.seed, args.budget))
+            print(format_row(results[-1]), flush=True)
+
+    payload = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'runs': args.runs,
+            'budget_s': args.budget,
+            'timeout_s': args.timeout,
+            'corpora': {corpus: len(boards) for corpus, boards in corpora},
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已保存到 {args.output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_history import EditHistory
+from map_model import DIRECTIONS, LINE, START, GridModel
+
+
+def snapshot(model):
+    return ({line_id: model.points(line_id) for line_id in model.lines},
+            bytes(model.state), bytes(model.owner))
+
+
+class EditSession:
+    """按 map_editor.py 的方式编辑 model 并记录历史（画线、合并、设起点、擦除、清空）"""
+
+    def __init__(self, rng, width=10, height=8, budget=None):
+        self.rng = rng
+        self.model = GridModel(width, height)
+        self.history = EditHistory() if budget is None else EditHistory(budget)
+
+    def walk(self, start, length):
+        path = [start]
+        for _ in range(length):
+            x, y = path[-1]
+            options = [(x + dx, y + dy) for dx, dy in DIRECTIONS]
+            options = [c for c in options if self.model.in_bounds(c) and self.model.line_at(c) is None
+                       and c not in path]
+            if not options:
+                break
+            path.append(self.rng.choice(options))
+        return path
+
+    def draw(self):
+        """画一条线；线尾走到其它线条的端点旁时接上去合并"""
+        model, history = self.model, self.history
+        empty = [(x, y) for y in range(model.height) for x in range(model.width) if model.line_at((x, y)) is None]
+        if not empty:
+            return False
+        path = self.walk(self.rng.choice(empty), self.rng.randint(0, 8))
+        line_id = model.add_line(path)
+        tail = path[-1]
+        for target, info in list(model.lines.items()):
+            if target == line_id:
+                continue
+            for cell in (info.head, info.tail):
+                if abs(cell[0] - tail[0]) + abs(cell[1] - tail[1]) == 1:
+                    if len(info) > 1 and model.get_state(cell) == START:
+                        history.record(('state', cell, START, LINE))
+                        model.set_state(cell, LINE)
+                    cells, at_head = model.merge(line_id, target, cell)
+                    history.record(('extend', target, cells, at_head))
+                    history.commit()
+                    return True
+        if len(path) < 2:
+            model.remove_line(line_id)
+            return False
+        history.record_line('add', model, line_id)
+        history.commit()
+        return True
+
+    def set_start(self):
+        model, history = self.model, self.history
+        line_id = self.rng.choice(sorted(model.lines))
+        line = model.lines[line_id]
+        cell = self.rng.choice((line.head, line.tail))
+        other = line.tail if cell == line.head else line.head
+        if model.get_state(other) == START:
+            history.record(('state', other, START, LINE))
+            model.set_state(other, LINE)
+        history.record(('state', cell, model.get_state(cell), START))
+        model.set_state(cell, START)
+        history.commit()
+
+    def erase(self):
+        line_id = self.rng.choice(sorted(self.model.lines))
+        self.history.record_line('remove', self.model, line_id)
+        self.model.remove_line(line_id)
+        self.history.commit()
+
+    def clear_all(self):
+        for line_id in sorted(self.model.lines):
+            self.history.record_line('remove', self.model, line_id)
+        self.history.commit()
+        self.model.clear()
+
+    def step(self):
+        roll = self.rng.random()
+        if roll < 0.5 or not self.model.lines:
+            return self.draw()
+        if roll < 0.75:
+            self.set_start()
+        elif roll < 0.97:
+            self.erase()
+        else:
+            self.clear_all()
+        return True
+
+
+class EditHistoryTest(unittest.TestCase):
+    def test_undo_redo_round_trip(self):
+        session = EditSession(random.Random(24))
+        model, history = session.model, session.history
+        states = [snapshot(model)]
+        while len(states) < 150:
+            if session.step():
+                states.append(snapshot(model))
+        # 撤销到底，每一步都回到对应编辑之前的状态
+        for expected in reversed(states[:-1]):
+            self.assertTrue(history.undo(model))
+            self.assertEqual(snapshot(model), expected)
+        self.assertFalse(history.undo(model))
+        # 再重做到底
+        for expected in states[1:]:
+            self.assertTrue(history.redo(model))
+            self.assertEqual(snapshot(model), expected)
+        self.assertFalse(history.redo(model))
+
+    def test_new_edit_clears_redo(self):
+        session = EditSession(random.Random(5))
+        model, history = session.model, session.history
+        while not session.draw():
+            pass
+        while not session.draw():
+            pass
+        history.undo(model)
+        before = snapshot(model)
+        session.set_start()
+        self.assertFalse(history.redo(model))
+        history.undo(model)
+        self.assertEqual(snapshot(model), before)
+
+    def test_budget(self):
+        session = EditSession(random.Random(7), budget=40)
+        model, history = session.model, session.history
+        states = [snapshot(model)]
+        while len(states) < 60:
+            if session.step():
+                states.append(snapshot(model))
+        self.assertLessEqual(history.size, max(40, history.undo_stack[-1][1]))
+        # 最早的命令被丢弃，剩下的仍能按顺序撤销
+        undone = 0
+        while history.undo(model):
+            undone += 1
+            self.assertEqual(snapshot(model), states[-1 - undone])
+        self.assertLess(undone, len(states) - 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_model import DIRECTIONS, EMPTY, LINE, START, GridModel
+
+
+def random_walk(model, rng, length):
+    """从随机空格出发走一条不自交的路径，返回点列表（不改动 model）"""
+    empty = [(x, y) for y in range(model.height) for x in range(model.width) if model.line_at((x, y)) is None]
+    if not empty:
+        return []
+    path = [rng.choice(empty)]
+    taken = {path[0]}
+    for _ in range(length - 1):
+        x, y = path[-1]
+        options = [(x + dx, y + dy) for dx, dy in DIRECTIONS
+                   if model.in_bounds((x + dx, y + dy)) and model.line_at((x + dx, y + dy)) is None
+                   and (x + dx, y + dy) not in taken]
+        if not options:
+            break
+        path.append(rng.choice(options))
+        taken.add(path[-1])
+    return path
+
+
+def random_walk_from(model, rng, start, length):
+    """从 start 旁边的空格走出去的路径（不含 start）"""
+    path = []
+    taken = {start}
+    cell = start
+    for _ in range(length):
+        options = [(cell[0] + dx, cell[1] + dy) for dx, dy in DIRECTIONS]
+        options = [c for c in options if model.in_bounds(c) and model.line_at(c) is None and c not in taken]
+        if not options:
+            break
+        cell = rng.choice(options)
+        path.append(cell)
+        taken.add(cell)
+    return path
+
+
+class GridModelTest(unittest.TestCase):
+    def check(self, model, expected):
+        """model 与参照 {线编号: 点列表} 一致：链表顺序、点编号、格子归属"""
+        self.assertEqual(set(model.lines), set(expected))
+        owned = set()
+        for line_id, points in expected.items():
+            self.assertEqual(model.points(line_id), points)
+            self.assertEqual(list(model.iter_points(line_id, reverse=True)), points[::-1])
+            self.assertEqual(model.length(line_id), len(points))
+            for number, cell in enumerate(points):
+                self.assertEqual(model.line_info(cell), (line_id, number))
+                self.assertNotEqual(model.get_state(cell), EMPTY)
+            owned.update(points)
+        for y in range(model.height):
+            for x in range(model.width):
+                if (x, y) not in owned:
+                    self.assertEqual(model.line_info((x, y)), (None, None))
+                    self.assertEqual(model.get_state((x, y)), EMPTY)
+
+    def test_random_edits(self):
+        rng = random.Random(23)
+        model = GridModel(12, 9)
+        expected = {}
+        for _ in range(400):
+            roll = rng.random()
+            if roll < 0.35 or not expected:
+                path = random_walk(model, rng, rng.randint(1, 12))
+                if not path:
+                    continue
+                line_id = model.new_line(path[0])
+                # 新线条总是拿到最小的未使用编号
+                self.assertEqual(line_id, min(set(range(len(expected) + 1)) - set(expected)))
+                for cell in path[1:]:
+                    model.append(line_id, cell)
+                expected[line_id] = path
+            elif roll < 0.5:
+                line_id = rng.choice(sorted(expected))
+                at_head = rng.random() < 0.5
+                end = expected[line_id][0] if at_head else expected[line_id][-1]
+                extra = random_walk_from(model, rng, end, rng.randint(1, 4))
+                if at_head:
+                    for cell in extra:
+                        model.prepend(line_id, cell)
+                    expected[line_id] = extra[::-1] + expected[line_id]
+                else:
+                    model.extend(line_id, extra)
+                    expected[line_id] = expected[line_id] + extra
+            elif roll < 0.65:
+                line_id = rng.choice(sorted(expected))
+                self.assertEqual(model.remove_line(line_id), expected.pop(line_id))
+            elif roll < 0.75:
+                line_id = rng.choice(sorted(expected))
+                if len(expected[line_id]) > 1:
+                    count = rng.randint(1, len(expected[line_id]) - 1)
+                    at_head = rng.random() < 0.5
+                    removed = model.trim(line_id, count, at_head)
+                    points = expected[line_id]
+                    if at_head:
+                        self.assertEqual(removed, points[:count])
+                        expected[line_id] = points[count:]
+                    else:
+                        self.assertEqual(removed, points[::-1][:count])
+                        expected[line_id] = points[:-count]
+            elif roll < 0.95:
+                # 从其它线条的端点旁开始画一条线，线尾接到端点上合并
+                target = rng.choice(sorted(expected))
+                cell = rng.choice((expected[target][0], expected[target][-1]))
+                path = random_walk_from(model, rng, cell, rng.randint(1, 6))
+                if not path:
+                    continue
+                path.reverse()
+                source = model.add_line(path)
+                moving, at_head = model.merge(source, target, cell)
+                self.assertEqual(moving, path[::-1])
+                self.assertNotIn(source, model.lines)
+                if at_head:
+                    expected[target] = path + expected[target]
+                else:
+                    expected[target] = expected[target] + path[::-1]
+            else:
+                width, height = rng.randint(4, 14), rng.randint(4, 10)
+                dropped = model.resize(width, height)
+                gone = sorted(line_id for line_id, points in expected.items()
+                              if any(x >= width or y >= height for x, y in points))
+                self.assertEqual(dropped, gone)
+                for line_id in gone:
+                    del expected[line_id]
+            self.check(model, expected)
+
+    def test_start_point(self):
+        model = GridModel(5, 5)
+        line_id = model.add_line([(0, 0), (1, 0), (2, 0)], start=(2, 0))
+        self.assertEqual(model.get_state((2, 0)), START)
+        self.assertEqual(model.get_state((1, 0)), LINE)
+        self.assertEqual(model.start_of(line_id), (2, 0))
+        model.set_state((2, 0), LINE)
+        self.assertEqual(model.start_of(line_id), (0, 0))
+
+    def test_sparse_ids(self):
+        model = GridModel(3, 3)
+        self.assertEqual(model.add_line([(0, 0)], line_id=50_000_000), 50_000_000)
+        self.assertEqual([model.new_line((x, 1)) for x in range(3)], [0, 1, 2])
+        model.remove_line(1)
+        model.remove_line(0)
+        self.assertEqual(model.new_line((0, 2)), 0)
+        self.assertEqual(model.new_line((1, 2)), 1)
+        self.assertEqual(model.new_line((2, 2)), 3)
+        self.assertLess(len(model.free_ids), 10)
+        self.assertEqual(model.line_at((0, 0)), 50_000_000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from map_solver import PathSolver, check_level, check_line
+
+
+def brute_force_count(cells, start):
+    """不剪枝的深度优先搜索：从 start 出发走满 cells 的路径数"""
+    cells = set(cells)
+    if start not in cells:
+        return 0
+    visited = {start}
+
+    def walk(cell):
+        if len(visited) == len(cells):
+            return 1
+        total = 0
+        x, y = cell
+        for nxt in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if nxt in cells and nxt not in visited:
+                visited.add(nxt)
+                total += walk(nxt)
+                visited.remove(nxt)
+        return total
+
+    return walk(start)
+
+
+def random_path(rng, width, height, length):
+    """随机的不自交路径（设计者画的线条）"""
+    path = [(rng.randrange(width), rng.randrange(height))]
+    while len(path) < length:
+        x, y = path[-1]
+        options = [c for c in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                   if 0 <= c[0] < width and 0 <= c[1] < height and c not in path]
+        if not options:
+            break
+        path.append(rng.choice(options))
+    return path
+
+
+def is_path(path, cells, start):
+    return (path[0] == start and sorted(path) == sorted(cells)
+            and all(abs(x1 - x0) + abs(y1 - y0) == 1 for (x0, y0), (x1, y1) in zip(path, path[1:])))
+
+
+class PathSolverTest(unittest.TestCase):
+    def test_full_grids(self):
+        for width, height in ((1, 1), (2, 2), (3, 3), (4, 3), (4, 4), (5, 4)):
+            cells = [(x, y) for y in range(height) for x in range(width)]
+            for start in cells:
+                solver = PathSolver(width, height, cells, start)
+                self.assertEqual(solver.solve(limit=10 ** 6), brute_force_count(cells, start),
+                                 f'{width}x{height} 起点 {start}')
+
+    def test_random_shapes(self):
+        rng = random.Random(21)
+        for _ in range(300):
+            width, height = rng.randint(2, 6), rng.randint(2, 5)
+            cells = [(x, y) for y in range(height) for x in range(width) if rng.random() < 0.8]
+            if not cells:
+                continue
+            start = rng.choice(cells)
+            solver = PathSolver(width, height, cells, start)
+            count = solver.solve(limit=10 ** 6)
+            self.assertEqual(count, brute_force_count(cells, start), (width, height, cells, start))
+            for path in solver.solutions:
+                self.assertTrue(is_path(path, cells, start))
+
+
+class CheckLineTest(unittest.TestCase):
+    def test_designed_paths(self):
+        rng = random.Random(2021)
+        for _ in range(300):
+            width, height = rng.randint(2, 6), rng.randint(2, 6)
+            points = random_path(rng, width, height, rng.randint(2, width * height))
+            result = check_line(width, height, points)
+            self.assertEqual(result['solutions'], min(brute_force_count(points, points[0]), 2), points)
+            if result['solutions'] == 2:
+                alternative = result['alternative']
+                self.assertNotEqual(alternative, points)
+                self.assertTrue(is_path(alternative, points, points[0]))
+            else:
+                self.assertIsNone(result['alternative'])
+
+    def test_start_at_tail(self):
+        points = [(0, 0), (1, 0), (2, 0), (2, 1)]
+        result = check_line(3, 2, points, start=(2, 1))
+        self.assertEqual(result['solutions'], 1)
+
+    def test_node_budget(self):
+        points = [(x, y) for y in range(6) for x in (range(6) if y % 2 == 0 else range(5, -1, -1))]
+        self.assertIsNone(check_line(6, 6, points, max_nodes=3)['solutions'])
+        self.assertEqual(check_line(6, 6, points)['solutions'], 2)
+
+    def test_check_level(self):
+        lines = {1: [(0, 0), (1, 0), (1, 1)], 2: [(3, 0), (3, 1), (2, 1), (2, 2)], 3: []}
+        results = check_level(4, 3, lines)
+        self.assertEqual(sorted(results), [1, 2])
+        self.assertEqual(results[1]['solutions'], 1)
+        self.assertEqual(results[2]['solutions'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sudoku as S
+
+
+def carve(full_board, empties, rng):
+    """随手挖空（不要求唯一解），存档测试只关心盘面数据"""
+    n = len(full_board)
+    puzzle = [row[:] for row in full_board]
+    for i in rng.sample(range(n * n), empties):
+        puzzle[i // n][i % n] = 0
+    return puzzle
+
+
+def new_app():
+    """不建窗口的 SudokuApp：只保留存档、日志和撤销相关的状态"""
+    app = S.SudokuApp.__new__(S.SudokuApp)
+    app.spec = S.STANDARD_SPEC
+    app.draw_board = lambda: None
+    app.set_spec = lambda spec: setattr(app, 'spec', spec)
+    app.difficulty = '简单'
+    app.ensure_unique = True
+    app.journal = None
+    app.save_path = S.AUTOSAVE_PATH
+    app.action_stack = S.ActionStack()
+    return app
+
+
+def state_of(app):
+    return ([row[:] for row in app.board], [row[:] for row in app.pencils], app.elapsed,
+            list(app.action_stack.stack), list(app.action_stack.redo_stack))
+
+
+class SaveFormatTest(unittest.TestCase):
+    def round_trip(self, spec, seed):
+        rng = random.Random(seed)
+        random.seed(seed)
+        full = S.generate_full_board(spec)
+        n = spec.size
+        puzzle = carve(full, n * n // 2, rng)
+        board = [row[:] for row in puzzle]
+        pencils = spec.empty_board()
+        for r in range(n):
+            for c in range(n):
+                if puzzle[r][c]:
+                    continue
+                roll = rng.random()
+                if roll < 0.3:
+                    board[r][c] = full[r][c]
+                elif roll < 0.7:
+                    pencils[r][c] = sum(1 << d for d in rng.sample(range(1, n + 1), rng.randint(1, n)))
+        state = {
+            'size': n,
+            'regions': None if spec.box else spec.regions,
+            'full_board': full,
+            'puzzle': puzzle,
+            'board': board,
+            'pencils': pencils,
+            'difficulty': '困难',
+            'ensure_unique': False,
+            'elapsed': 3723,
+        }
+        self.assertEqual(S.decode_save(S.encode_save(state)), state)
+
+    def test_standard(self):
+        self.round_trip(S.STANDARD_SPEC, 1)
+
+    def test_jigsaw(self):
+        random.seed(2)
+        self.round_trip(S.SudokuSpec(9, S.random_regions(9)), 2)
+
+    def test_other_sizes(self):
+        for size in (4, 6, 12, 16):
+            with self.subTest(size=size):
+                self.round_trip(S.SudokuSpec(size), size)
+
+    def test_truncated_save_rejected(self):
+        data = S.encode_save({
+            'size': 9, 'regions': None, 'full_board': S.STANDARD_SPEC.empty_board(),
+            'puzzle': S.STANDARD_SPEC.empty_board(), 'board': S.STANDARD_SPEC.empty_board(),
+            'pencils': S.STANDARD_SPEC.empty_board(), 'difficulty': '简单', 'ensure_unique': True, 'elapsed': 0,
+        })
+        for end in (len(data) - 1, S.SAVE_HEADER.size + 1):
+            with self.assertRaises(ValueError):
+                S.decode_save(data[:end])
+
+
+class JournalReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.old_autosave = S.AUTOSAVE_PATH
+        S.AUTOSAVE_PATH = os.path.join(self.tmp, 'auto.sudoku')
+        self.rng = random.Random(12)
+        random.seed(12)
+        self.full = S.generate_full_board()
+        self.puzzle = carve(self.full, 40, self.rng)
+        self.empties = [(r, c) for r in range(9) for c in range(9) if self.puzzle[r][c] == 0]
+
+    def tearDown(self):
+        S.AUTOSAVE_PATH = self.old_autosave
+        shutil.rmtree(self.tmp)
+
+    def play(self, app, steps):
+        """随机填数、标铅笔、撤销、重做；每个动作后记下 (日志长度, 状态)"""
+        journal = app.save_path + '.journal'
+        history = [(os.path.getsize(journal), state_of(app))]
+        for _ in range(steps):
+            app.elapsed += self.rng.randint(0, 5)
+            roll = self.rng.random()
+            r, c = self.rng.choice(self.empties)
+            if roll < 0.35:
+                app.change({(r, c): self.rng.randint(0, 9)})
+            elif roll < 0.6:
+                app.change(pencils={(r, c): self.rng.randrange(0, 1 << 10, 2)})
+            elif roll < 0.8:
+                app.undo()
+            else:
+                app.redo()
+            size = os.path.getsize(journal)
+            if size != history[-1][0]:
+                history.append((size, state_of(app)))
+        return history
+
+    def test_replay_every_truncation(self):
+        app = new_app()
+        app.start_game(self.puzzle, self.full)
+        history = self.play(app, 60)
+        app.close_journal()
+        with open(S.AUTOSAVE_PATH + '.journal', 'rb') as f:
+            journal = f.read()
+        self.assertEqual(len(journal), history[-1][0])
+
+        path = os.path.join(self.tmp, 'copy.sudoku')
+        shutil.copy(S.AUTOSAVE_PATH, path)
+        for end in range(len(journal) + 1):
+            with open(path + '.journal', 'wb') as f:
+                f.write(journal[:end])
+            size, expected = max((h for h in history if h[0] <= end), key=lambda h: h[0])
+            loaded = new_app()
+            loaded.open_save(path)
+            loaded.close_journal()
+            self.assertEqual(state_of(loaded), expected, f'截断到 {end} 字节')
+            # 写了一半的记录在续写前被截掉
+            self.assertEqual(os.path.getsize(path + '.journal'), size)
+
+    def test_undo_before_save(self):
+        app = new_app()
+        app.start_game(self.puzzle, self.full)
+        (r1, c1), (r2, c2) = self.empties[:2]
+        app.change({(r1, c1): self.full[r1][c1]})
+        app.change({(r2, c2): self.full[r2][c2]})
+        path = os.path.join(self.tmp, 'manual.sudoku')
+        app.checkpoint(path)
+        # 存档之前的动作也能撤销和重做，重放后结果一致
+        app.undo()
+        app.undo()
+        app.redo()
+        expected = state_of(app)
+        app.close_journal()
+        loaded = new_app()
+        loaded.open_save(path)
+        self.assertEqual(loaded.board, expected[0])
+        self.assertEqual(loaded.pencils, expected[1])
+        loaded.redo()
+        self.assertEqual(loaded.board[r2][c2], self.full[r2][c2])
+        loaded.close_journal()
+
+
+if __name__ == '__main__':
+    unittest.main()